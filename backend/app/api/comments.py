@@ -14,6 +14,7 @@ from pydantic import BaseModel, Field
 from sqlalchemy import func
 from sqlalchemy.orm import Session
 
+from app.api.ordering import COMMENT_ORDER_COLUMNS, order_pattern
 from app.core.database import get_db
 from app.models import Comment, Video
 from app.services.emotion import EMOTION_LABELS, EmotionAnalyzer
@@ -600,7 +601,7 @@ def get_comment_list(
     page_size: int = Query(20, ge=1, le=100),
     sentiment: Optional[str] = Query(None, regex="^(positive|neutral|negative)$"),
     emotion: Optional[str] = Query(None, regex=EMOTION_QUERY_REGEX),
-    sort_by: str = Query("like_count", regex="^(like_count|created_at|comment_ctime|sentiment_score)$"),
+    sort_by: str = Query("like_count", regex=order_pattern([*COMMENT_ORDER_COLUMNS, "comment_ctime", "sentiment_score"])),
     db: Session = Depends(get_db),
 ):
     """获取单视频评论列表（支持筛选和排序）"""
@@ -619,7 +620,7 @@ def get_comment_list(
     elif sort_by == "comment_ctime":
         query = query.order_by(Comment.comment_ctime.desc(), Comment.created_at.desc())
     else:
-        order_column = getattr(Comment, sort_by)
+        order_column = COMMENT_ORDER_COLUMNS[sort_by]
         query = query.order_by(order_column.desc())
 
     offset = (page - 1) * page_size
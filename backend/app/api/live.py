@@ -493,7 +493,8 @@ async def get_global_wordcloud_api():
             all_danmakus.extend(manager._stats[room_id].recent_danmakus)
 
     if all_danmakus:
-        wordcloud = manager._nlp.get_word_cloud_data(all_danmakus, top_k=50)
+        # 分词 + TF-IDF 为CPU密集计算，放到线程池避免阻塞事件循环
+        wordcloud = await asyncio.to_thread(manager._nlp.get_word_cloud_data, all_danmakus, top_k=50)
         return {"source": "memory", "data": wordcloud}
 
     return {"source": "none", "data": []}
@@ -35,6 +35,11 @@ class PredictByBvidRequest(BaseModel):
     bvid: str = Field(..., description="视频 BV 号", min_length=3)
 
 
+class PredictBatchRequest(BaseModel):
+    """批量按 BVID 预测请求"""
+    bvids: List[str] = Field(..., min_length=1, max_length=100, description="视频 BV 号列表")
+
+
 class PredictByParamsRequest(BaseModel):
     """按参数预测请求"""
     play_count: int = Field(..., ge=0, description="当前播放量")
@@ -74,6 +79,12 @@ class PredictionResult(BaseModel):
     error: Optional[str] = None
 
 
+class PredictionBatchResult(BaseModel):
+    """批量预测结果"""
+    results: List[PredictionResult]
+    total: int
+
+
 class RecommendationItem(BaseModel):
     """推荐项"""
     bvid: str
@@ -184,6 +195,25 @@ def predict_by_bvid(
     return result
 
 
+@router.post("/predict/batch", response_model=PredictionBatchResult)
+def predict_batch(
+    request: PredictBatchRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    批量根据视频 BVID 预测 7 天后的播放量（一次查询、一次模型调用）
+
+    - **bvids**: 视频的 BV 号列表（最多 100 个），结果按请求顺序返回
+    """
+    # 标准化 BVID
+    bvids = [bvid.strip() for bvid in request.bvids]
+    bvids = [bvid if bvid.startswith('BV') else 'BV' + bvid for bvid in bvids]
+
+    results = hot_predictor.predict_by_bvids(bvids, db)
+    return {"results": results, "total": len(results)}
+
+
 @router.post("/predict/params", response_model=PredictionResult)
 def predict_by_params(
     request: PredictByParamsRequest,
@@ -0,0 +1,17 @@
+"""
+列表接口共用的排序字段白名单
+"""
+from typing import Iterable
+
+from app.models import Comment
+
+# 评论排序字段白名单 -> 列对象（模块加载时解析一次，视频评论与评论分析接口共用）
+COMMENT_ORDER_COLUMNS = {
+    "like_count": Comment.like_count,
+    "created_at": Comment.created_at,
+}
+
+
+def order_pattern(names: Iterable[str]) -> str:
+    """由排序字段白名单生成 Query 参数校验正则，白名单增减字段时无需同步修改正则"""
+    return "^(" + "|".join(names) + ")$"
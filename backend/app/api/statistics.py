@@ -213,18 +213,18 @@ def get_trends(
     # 按日期分组统计
     if metric == "video_count":
         result = db.query(
-            func.date(Video.publish_time).label('date'),
+            Video.publish_date.label('date'),
             func.count(Video.id).label('value')
         ).filter(
             Video.publish_time >= start_date
-        ).group_by(func.date(Video.publish_time)).all()
+        ).group_by(Video.publish_date).all()
     else:
         result = db.query(
-            func.date(Video.publish_time).label('date'),
+            Video.publish_date.label('date'),
             func.sum(getattr(Video, metric)).label('value')
         ).filter(
             Video.publish_time >= start_date
-        ).group_by(func.date(Video.publish_time)).all()
+        ).group_by(Video.publish_date).all()
 
     return [TrendPoint(date=str(r.date), value=r.value or 0) for r in result]
 
@@ -9,16 +9,35 @@ from sqlalchemy.orm import Session
 from sqlalchemy import func
 from pydantic import BaseModel
 import jieba
+import numpy as np
+import orjson
 
+from app.api.ordering import COMMENT_ORDER_COLUMNS, order_pattern
 from app.core.database import get_db
 from app.models import Video, Comment, Danmaku
 from app.services.nlp import NLPAnalyzer
+from app.services.redis_service import get_cached_json, set_cached_json
 
 router = APIRouter()
 
 # 使用统一停用词
 STOPWORDS = NLPAnalyzer.STOP_WORDS
 
+# 排序字段白名单 -> 列对象（模块加载时解析一次，避免每次请求 getattr）
+VIDEO_ORDER_COLUMNS = {
+    "play_count": Video.play_count,
+    "like_count": Video.like_count,
+    "publish_time": Video.publish_time,
+    "coin_count": Video.coin_count,
+    "comment_count": Video.comment_count,
+    "danmaku_count": Video.danmaku_count,
+    "favorite_count": Video.favorite_count,
+}
+
+# 筛选统计缓存（仪表盘自动刷新时避免重复全表聚合）
+VIDEO_STATS_CACHE_PREFIX = "videos:stats:"
+VIDEO_STATS_CACHE_TTL = 60
+
 
 class VideoResponse(BaseModel):
     id: int
@@ -56,7 +75,7 @@ def get_videos(
     keyword: Optional[str] = None,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
-    order_by: str = Query("play_count", regex="^(play_count|like_count|publish_time|coin_count|comment_count|danmaku_count|favorite_count|interaction_rate)$"),
+    order_by: str = Query("play_count", regex=order_pattern([*VIDEO_ORDER_COLUMNS, "interaction_rate"])),
     db: Session = Depends(get_db)
 ):
     """获取视频列表（支持分页、筛选、排序）"""
@@ -89,7 +108,7 @@ def get_videos(
         )
         query = query.order_by(interaction_expr.desc())
     else:
-        order_column = getattr(Video, order_by)
+        order_column = VIDEO_ORDER_COLUMNS[order_by]
         query = query.order_by(order_column.desc())
 
     # 分页
@@ -181,6 +200,16 @@ class VideoCompareResponse(BaseModel):
     videos: List[VideoCompareItem]
 
 
+def video_stats_cache_key(
+    category: Optional[str],
+    keyword: Optional[str],
+    start_date: Optional[datetime],
+    end_date: Optional[datetime]
+) -> str:
+    """筛选统计的缓存键：按参数元组序列化为 JSON，None 与任意字符串（含分隔符）都不会互相冲突"""
+    return VIDEO_STATS_CACHE_PREFIX + orjson.dumps([category, keyword, start_date, end_date]).decode()
+
+
 @router.get("/stats", response_model=VideoStatsResponse)
 def get_videos_stats(
     category: Optional[str] = None,
@@ -190,6 +219,11 @@ def get_videos_stats(
     db: Session = Depends(get_db)
 ):
     """获取视频统计数据（根据筛选条件）"""
+    cache_key = video_stats_cache_key(category, keyword, start_date, end_date)
+    cached = get_cached_json(cache_key)
+    if cached is not None:
+        return cached
+
     query = db.query(Video)
 
     # 筛选条件
@@ -256,7 +290,7 @@ def get_videos_stats(
         for c in category_stats
     ]
 
-    return VideoStatsResponse(
+    result = VideoStatsResponse(
         total_videos=total_videos,
         total_play_count=total_play,
         avg_play_count=round(avg_play, 2),
@@ -268,6 +302,8 @@ def get_videos_stats(
         },
         category_distribution=category_distribution
     )
+    set_cached_json(cache_key, result.model_dump(), expire=VIDEO_STATS_CACHE_TTL)
+    return result
 
 
 @router.post("/compare", response_model=VideoCompareResponse)
@@ -357,16 +393,17 @@ class CommentListResponse(BaseModel):
     items: List[CommentResponse]
 
 
-def get_sentiment_label(score: Optional[float]) -> Optional[str]:
-    """根据情感分数计算情感标签"""
-    if score is None:
-        return None
-    if score > 0.6:
-        return "positive"
-    elif score < 0.4:
-        return "negative"
-    else:
-        return "neutral"
+SENTIMENT_LABELS = np.array(["negative", "neutral", "positive"], dtype=object)
+
+
+def get_sentiment_labels(scores: List[Optional[float]]) -> List[Optional[str]]:
+    """根据情感分数批量计算情感标签（>0.6 正面，<0.4 负面，None 保持为 None）"""
+    arr = np.array([np.nan if s is None else s for s in scores], dtype=float)
+    # 区间为 [0, 0.4) / [0.4, 0.6] / (0.6, 1]，两端开闭不同，直接用比较结果求和作为下标
+    idx = (arr >= 0.4).astype(np.intp) + (arr > 0.6)
+    labels = SENTIMENT_LABELS[idx]
+    labels[np.isnan(arr)] = None
+    return labels.tolist()
 
 
 @router.get("/{bvid}/comments", response_model=CommentListResponse)
@@ -374,7 +411,7 @@ def get_video_comments(
     bvid: str,
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
-    sort_by: str = Query("created_at", regex="^(like_count|created_at)$"),
+    sort_by: str = Query("created_at", regex=order_pattern(COMMENT_ORDER_COLUMNS)),
     db: Session = Depends(get_db)
 ):
     """获取视频评论列表"""
@@ -390,23 +427,24 @@ def get_video_comments(
     total = query.count()
 
     # 排序
-    order_column = getattr(Comment, sort_by)
+    order_column = COMMENT_ORDER_COLUMNS[sort_by]
     query = query.order_by(order_column.desc())
 
     # 分页
     offset = (page - 1) * page_size
     comments = query.offset(offset).limit(page_size).all()
 
-    # 添加情感标签
+    # 添加情感标签（整页一次性计算）
+    labels = get_sentiment_labels([c.sentiment_score for c in comments])
     items = []
-    for comment in comments:
+    for comment, label in zip(comments, labels):
         item = CommentResponse(
             id=comment.id,
             rpid=comment.rpid,
             content=comment.content,
             user_name=comment.user_name,
             sentiment_score=comment.sentiment_score,
-            sentiment_label=get_sentiment_label(comment.sentiment_score),
+            sentiment_label=label,
             like_count=comment.like_count or 0,
             created_at=comment.created_at
         )
@@ -530,7 +568,7 @@ def export_videos_csv(
     keyword: Optional[str] = None,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
-    order_by: str = Query("play_count", regex="^(play_count|like_count|publish_time|coin_count|comment_count|danmaku_count|favorite_count)$"),
+    order_by: str = Query("play_count", regex=order_pattern(VIDEO_ORDER_COLUMNS)),
     db: Session = Depends(get_db)
 ):
     """导出视频数据为CSV"""
@@ -547,7 +585,7 @@ def export_videos_csv(
         query = query.filter(Video.publish_time <= end_date)
 
     # 排序
-    order_column = getattr(Video, order_by)
+    order_column = VIDEO_ORDER_COLUMNS[order_by]
     query = query.order_by(order_column.desc())
 
     # 限制最大导出数量
@@ -30,6 +30,9 @@ class Settings(BaseSettings):
     EMOTION_DEVICE: str = "cpu"
     EMOTION_MAX_LENGTH: int = 256
     EMOTION_BATCH_SIZE: int = 16
+    EMOTION_FP16: bool = True  # GPU 上以半精度加载模型
+    EMOTION_NUM_THREADS: int = 0  # CPU 推理线程数，0 表示沿用 torch 默认
+    EMOTION_ONNX_PATH: str = ""  # ONNX 导出目录，配置后优先用 ONNX Runtime 推理
 
     class Config:
         env_file = ".env"
@@ -5,20 +5,50 @@ ETL任务基类
 """
 from abc import ABC, abstractmethod
 from datetime import date, datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+from sqlalchemy.dialects.mysql import insert as mysql_insert
 from sqlalchemy.orm import Session
 import logging
 
 logger = logging.getLogger(__name__)
 
+# IN 子句单批参数上限，避免超出数据库参数数量限制
+IN_CLAUSE_BATCH_SIZE = 1000
+
+# 批量写入时每条语句的行数
+WRITE_BATCH_SIZE = 1000
+
+
+def iter_chunks(items: Sequence, size: int = IN_CLAUSE_BATCH_SIZE) -> Iterator[Sequence]:
+    """
+    按固定大小切分序列
+
+    Args:
+        items: 待切分序列
+        size: 每批大小
+
+    Yields:
+        序列切片
+    """
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
 
 class ETLTask(ABC):
     """
     ETL任务基类
 
     子类需要实现 extract、transform、load 三个方法
+
+    流式任务（streaming = True）的 extract 返回分块迭代器，
+    run 逐块执行 transform/load，避免一次性把全量数据载入内存
     """
 
+    # 是否按块流式处理
+    streaming = False
+    # 流式读取每块行数
+    chunk_size = 5000
+
     def __init__(self, db: Session):
         self.db = db
         self.task_name = self.__class__.__name__
@@ -36,7 +66,7 @@ class ETLTask(ABC):
             stat_date: 统计日期
 
         Returns:
-            抽取的原始数据
+            抽取的原始数据；流式任务返回按块产出的迭代器
         """
         pass
 
@@ -81,17 +111,20 @@ class ETLTask(ABC):
         logger.info(f"[{self.task_name}] 开始执行，日期: {stat_date}")
 
         try:
-            # Extract - 抽取
-            raw_data = self.extract(stat_date)
-            extract_count = len(raw_data) if hasattr(raw_data, '__len__') else 0
-            logger.info(f"[{self.task_name}] 抽取完成，记录数: {extract_count}")
-
-            # Transform - 转换
-            transformed_data = self.transform(raw_data)
-            logger.info(f"[{self.task_name}] 转换完成")
-
-            # Load - 加载
-            self.records_processed = self.load(transformed_data, stat_date)
+            if self.streaming:
+                self.records_processed = self._run_chunks(stat_date)
+            else:
+                # Extract - 抽取
+                raw_data = self.extract(stat_date)
+                extract_count = len(raw_data) if hasattr(raw_data, '__len__') else 0
+                logger.info(f"[{self.task_name}] 抽取完成，记录数: {extract_count}")
+
+                # Transform - 转换
+                transformed_data = self.transform(raw_data)
+                logger.info(f"[{self.task_name}] 转换完成")
+
+                # Load - 加载
+                self.records_processed = self.load(transformed_data, stat_date)
             logger.info(f"[{self.task_name}] 加载完成，处理记录: {self.records_processed}")
 
             # 提交事务
@@ -117,7 +150,96 @@ class ETLTask(ABC):
             "errors": self.errors
         }
 
-    def _safe_divide(self, numerator: float, denominator: float, default: float = 0) -> float:
+    def _run_chunks(self, stat_date: date) -> int:
+        """
+        流式执行：逐块 transform/load，块之间 flush 并清空会话标识映射，
+        避免已写入块的 ORM 对象常驻内存
+
+        Args:
+            stat_date: 统计日期
+
+        Returns:
+            处理的记录数
+        """
+        extract_count = 0
+        processed = 0
+        for chunk in self.extract(stat_date):
+            extract_count += len(chunk)
+            processed += self.load(self.transform(chunk), stat_date)
+            self.db.flush()
+            self.db.expunge_all()
+        logger.info(f"[{self.task_name}] 流式抽取完成，记录数: {extract_count}")
+        return processed
+
+    def _stream(self, stmt) -> Iterator[List]:
+        """
+        以服务端游标分块读取查询结果
+
+        使用独立连接：MySQL 的流式游标未读完前，同一连接无法执行其他语句，
+        而 load 需要在 self.db 上继续写入。
+
+        Args:
+            stmt: select 语句
+
+        Yields:
+            每块最多 chunk_size 行
+        """
+        with self.db.get_bind().connect() as conn:
+            result = conn.execution_options(
+                stream_results=True, yield_per=self.chunk_size
+            ).execute(stmt)
+            for partition in result.partitions():
+                yield partition
+
+    def _upsert(self, model, rows: List[Dict], update_cols: Optional[Sequence[str]] = None,
+                batch_size: int = WRITE_BATCH_SIZE) -> int:
+        """
+        按唯一键批量 UPSERT（INSERT ... ON DUPLICATE KEY UPDATE），省去逐行存在性查询
+
+        Args:
+            model: ORM 模型类（需有对应唯一约束）
+            rows: 字段字典列表
+            update_cols: 冲突时更新的字段；为空时使用 INSERT IGNORE，冲突行保持不变
+            batch_size: 每条语句的行数
+
+        Returns:
+            数据库报告的影响行数（仅在 update_cols 为空时等于新增行数）
+        """
+        affected = 0
+        for batch in iter_chunks(rows, batch_size):
+            stmt = mysql_insert(model.__table__).values(list(batch))
+            if update_cols:
+                stmt = stmt.on_duplicate_key_update({c: stmt.inserted[c] for c in update_cols})
+            else:
+                stmt = stmt.prefix_with("IGNORE")
+            affected += self.db.execute(stmt).rowcount
+        return affected
+
+    def _replace_day(self, model, date_column, stat_date: date, rows: List[Dict],
+                     batch_size: int = WRITE_BATCH_SIZE) -> int:
+        """
+        整日覆盖写入：先删除当日数据，再批量插入
+
+        适用于可由 DWD 层完整重算的汇总表，同时清理当日已不存在的旧分组。
+
+        Args:
+            model: ORM 模型类
+            date_column: 日期列（如 DwsSentimentDaily.stat_date）
+            stat_date: 统计日期
+            rows: 字段字典列表
+            batch_size: 每批条数
+
+        Returns:
+            插入的记录数
+        """
+        table = model.__table__
+        self.db.execute(table.delete().where(date_column == stat_date))
+        for batch in iter_chunks(rows, batch_size):
+            self.db.execute(table.insert(), list(batch))
+        return len(rows)
+
+    @staticmethod
+    def _safe_divide(numerator: float, denominator: float, default: float = 0) -> float:
         """
         安全除法，避免除零错误
 
@@ -129,6 +251,4 @@ class ETLTask(ABC):
         Returns:
             除法结果或默认值
         """
-        if denominator == 0:
-            return default
-        return numerator / denominator
+        return numerator / denominator if denominator else default
@@ -6,14 +6,28 @@ DWD层ETL任务
 - CommentDailyETL: 评论每日增量ETL
 """
 from datetime import date, datetime, timedelta
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional
+import numpy as np
+from sqlalchemy import bindparam, select
 from sqlalchemy.orm import Session
 
-from app.etl.base import ETLTask
+from app.etl.base import ETLTask, iter_chunks
 from app.models.models import Video, Comment
 from app.models.warehouse import DwdVideoSnapshot, DwdCommentDaily
 
 
+# 按日期批量查询快照增量基数（模块级构建一次，复用编译缓存）
+_SNAPSHOT_MAP_STMT = select(
+    DwdVideoSnapshot.video_id,
+    DwdVideoSnapshot.play_count,
+    DwdVideoSnapshot.like_count,
+    DwdVideoSnapshot.comment_count
+).where(
+    DwdVideoSnapshot.snapshot_date == bindparam("snapshot_date"),
+    DwdVideoSnapshot.video_id.in_(bindparam("video_ids", expanding=True))
+)
+
+
 class VideoSnapshotETL(ETLTask):
     """
     视频快照ETL
@@ -22,48 +36,87 @@ class VideoSnapshotETL(ETLTask):
     数据流：videos → dwd_video_snapshot
     """
 
-    def extract(self, stat_date: date) -> List[Video]:
-        """从videos表抽取当前所有视频数据"""
-        videos = self.db.query(Video).all()
-        return videos
-
-    def transform(self, videos: List[Video]) -> List[Dict]:
-        """计算衍生指标"""
-        result = []
-        for video in videos:
-            play = video.play_count or 0
-
-            # 计算互动率：(点赞+投币+分享+收藏) / 播放量
-            interaction = (
-                (video.like_count or 0) +
-                (video.coin_count or 0) +
-                (video.share_count or 0) +
-                (video.favorite_count or 0)
+    streaming = True
+
+    # 重复执行同一天时需要刷新的字段
+    SNAPSHOT_UPDATE_COLUMNS = (
+        "play_count", "like_count", "coin_count", "share_count",
+        "favorite_count", "danmaku_count", "comment_count",
+        "interaction_rate", "like_rate",
+        "play_increment", "like_increment", "comment_increment",
+    )
+
+    def extract(self, stat_date: date) -> Iterator[List]:
+        """从videos表分块抽取当前所有视频数据（只取快照需要的列）"""
+        stmt = select(
+            Video.id,
+            Video.bvid,
+            Video.title,
+            Video.category,
+            Video.author_id,
+            Video.author_name,
+            Video.play_count,
+            Video.like_count,
+            Video.coin_count,
+            Video.share_count,
+            Video.favorite_count,
+            Video.danmaku_count,
+            Video.comment_count,
+            Video.publish_time,
+            Video.duration
+        ).order_by(Video.id)
+        return self._stream(stmt)
+
+    def transform(self, videos: List) -> List[Dict]:
+        """计算衍生指标（整列向量化计算）"""
+        counts = np.array(
+            [(v.play_count or 0, v.like_count or 0, v.coin_count or 0,
+              v.share_count or 0, v.favorite_count or 0) for v in videos],
+            dtype=np.float64
+        ).reshape(-1, 5)
+        play = counts[:, 0]
+        like = counts[:, 1]
+
+        # 计算互动率：(点赞+投币+分享+收藏) / 播放量，播放量为0时取0
+        interaction = counts[:, 1:].sum(axis=1)
+        has_play = play != 0
+        interaction_rate = np.divide(interaction, play, out=np.zeros_like(play), where=has_play)
+        like_rate = np.divide(like, play, out=np.zeros_like(play), where=has_play)
+
+        return [
+            {"video": video, "interaction_rate": ir, "like_rate": lr}
+            for video, ir, lr in zip(
+                videos,
+                np.round(interaction_rate, 6).tolist(),
+                np.round(like_rate, 6).tolist()
             )
-            interaction_rate = self._safe_divide(interaction, play)
-            like_rate = self._safe_divide(video.like_count or 0, play)
-
-            result.append({
-                "video": video,
-                "interaction_rate": round(interaction_rate, 6),
-                "like_rate": round(like_rate, 6)
-            })
-
-        return result
+        ]
+
+    def _load_snapshot_map(self, snapshot_date: date, video_ids: List[int]) -> Dict[int, Any]:
+        """批量查询指定日期的快照，返回 {video_id: 快照行}"""
+        snapshot_map = {}
+        for ids in iter_chunks(video_ids):
+            snapshots = self.db.execute(
+                _SNAPSHOT_MAP_STMT, {"snapshot_date": snapshot_date, "video_ids": ids}
+            ).all()
+            for snapshot in snapshots:
+                snapshot_map[snapshot.video_id] = snapshot
+        return snapshot_map
 
     def load(self, data: List[Dict], stat_date: date) -> int:
         """写入快照表，计算增量"""
         yesterday = stat_date - timedelta(days=1)
-        count = 0
 
+        # 一次性预取昨日快照，避免逐视频查询
+        video_ids = [item["video"].id for item in data]
+        yesterday_map = self._load_snapshot_map(yesterday, video_ids)
+
+        rows = []
         for item in data:
             video = item["video"]
 
-            # 查询昨日快照，计算增量
-            yesterday_snapshot = self.db.query(DwdVideoSnapshot).filter(
-                DwdVideoSnapshot.video_id == video.id,
-                DwdVideoSnapshot.snapshot_date == yesterday
-            ).first()
+            # 昨日快照，计算增量
+            yesterday_snapshot = yesterday_map.get(video.id)
 
             play_increment = 0
             like_increment = 0
@@ -74,56 +127,36 @@ class VideoSnapshotETL(ETLTask):
                 like_increment = (video.like_count or 0) - (yesterday_snapshot.like_count or 0)
                 comment_increment = (video.comment_count or 0) - (yesterday_snapshot.comment_count or 0)
 
-            # 检查今日是否已存在
-            existing = self.db.query(DwdVideoSnapshot).filter(
-                DwdVideoSnapshot.video_id == video.id,
-                DwdVideoSnapshot.snapshot_date == stat_date
-            ).first()
-
-            if existing:
-                # 更新已存在的快照
-                existing.play_count = video.play_count
-                existing.like_count = video.like_count
-                existing.coin_count = video.coin_count
-                existing.share_count = video.share_count
-                existing.favorite_count = video.favorite_count
-                existing.danmaku_count = video.danmaku_count
-                existing.comment_count = video.comment_count
-                existing.interaction_rate = item["interaction_rate"]
-                existing.like_rate = item["like_rate"]
-                existing.play_increment = play_increment
-                existing.like_increment = like_increment
-                existing.comment_increment = comment_increment
-            else:
-                # 新增快照
-                snapshot = DwdVideoSnapshot(
-                    snapshot_date=stat_date,
-                    video_id=video.id,
-                    bvid=video.bvid,
-                    title=video.title,
-                    category=video.category,
-                    author_id=video.author_id,
-                    author_name=video.author_name,
-                    play_count=video.play_count,
-                    like_count=video.like_count,
-                    coin_count=video.coin_count,
-                    share_count=video.share_count,
-                    favorite_count=video.favorite_count,
-                    danmaku_count=video.danmaku_count,
-                    comment_count=video.comment_count,
-                    interaction_rate=item["interaction_rate"],
-                    like_rate=item["like_rate"],
-                    play_increment=play_increment,
-                    like_increment=like_increment,
-                    comment_increment=comment_increment,
-                    publish_time=video.publish_time,
-                    duration=video.duration
-                )
-                self.db.add(snapshot)
-
-            count += 1
-
-        return count
+            rows.append({
+                "snapshot_date": stat_date,
+                "video_id": video.id,
+                "bvid": video.bvid,
+                "title": video.title,
+                "category": video.category,
+                "author_id": video.author_id,
+                "author_name": video.author_name,
+                "play_count": video.play_count,
+                "like_count": video.like_count,
+                "coin_count": video.coin_count,
+                "share_count": video.share_count,
+                "favorite_count": video.favorite_count,
+                "danmaku_count": video.danmaku_count,
+                "comment_count": video.comment_count,
+                "interaction_rate": item["interaction_rate"],
+                "like_rate": item["like_rate"],
+                "play_increment": play_increment,
+                "like_increment": like_increment,
+                "comment_increment": comment_increment,
+                "publish_time": video.publish_time,
+                "duration": video.duration
+            })
+
+        # 今日快照已存在时只刷新统计字段
+        self._upsert(
+            DwdVideoSnapshot, rows,
+            update_cols=self.SNAPSHOT_UPDATE_COLUMNS
+        )
+        return len(rows)
 
 
 class CommentDailyETL(ETLTask):
@@ -134,70 +167,71 @@ class CommentDailyETL(ETLTask):
     数据流：comments → dwd_comment_daily
     """
 
-    def extract(self, stat_date: date) -> List[Comment]:
-        """抽取当日新增评论"""
+    streaming = True
+
+    def extract(self, stat_date: date) -> Iterator[List]:
+        """分块抽取当日新增评论（连带所属视频的 bvid/分区）"""
         start_dt = datetime.combine(stat_date, datetime.min.time())
         end_dt = datetime.combine(stat_date, datetime.max.time())
 
-        comments = self.db.query(Comment).filter(
+        stmt = select(
+            Comment.id,
+            Comment.rpid,
+            Comment.video_id,
+            Video.bvid,
+            Video.category,
+            Comment.content,
+            Comment.user_name,
+            Comment.sentiment_score,
+            Comment.like_count
+        ).outerjoin(
+            Video, Video.id == Comment.video_id
+        ).where(
             Comment.created_at >= start_dt,
             Comment.created_at <= end_dt
-        ).all()
-
-        return comments
-
-    def transform(self, comments: List[Comment]) -> List[Dict]:
-        """转换情感标签"""
-        result = []
-        for comment in comments:
-            score = comment.sentiment_score or 0.5
-
-            # 情感分类阈值
-            if score >= 0.6:
-                label = "positive"
-            elif score <= 0.4:
-                label = "negative"
-            else:
-                label = "neutral"
-
-            result.append({
-                "comment": comment,
-                "sentiment_label": label
-            })
-
-        return result
+        ).order_by(Comment.id)
+        return self._stream(stmt)
+
+    def transform(self, comments: List) -> List[Dict]:
+        """转换情感标签（向量化分类）"""
+        if not comments:
+            return []
+
+        # 未分析的评论按中性分 0.5 处理
+        scores = np.fromiter(
+            (comment.sentiment_score or 0.5 for comment in comments),
+            dtype=np.float64, count=len(comments)
+        )
+
+        # 情感分类阈值
+        labels = np.select(
+            [scores >= 0.6, scores <= 0.4],
+            ["positive", "negative"],
+            default="neutral"
+        ).tolist()
+
+        return [
+            {"comment": comment, "sentiment_label": label}
+            for comment, label in zip(comments, labels)
+        ]
 
     def load(self, data: List[Dict], stat_date: date) -> int:
-        """写入评论每日增量表"""
-        count = 0
-
+        """写入评论每日增量表（已存在的评论保持不变）"""
+        rows = []
         for item in data:
             comment = item["comment"]
+            rows.append({
+                "stat_date": stat_date,
+                "comment_id": comment.id,
+                "rpid": comment.rpid,
+                "video_id": comment.video_id,
+                "bvid": comment.bvid,
+                "category": comment.category,
+                "content": comment.content,
+                "user_name": comment.user_name,
+                "sentiment_score": comment.sentiment_score,
+                "sentiment_label": item["sentiment_label"],
+                "like_count": comment.like_count
+            })
 
-            # 查询视频分区
-            video = self.db.query(Video).filter(Video.id == comment.video_id).first()
-
-            # 检查是否已存在
-            existing = self.db.query(DwdCommentDaily).filter(
-                DwdCommentDaily.comment_id == comment.id,
-                DwdCommentDaily.stat_date == stat_date
-            ).first()
-
-            if not existing:
-                daily = DwdCommentDaily(
-                    stat_date=stat_date,
-                    comment_id=comment.id,
-                    rpid=comment.rpid,
-                    video_id=comment.video_id,
-                    bvid=video.bvid if video else None,
-                    category=video.category if video else None,
-                    content=comment.content,
-                    user_name=comment.user_name,
-                    sentiment_score=comment.sentiment_score,
-                    sentiment_label=item["sentiment_label"],
-                    like_count=comment.like_count
-                )
-                self.db.add(daily)
-                count += 1
-
-        return count
+        return self._upsert(DwdCommentDaily, rows)
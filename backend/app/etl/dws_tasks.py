@@ -8,10 +8,12 @@ DWS层ETL任务
 - VideoTrendETL: 视频热度趋势ETL
 """
 from collections import defaultdict
-from datetime import date, timedelta
+from datetime import date, datetime, timedelta
 from typing import Any, Dict, List
-from sqlalchemy import func
-from sqlalchemy.orm import Session
+import numpy as np
+import pandas as pd
+from sqlalchemy import and_, bindparam, case, func, select
+from sqlalchemy.orm import Session, aliased
 
 from app.etl.base import ETLTask
 from app.models.warehouse import (
@@ -24,6 +26,50 @@ from app.models.warehouse import (
 )
 
 
+# 趋势窗口内按视频聚合：快照数、首末快照日期、平均互动率
+_TREND_WINDOW = select(
+    DwdVideoSnapshot.video_id,
+    func.count(DwdVideoSnapshot.id).label("snapshot_count"),
+    func.min(DwdVideoSnapshot.snapshot_date).label("first_date"),
+    func.max(DwdVideoSnapshot.snapshot_date).label("last_date"),
+    func.avg(func.coalesce(DwdVideoSnapshot.interaction_rate, 0)).label("avg_rate")
+).where(
+    DwdVideoSnapshot.snapshot_date >= bindparam("start_date"),
+    DwdVideoSnapshot.snapshot_date <= bindparam("end_date")
+).group_by(
+    DwdVideoSnapshot.video_id
+).having(
+    func.count(DwdVideoSnapshot.id) >= 2
+).subquery("trend_window")
+
+_FirstSnapshot = aliased(DwdVideoSnapshot, name="first_snapshot")
+_LastSnapshot = aliased(DwdVideoSnapshot, name="last_snapshot")
+
+# 每个视频一行：窗口聚合 + 首末快照的播放/点赞数（模块级构建一次，复用编译缓存）
+_TREND_SNAPSHOT_STMT = select(
+    _TREND_WINDOW.c.video_id,
+    _LastSnapshot.bvid,
+    _TREND_WINDOW.c.snapshot_count,
+    _FirstSnapshot.play_count.label("first_play"),
+    _LastSnapshot.play_count.label("last_play"),
+    _FirstSnapshot.like_count.label("first_like"),
+    _LastSnapshot.like_count.label("last_like"),
+    _TREND_WINDOW.c.avg_rate
+).join(
+    _FirstSnapshot, and_(
+        _FirstSnapshot.video_id == _TREND_WINDOW.c.video_id,
+        _FirstSnapshot.snapshot_date == _TREND_WINDOW.c.first_date
+    )
+).join(
+    _LastSnapshot, and_(
+        _LastSnapshot.video_id == _TREND_WINDOW.c.video_id,
+        _LastSnapshot.snapshot_date == _TREND_WINDOW.c.last_date
+    )
+).order_by(
+    _TREND_WINDOW.c.video_id
+)
+
+
 class StatsDailyETL(ETLTask):
     """
     每日全局统计ETL
@@ -33,60 +79,62 @@ class StatsDailyETL(ETLTask):
     """
 
     def extract(self, stat_date: date) -> Dict:
-        """从DWD层抽取当日数据"""
-        snapshots = self.db.query(DwdVideoSnapshot).filter(
+        """在数据库端完成当日聚合，只返回汇总结果"""
+        totals = self.db.query(
+            func.count(DwdVideoSnapshot.id).label('video_count'),
+            func.sum(DwdVideoSnapshot.play_count).label('play'),
+            func.sum(DwdVideoSnapshot.like_count).label('like'),
+            func.sum(DwdVideoSnapshot.coin_count).label('coin'),
+            func.sum(DwdVideoSnapshot.danmaku_count).label('danmaku'),
+            func.sum(DwdVideoSnapshot.comment_count).label('comments'),
+            func.sum(DwdVideoSnapshot.play_increment).label('play_inc'),
+            func.sum(DwdVideoSnapshot.like_increment).label('like_inc'),
+            func.sum(func.coalesce(DwdVideoSnapshot.interaction_rate, 0)).label('rate_sum'),
+            # 新视频：播放增量等于播放总数的视频（首次记录）
+            func.sum(case(
+                (and_(
+                    DwdVideoSnapshot.play_increment == DwdVideoSnapshot.play_count,
+                    DwdVideoSnapshot.play_count > 0
+                ), 1),
+                else_=0
+            )).label('new_videos')
+        ).filter(
             DwdVideoSnapshot.snapshot_date == stat_date
-        ).all()
+        ).one()
 
-        comments = self.db.query(DwdCommentDaily).filter(
+        new_comments = self.db.query(func.count(DwdCommentDaily.id)).filter(
             DwdCommentDaily.stat_date == stat_date
-        ).all()
+        ).scalar()
 
-        return {"snapshots": snapshots, "comments": comments}
+        return {"totals": totals, "new_comments": new_comments}
 
     def transform(self, data: Dict) -> Dict:
-        """聚合计算"""
-        snapshots = data["snapshots"]
-        comments = data["comments"]
+        """计算平均值并格式化"""
+        totals = data["totals"]
+        video_count = totals.video_count
 
-        if not snapshots:
+        if not video_count:
             return None
 
-        # 累计指标
-        total_play = sum(s.play_count or 0 for s in snapshots)
-        total_like = sum(s.like_count or 0 for s in snapshots)
-        total_coin = sum(s.coin_count or 0 for s in snapshots)
-        total_danmaku = sum(s.danmaku_count or 0 for s in snapshots)
-        total_comments = sum(s.comment_count or 0 for s in snapshots)
-
-        # 增量指标
-        play_increment = sum(s.play_increment or 0 for s in snapshots)
-        like_increment = sum(s.like_increment or 0 for s in snapshots)
-        new_comments = len(comments)
+        # MySQL 对整数列 SUM 返回 Decimal，统一转换
+        total_play = int(totals.play or 0)
+        total_like = int(totals.like or 0)
 
-        # 新视频：播放增量等于播放总数的视频（首次记录）
-        new_videos = len([s for s in snapshots if s.play_increment == s.play_count and s.play_count > 0])
-
-        # 平均值
-        video_count = len(snapshots)
         avg_play = self._safe_divide(total_play, video_count)
         avg_like = self._safe_divide(total_like, video_count)
-        avg_interaction = self._safe_divide(
-            sum(s.interaction_rate or 0 for s in snapshots),
-            video_count
-        )
+        avg_interaction = self._safe_divide(float(totals.rate_sum or 0), video_count)
 
         return {
             "total_videos": video_count,
-            "total_comments": total_comments,
+            "total_comments": int(totals.comments or 0),
             "total_play_count": total_play,
             "total_like_count": total_like,
-            "total_coin_count": total_coin,
-            "total_danmaku_count": total_danmaku,
-            "new_videos": new_videos,
-            "new_comments": new_comments,
-            "play_increment": play_increment,
-            "like_increment": like_increment,
+            "total_coin_count": int(totals.coin or 0),
+            "total_danmaku_count": int(totals.danmaku or 0),
+            "new_videos": int(totals.new_videos or 0),
+            "new_comments": data["new_comments"] or 0,
+            "play_increment": int(totals.play_inc or 0),
+            "like_increment": int(totals.like_inc or 0),
             "avg_play_count": round(avg_play, 2),
             "avg_like_count": round(avg_like, 2),
             "avg_interaction_rate": round(avg_interaction, 6)
@@ -97,19 +145,12 @@ class StatsDailyETL(ETLTask):
         if not data:
             return 0
 
-        existing = self.db.query(DwsStatsDaily).filter(
-            DwsStatsDaily.stat_date == stat_date
-        ).first()
-
-        if existing:
-            # 更新
-            for key, value in data.items():
-                setattr(existing, key, value)
-        else:
-            # 新增
-            stats = DwsStatsDaily(stat_date=stat_date, **data)
-            self.db.add(stats)
-
+        # ON DUPLICATE KEY UPDATE 不会触发 onupdate，显式写入更新时间
+        row = {"stat_date": stat_date, "updated_at": datetime.utcnow(), **data}
+        self._upsert(
+            DwsStatsDaily, [row],
+            update_cols=[k for k in row if k != "stat_date"]
+        )
         return 1
 
 
@@ -154,29 +195,8 @@ class CategoryDailyETL(ETLTask):
 
     def load(self, data: List[Dict], stat_date: date) -> int:
         """写入每日分区统计表"""
-        count = 0
-        for item in data:
-            category = item.pop("category")
-
-            existing = self.db.query(DwsCategoryDaily).filter(
-                DwsCategoryDaily.stat_date == stat_date,
-                DwsCategoryDaily.category == category
-            ).first()
-
-            if existing:
-                for key, value in item.items():
-                    setattr(existing, key, value)
-            else:
-                cat_stats = DwsCategoryDaily(
-                    stat_date=stat_date,
-                    category=category,
-                    **item
-                )
-                self.db.add(cat_stats)
-
-            count += 1
-
-        return count
+        rows = [{"stat_date": stat_date, **item} for item in data]
+        return self._replace_day(DwsCategoryDaily, DwsCategoryDaily.stat_date, stat_date, rows)
 
 
 class SentimentDailyETL(ETLTask):
@@ -277,17 +297,12 @@ class SentimentDailyETL(ETLTask):
 
     def load(self, data: List[Dict], stat_date: date) -> int:
         """写入每日情感统计表"""
-        count = 0
+        rows = []
         for item in data:
-            category = item["category"]
             total = item["total"]
-
-            existing = self.db.query(DwsSentimentDaily).filter(
-                DwsSentimentDaily.stat_date == stat_date,
-                DwsSentimentDaily.category == category
-            ).first()
-
-            sentiment_data = {
+            rows.append({
+                "stat_date": stat_date,
+                "category": item["category"],
                 "positive_count": item["positive"],
                 "neutral_count": item["neutral"],
                 "negative_count": item["negative"],
@@ -296,22 +311,9 @@ class SentimentDailyETL(ETLTask):
                 "neutral_rate": round(self._safe_divide(item["neutral"], total), 4),
                 "negative_rate": round(self._safe_divide(item["negative"], total), 4),
                 "avg_sentiment_score": round(item.get("avg_score", 0.5), 4)
-            }
-
-            if existing:
-                for key, value in sentiment_data.items():
-                    setattr(existing, key, value)
-            else:
-                sentiment = DwsSentimentDaily(
-                    stat_date=stat_date,
-                    category=category,
-                    **sentiment_data
-                )
-                self.db.add(sentiment)
-
-            count += 1
+            })
 
-        return count
+        return self._replace_day(DwsSentimentDaily, DwsSentimentDaily.stat_date, stat_date, rows)
 
 
 class VideoTrendETL(ETLTask):
@@ -327,106 +329,84 @@ class VideoTrendETL(ETLTask):
         self.trend_days = trend_days
 
     def extract(self, stat_date: date) -> List:
-        """抽取最近N天的视频快照"""
+        """在数据库端按视频聚合最近N天的快照，每个视频只返回一行"""
         start_date = stat_date - timedelta(days=self.trend_days)
 
-        videos = self.db.query(
-            DwdVideoSnapshot.video_id,
-            DwdVideoSnapshot.bvid,
-            DwdVideoSnapshot.snapshot_date,
-            DwdVideoSnapshot.play_count,
-            DwdVideoSnapshot.like_count,
-            DwdVideoSnapshot.interaction_rate
-        ).filter(
-            DwdVideoSnapshot.snapshot_date >= start_date,
-            DwdVideoSnapshot.snapshot_date <= stat_date
-        ).order_by(
-            DwdVideoSnapshot.video_id,
-            DwdVideoSnapshot.snapshot_date
+        videos = self.db.execute(
+            _TREND_SNAPSHOT_STMT, {"start_date": start_date, "end_date": stat_date}
         ).all()
 
         return videos
 
     def transform(self, data: List) -> List[Dict]:
-        """计算趋势指标"""
-        # 按视频分组
-        video_data = defaultdict(list)
-        for r in data:
-            video_data[r.video_id].append({
-                "bvid": r.bvid,
-                "date": r.snapshot_date,
-                "play": r.play_count or 0,
-                "like": r.like_count or 0,
-                "rate": r.interaction_rate or 0
-            })
-
-        result = []
-        for video_id, snapshots in video_data.items():
-            if len(snapshots) < 2:
-                continue
-
-            # 排序
-            snapshots.sort(key=lambda x: x["date"])
-            first = snapshots[0]
-            last = snapshots[-1]
-
-            # 计算增长率
-            play_trend = self._safe_divide(last["play"] - first["play"], first["play"])
-            like_trend = self._safe_divide(last["like"] - first["like"], first["like"])
+        """计算趋势指标（向量化计算）"""
+        grouped = pd.DataFrame.from_records(
+            data, columns=["video_id", "bvid", "snapshot_count", "first_play",
+                           "last_play", "first_like", "last_like", "avg_rate"]
+        )
+        if grouped.empty:
+            return []
 
-            # 综合热度分 = 播放增长 * 0.5 + 点赞增长 * 0.3 + 平均互动率 * 0.2
-            avg_rate = sum(s["rate"] for s in snapshots) / len(snapshots)
-            heat_score = play_trend * 0.5 + like_trend * 0.3 + avg_rate * 100 * 0.2
+        grouped = grouped.fillna(0)
 
-            result.append({
-                "video_id": video_id,
-                "bvid": last["bvid"],
-                "play_trend": round(play_trend, 4),
-                "like_trend": round(like_trend, 4),
-                "heat_score": round(heat_score, 4)
-            })
-
-        # 计算排名
-        result.sort(key=lambda x: x["heat_score"], reverse=True)
-        for i, item in enumerate(result):
-            item["rank_by_heat"] = i + 1
+        # 计算增长率（首日为0时记为0）
+        first_play = grouped["first_play"].to_numpy(dtype=np.float64)
+        first_like = grouped["first_like"].to_numpy(dtype=np.float64)
+        play_trend = np.divide(
+            grouped["last_play"].to_numpy(dtype=np.float64) - first_play, first_play,
+            out=np.zeros_like(first_play), where=first_play != 0
+        )
+        like_trend = np.divide(
+            grouped["last_like"].to_numpy(dtype=np.float64) - first_like, first_like,
+            out=np.zeros_like(first_like), where=first_like != 0
+        )
 
-        result.sort(key=lambda x: x["play_trend"], reverse=True)
-        for i, item in enumerate(result):
-            item["rank_by_play"] = i + 1
+        # 综合热度分 = 播放增长 * 0.5 + 点赞增长 * 0.3 + 平均互动率 * 0.2
+        heat_score = play_trend * 0.5 + like_trend * 0.3 + grouped["avg_rate"].to_numpy(dtype=np.float64) * 100 * 0.2
+
+        play_trend = np.round(play_trend, 4)
+        heat_score = np.round(heat_score, 4)
+        grouped["play_trend"] = play_trend
+        grouped["like_trend"] = np.round(like_trend, 4)
+        grouped["heat_score"] = heat_score
+
+        # 计算排名（稳定排序：并列时热度榜按视频ID、播放榜按热度排名先后）
+        positions = np.arange(1, len(grouped) + 1)
+        heat_order = np.argsort(-heat_score, kind="stable")
+        play_order = heat_order[np.argsort(-play_trend[heat_order], kind="stable")]
+        rank_by_heat = np.empty(len(grouped), dtype=np.int64)
+        rank_by_play = np.empty(len(grouped), dtype=np.int64)
+        rank_by_heat[heat_order] = positions
+        rank_by_play[play_order] = positions
+        grouped["rank_by_heat"] = rank_by_heat
+        grouped["rank_by_play"] = rank_by_play
 
-        return result
+        return [{
+            "video_id": int(r.video_id),
+            "bvid": r.bvid,
+            "play_trend": float(r.play_trend),
+            "like_trend": float(r.like_trend),
+            "heat_score": float(r.heat_score),
+            "rank_by_heat": int(r.rank_by_heat),
+            "rank_by_play": int(r.rank_by_play)
+        } for r in grouped.itertuples(index=False)]
 
     def load(self, data: List[Dict], stat_date: date) -> int:
         """写入视频热度趋势表"""
-        count = 0
-        for item in data:
-            existing = self.db.query(DwsVideoTrend).filter(
-                DwsVideoTrend.video_id == item["video_id"],
-                DwsVideoTrend.trend_date == stat_date
-            ).first()
-
-            trend_data = {
-                "play_trend": item["play_trend"],
-                "like_trend": item["like_trend"],
-                "heat_score": item["heat_score"],
-                "rank_by_play": item["rank_by_play"],
-                "rank_by_heat": item["rank_by_heat"]
-            }
-
-            if existing:
-                for key, value in trend_data.items():
-                    setattr(existing, key, value)
-            else:
-                trend = DwsVideoTrend(
-                    video_id=item["video_id"],
-                    bvid=item["bvid"],
-                    trend_date=stat_date,
-                    trend_days=self.trend_days,
-                    **trend_data
-                )
-                self.db.add(trend)
-
-            count += 1
-
-        return count
+        rows = [{
+            "video_id": item["video_id"],
+            "bvid": item["bvid"],
+            "trend_date": stat_date,
+            "trend_days": self.trend_days,
+            "play_trend": item["play_trend"],
+            "like_trend": item["like_trend"],
+            "heat_score": item["heat_score"],
+            "rank_by_play": item["rank_by_play"],
+            "rank_by_heat": item["rank_by_heat"]
+        } for item in data]
+
+        self._upsert(
+            DwsVideoTrend, rows,
+            update_cols=("play_trend", "like_trend", "heat_score", "rank_by_play", "rank_by_heat")
+        )
+        return len(rows)
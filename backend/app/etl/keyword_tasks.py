@@ -5,30 +5,44 @@
 - KeywordDailyETL: 热词每日明细ETL（DWD层）
 - KeywordStatsETL: 热词聚合统计ETL（DWS层）
 """
-import json
 import logging
+import os
 from collections import defaultdict
 from datetime import date, datetime, timedelta
 from typing import Any, Dict, List, Optional
-from sqlalchemy import func, and_
-from sqlalchemy.dialects.mysql import insert as mysql_insert
+import numpy as np
+import orjson
+import pandas as pd
+from sqlalchemy import func, and_, case, select
 from sqlalchemy.orm import Session
 
 from app.etl.base import ETLTask
 from app.models.models import Video, Comment, Danmaku
 from app.models.warehouse import DwdKeywordDaily, DwsKeywordStats
-from app.services.nlp import NLPAnalyzer
+from app.services.nlp import TextKeywordsCache, get_nlp
 
 logger = logging.getLogger(__name__)
 
-UPSERT_CHUNK_SIZE = 1000
+# 唯一键冲突时更新的字段
+DWD_UPDATE_COLUMNS = (
+    "frequency", "video_count", "avg_sentiment", "sample_bvids", "created_at",
+)
+DWS_UPDATE_COLUMNS = (
+    "title_frequency", "comment_frequency", "danmaku_frequency", "total_frequency",
+    "video_count", "category_distribution", "avg_sentiment", "frequency_trend",
+    "rank_change", "heat_score", "created_at",
+)
+# 热词来源（顺序即来源编码）
+SOURCES = ("title", "comment", "danmaku")
+# 关键词提取的分词进程数
+KEYWORD_WORKERS = os.cpu_count() or 1
 MAX_DWD_WORD_LENGTH = DwdKeywordDaily.__table__.c.word.type.length or 50
 MAX_DWS_WORD_LENGTH = DwsKeywordStats.__table__.c.word.type.length or 50
 
 
-def _chunk_rows(rows: List[Dict[str, Any]], chunk_size: int = UPSERT_CHUNK_SIZE):
-    for i in range(0, len(rows), chunk_size):
-        yield rows[i:i + chunk_size]
+def _column_rows(matrix_csc, column: int):
+    """CSC 矩阵中某列的非零行号（递增），即包含该词的文本下标"""
+    return matrix_csc.indices[matrix_csc.indptr[column]:matrix_csc.indptr[column + 1]]
 
 
 def _normalize_word(word: Any, max_len: int) -> Optional[str]:
@@ -48,10 +62,16 @@ class KeywordDailyETL(ETLTask):
     数据流：videos, comments, danmakus → dwd_keyword_daily
     """
 
-    def __init__(self, db: Session, top_k: int = 200):
+    def __init__(self, db: Session, top_k: int = 200, workers: int = KEYWORD_WORKERS,
+                 text_keywords_cache: Optional[TextKeywordsCache] = None):
         super().__init__(db)
         self.top_k = top_k
-        self.nlp = NLPAnalyzer()
+        self.workers = workers
+        self.nlp = get_nlp()
+        # 单条文本关键词缓存：默认每次运行新建，随任务释放；回填时由调用方传入以跨天复用
+        if text_keywords_cache is None:
+            text_keywords_cache = TextKeywordsCache()
+        self.text_keywords_cache = text_keywords_cache
 
     def extract(self, stat_date: date) -> Dict:
         """
@@ -59,146 +79,184 @@ class KeywordDailyETL(ETLTask):
 
         全量模式：统计截至 stat_date 的所有历史数据
         适合数据量不大、采集不规律的场景
+
+        以服务端游标流式读取，单遍按分区累加文本，不保留原始行列表
         """
         # 构建截止时间（包含 stat_date 当天）
         end_dt = datetime.combine(stat_date, datetime.max.time())
 
-        # 获取所有视频（截至 stat_date）
-        videos = self.db.query(Video).filter(
-            Video.created_at <= end_dt
-        ).all()
-
-        # 获取所有评论（截至 stat_date，包含情感分数）
-        comments = self.db.query(
-            Comment.content,
-            Comment.video_id,
-            Comment.sentiment_score
-        ).filter(
-            Comment.created_at <= end_dt
-        ).all()
-
-        # 获取所有弹幕（截至 stat_date）
-        danmakus = self.db.query(
-            Danmaku.content,
-            Danmaku.video_id
-        ).filter(
-            Danmaku.created_at <= end_dt
-        ).all()
+        # 视频标题按分区分组，同时构建视频ID到分区/bvid的映射
+        category_titles = defaultdict(list)
+        category_videos = defaultdict(list)
+        video_category_map = {}
+        video_bvid_map = {}
+        for chunk in self._stream(
+            select(Video.id, Video.bvid, Video.category, Video.title).where(
+                Video.created_at <= end_dt
+            )
+        ):
+            for video in chunk:
+                video_category_map[video.id] = video.category
+                video_bvid_map[video.id] = video.bvid
+                category = video.category or "未分类"
+                category_titles[category].append(video.title)
+                category_videos[category].append(video.bvid)
+
+        # 评论按分区分组（包含情感分数）
+        category_comment_items = defaultdict(list)
+        category_comment_bvids = defaultdict(set)
+        for chunk in self._stream(
+            select(Comment.content, Comment.video_id, Comment.sentiment_score).where(
+                Comment.created_at <= end_dt
+            )
+        ):
+            for comment in chunk:
+                if not comment.content:
+                    continue
+                category = video_category_map.get(comment.video_id, "未分类")
+                category_comment_items[category].append({
+                    "content": comment.content,
+                    "sentiment": comment.sentiment_score
+                })
+                bvid = video_bvid_map.get(comment.video_id)
+                if bvid:
+                    category_comment_bvids[category].add(bvid)
 
-        # 构建视频ID到分区的映射
-        video_category_map = {v.id: v.category for v in videos}
-        video_bvid_map = {v.id: v.bvid for v in videos}
+        # 弹幕按分区分组
+        category_danmakus = defaultdict(list)
+        category_danmaku_bvids = defaultdict(set)
+        for chunk in self._stream(
+            select(Danmaku.content, Danmaku.video_id).where(
+                Danmaku.created_at <= end_dt
+            )
+        ):
+            for danmaku in chunk:
+                if not danmaku.content:
+                    continue
+                category = video_category_map.get(danmaku.video_id, "未分类")
+                category_danmakus[category].append(danmaku.content)
+                bvid = video_bvid_map.get(danmaku.video_id)
+                if bvid:
+                    category_danmaku_bvids[category].add(bvid)
 
         return {
-            "videos": videos,
-            "comments": comments,
-            "danmakus": danmakus,
-            "video_category_map": video_category_map,
-            "video_bvid_map": video_bvid_map
+            "category_titles": category_titles,
+            "category_videos": category_videos,
+            "category_comment_items": category_comment_items,
+            "category_comment_bvids": category_comment_bvids,
+            "category_danmakus": category_danmakus,
+            "category_danmaku_bvids": category_danmaku_bvids
         }
 
     def transform(self, data: Dict) -> List[Dict]:
         """提取并聚合热词"""
-        videos = data["videos"]
-        comments = data["comments"]
-        danmakus = data["danmakus"]
-        video_category_map = data["video_category_map"]
-        video_bvid_map = data["video_bvid_map"]
-
         result = []
 
         # 1. 处理视频标题热词
-        title_keywords = self._extract_title_keywords(videos)
+        title_keywords = self._extract_title_keywords(
+            data["category_titles"], data["category_videos"]
+        )
         result.extend(title_keywords)
 
         # 2. 处理评论热词
         comment_keywords = self._extract_comment_keywords(
-            comments, video_category_map, video_bvid_map
+            data["category_comment_items"], data["category_comment_bvids"]
         )
         result.extend(comment_keywords)
 
         # 3. 处理弹幕热词
         danmaku_keywords = self._extract_danmaku_keywords(
-            danmakus, video_category_map, video_bvid_map
+            data["category_danmakus"], data["category_danmaku_bvids"]
         )
         result.extend(danmaku_keywords)
 
         return result
 
-    def _extract_title_keywords(self, videos: List) -> List[Dict]:
-        """从视频标题提取热词"""
-        # 按分区分组
-        category_titles = defaultdict(list)
-        category_videos = defaultdict(list)
+    def _build_category_matrix(self, category_texts: Dict[str, List[str]]):
+        """
+        同一来源的全部文本只构建一次关键词矩阵
 
-        for video in videos:
-            category = video.category or "未分类"
-            category_titles[category].append(video.title)
-            category_videos[category].append(video.bvid)
+        Returns:
+            (矩阵, 词表, {分区: 行区间})，各分区的文本在矩阵中占一段连续行
+        """
+        texts: List[str] = []
+        category_rows = {}
+        for category, items in category_texts.items():
+            category_rows[category] = slice(len(texts), len(texts) + len(items))
+            texts.extend(items)
+
+        matrix, vocabulary = self.nlp.build_keyword_matrix(
+            texts, workers=self.workers, cache=self.text_keywords_cache
+        )
+        return matrix, vocabulary, category_rows
+
+    def _extract_title_keywords(
+        self,
+        category_titles: Dict[str, List[str]],
+        category_videos: Dict[str, List[str]]
+    ) -> List[Dict]:
+        """从视频标题提取热词"""
+        matrix, vocabulary, category_rows = self._build_category_matrix(category_titles)
+        word_columns = {word: column for column, word in enumerate(vocabulary)}
 
         result = []
-        for category, titles in category_titles.items():
-            keywords = self.nlp.extract_keywords_tfidf(titles, self.top_k)
+        for category, rows in category_rows.items():
+            keywords = self.nlp.rank_keywords(matrix, vocabulary, self.top_k, rows)
             bvids = category_videos[category]
 
+            # 倒排索引：按列存储后，每个词对应包含它的标题行号（递增）
+            word_titles = matrix[rows].tocsc()
+
             for word, frequency in keywords:
-                # 找出包含该词的视频作为样例
-                sample_bvids = []
-                for i, title in enumerate(titles):
-                    if word in title and len(sample_bvids) < 5:
-                        sample_bvids.append(bvids[i])
+                title_rows = _column_rows(word_titles, word_columns[word])
 
                 result.append({
                     "word": word,
                     "source": "title",
                     "category": category,
                     "frequency": frequency,
-                    "video_count": len([t for t in titles if word in t]),
+                    "video_count": len(title_rows),
                     "avg_sentiment": None,
-                    "sample_bvids": sample_bvids
+                    # 包含该词的前5个视频作为样例
+                    "sample_bvids": [bvids[i] for i in title_rows[:5]]
                 })
 
         return result
 
     def _extract_comment_keywords(
         self,
-        comments: List,
-        video_category_map: Dict,
-        video_bvid_map: Dict
+        category_comment_items: Dict[str, List[Dict]],
+        category_bvids: Dict[str, set]
     ) -> List[Dict]:
         """从评论提取热词"""
-        # 按分区分组
-        category_comment_items = defaultdict(list)
-        category_bvids = defaultdict(set)
+        matrix, vocabulary, category_rows = self._build_category_matrix({
+            category: [item["content"] for item in items]
+            for category, items in category_comment_items.items()
+        })
 
-        for comment in comments:
-            category = video_category_map.get(comment.video_id, "未分类")
-            if comment.content:
-                category_comment_items[category].append({
-                    "content": comment.content,
-                    "sentiment": comment.sentiment_score
-                })
-                bvid = video_bvid_map.get(comment.video_id)
-                if bvid:
-                    category_bvids[category].add(bvid)
+        word_columns = {word: column for column, word in enumerate(vocabulary)}
 
         result = []
         for category, items in category_comment_items.items():
-            contents = [item["content"] for item in items]
-            keywords = self.nlp.extract_keywords_tfidf(contents, self.top_k)
+            rows = category_rows[category]
+            keywords = self.nlp.rank_keywords(matrix, vocabulary, self.top_k, rows)
             video_count = len(category_bvids.get(category, set()))
             sample_bvids = list(category_bvids.get(category, set()))[:5]
 
+            # 评论情感分（缺失记为 NaN）与 词→评论 倒排索引
+            sentiments = np.array([
+                np.nan if item["sentiment"] is None else item["sentiment"]
+                for item in items
+            ], dtype=np.float64)
+            word_comments = matrix[rows].tocsc()
+
             for word, frequency in keywords:
-                # 词级情感分：仅统计包含该词的评论
-                word_sentiments = [
-                    item["sentiment"]
-                    for item in items
-                    if item["sentiment"] is not None and word in item["content"]
-                ]
+                # 词级情感分：仅统计包含该词且已有情感分的评论
+                word_sentiments = sentiments[_column_rows(word_comments, word_columns[word])]
+                word_sentiments = word_sentiments[~np.isnan(word_sentiments)]
                 avg_sentiment = (
-                    sum(word_sentiments) / len(word_sentiments)
-                    if word_sentiments else None
+                    float(word_sentiments.mean())
+                    if word_sentiments.size else None
                 )
 
                 result.append({
@@ -215,26 +273,15 @@ class KeywordDailyETL(ETLTask):
 
     def _extract_danmaku_keywords(
         self,
-        danmakus: List,
-        video_category_map: Dict,
-        video_bvid_map: Dict
+        category_danmakus: Dict[str, List[str]],
+        category_bvids: Dict[str, set]
     ) -> List[Dict]:
         """从弹幕提取热词"""
-        # 按分区分组
-        category_danmakus = defaultdict(list)
-        category_bvids = defaultdict(set)
-
-        for danmaku in danmakus:
-            category = video_category_map.get(danmaku.video_id, "未分类")
-            if danmaku.content:
-                category_danmakus[category].append(danmaku.content)
-                bvid = video_bvid_map.get(danmaku.video_id)
-                if bvid:
-                    category_bvids[category].add(bvid)
+        matrix, vocabulary, category_rows = self._build_category_matrix(category_danmakus)
 
         result = []
-        for category, contents in category_danmakus.items():
-            keywords = self.nlp.extract_keywords_tfidf(contents, self.top_k)
+        for category, rows in category_rows.items():
+            keywords = self.nlp.rank_keywords(matrix, vocabulary, self.top_k, rows)
             video_count = len(category_bvids.get(category, set()))
             sample_bvids = list(category_bvids.get(category, set()))[:5]
 
@@ -259,50 +306,39 @@ class KeywordDailyETL(ETLTask):
         ).delete(synchronize_session=False)
 
         # 去重合并，避免同一 (word, source, category) 重复写入导致唯一键冲突
-        merged: Dict[tuple, Dict[str, Any]] = {}
+        # 合并值：[最大频次, 最大视频数, 情感分之和, 情感分个数, 样例bvid]
+        merged: Dict[tuple, list] = defaultdict(lambda: [0, 0, 0.0, 0, []])
         skipped_invalid_words = 0
         for item in data:
             normalized_word = _normalize_word(item.get("word"), MAX_DWD_WORD_LENGTH)
             if normalized_word is None:
                 skipped_invalid_words += 1
                 continue
-            key = (normalized_word, item["source"], item["category"])
-            if key not in merged:
-                merged[key] = {
-                    "frequency": item["frequency"],
-                    "video_count": item["video_count"],
-                    "avg_sentiment_sum": item["avg_sentiment"] or 0.0,
-                    "avg_sentiment_count": 1 if item["avg_sentiment"] is not None else 0,
-                    "sample_bvids": set(item["sample_bvids"]),
-                }
-                continue
-
-            current = merged[key]
-            current["frequency"] = max(current["frequency"], item["frequency"])
-            current["video_count"] = max(current["video_count"], item["video_count"])
+            current = merged[(normalized_word, item["source"], item["category"])]
+            current[0] = max(current[0], item["frequency"])
+            current[1] = max(current[1], item["video_count"])
             if item["avg_sentiment"] is not None:
-                current["avg_sentiment_sum"] += item["avg_sentiment"]
-                current["avg_sentiment_count"] += 1
-            current["sample_bvids"].update(item["sample_bvids"])
+                current[2] += item["avg_sentiment"]
+                current[3] += 1
+            current[4].extend(item["sample_bvids"])
 
         if not merged:
             return 0
 
         rows = []
         now = datetime.utcnow()
-        for (word, source, category), current in merged.items():
-            avg_sentiment = None
-            if current["avg_sentiment_count"] > 0:
-                avg_sentiment = current["avg_sentiment_sum"] / current["avg_sentiment_count"]
+        for (word, source, category), (frequency, video_count, sentiment_sum, sentiment_count,
+                                       sample_bvids) in merged.items():
             rows.append({
                 "stat_date": stat_date,
                 "word": word,
                 "source": source,
                 "category": category,
-                "frequency": current["frequency"],
-                "video_count": current["video_count"],
-                "avg_sentiment": avg_sentiment,
-                "sample_bvids": json.dumps(list(current["sample_bvids"])[:5], ensure_ascii=False),
+                "frequency": frequency,
+                "video_count": video_count,
+                "avg_sentiment": sentiment_sum / sentiment_count if sentiment_count else None,
+                # 样例去重（保持先后顺序）后取前5个；orjson 直接输出 UTF-8 紧凑 JSON
+                "sample_bvids": orjson.dumps(list(dict.fromkeys(sample_bvids))[:5]).decode(),
                 "created_at": now,
             })
 
@@ -313,16 +349,8 @@ class KeywordDailyETL(ETLTask):
                 MAX_DWD_WORD_LENGTH,
             )
 
-        for chunk in _chunk_rows(rows):
-            stmt = mysql_insert(DwdKeywordDaily.__table__).values(chunk)
-            stmt = stmt.on_duplicate_key_update(
-                frequency=stmt.inserted.frequency,
-                video_count=stmt.inserted.video_count,
-                avg_sentiment=stmt.inserted.avg_sentiment,
-                sample_bvids=stmt.inserted.sample_bvids,
-                created_at=stmt.inserted.created_at,
-            )
-            self.db.execute(stmt)
+        # 分批 UPSERT：唯一键按排序规则比较，大小写/全半角不同的词仍可能冲突
+        self._upsert(DwdKeywordDaily, rows, update_cols=DWD_UPDATE_COLUMNS)
 
         return len(rows)
 
@@ -340,109 +368,121 @@ class KeywordStatsETL(ETLTask):
         self.trend_days = trend_days
 
     def extract(self, stat_date: date) -> List:
-        """从DWD层抽取当日热词数据"""
-        keywords = self.db.query(DwdKeywordDaily).filter(
+        """
+        从DWD层抽取当日热词数据
+
+        在数据库中按 (词, 分区) 预聚合：各来源频次用条件求和拆列，情感分保留和与计数
+        以便再按词合并；按组内最小ID排序，保持词首次出现的顺序。
+        """
+        frequency = func.coalesce(DwdKeywordDaily.frequency, 0)
+        keywords = self.db.query(
+            DwdKeywordDaily.word,
+            DwdKeywordDaily.category,
+            *[
+                func.sum(case((DwdKeywordDaily.source == source, frequency), else_=0))
+                for source in SOURCES
+            ],
+            func.sum(frequency),
+            func.sum(func.coalesce(DwdKeywordDaily.video_count, 0)),
+            func.sum(DwdKeywordDaily.avg_sentiment),
+            func.count(DwdKeywordDaily.avg_sentiment)
+        ).filter(
             DwdKeywordDaily.stat_date == stat_date
+        ).group_by(
+            DwdKeywordDaily.word,
+            DwdKeywordDaily.category
+        ).order_by(
+            func.min(DwdKeywordDaily.id)
         ).all()
         return keywords
 
     def transform(self, data: List) -> List[Dict]:
-        """聚合热词统计"""
-        # 按词聚合
-        word_stats = defaultdict(lambda: {
-            "title_frequency": 0,
-            "comment_frequency": 0,
-            "danmaku_frequency": 0,
-            "total_frequency": 0,
-            "video_count": 0,
-            "category_distribution": defaultdict(int),
-            "sentiments": [],
-            "sample_bvids": set()
-        })
-
-        for kw in data:
-            word = kw.word
-            stats = word_stats[word]
-
-            # 累加各来源频次
-            if kw.source == "title":
-                stats["title_frequency"] += kw.frequency
-            elif kw.source == "comment":
-                stats["comment_frequency"] += kw.frequency
-            elif kw.source == "danmaku":
-                stats["danmaku_frequency"] += kw.frequency
-
-            stats["total_frequency"] += kw.frequency
-            stats["video_count"] += kw.video_count or 0
-
-            # 分区分布
-            if kw.category:
-                stats["category_distribution"][kw.category] += kw.frequency
-
-            # 情感分数
-            if kw.avg_sentiment is not None:
-                stats["sentiments"].append(kw.avg_sentiment)
-
-            # 示例视频
-            if kw.sample_bvids:
-                try:
-                    bvids = json.loads(kw.sample_bvids)
-                    stats["sample_bvids"].update(bvids)
-                except:
-                    pass
-
-        # 转换为列表
-        result = []
-        for word, stats in word_stats.items():
-            avg_sentiment = None
-            if stats["sentiments"]:
-                avg_sentiment = sum(stats["sentiments"]) / len(stats["sentiments"])
-
-            result.append({
-                "word": word,
-                "title_frequency": stats["title_frequency"],
-                "comment_frequency": stats["comment_frequency"],
-                "danmaku_frequency": stats["danmaku_frequency"],
-                "total_frequency": stats["total_frequency"],
-                "video_count": stats["video_count"],
-                "category_distribution": dict(stats["category_distribution"]),
-                "avg_sentiment": avg_sentiment
-            })
-
-        # 按总频次排序，计算热度分
-        result.sort(key=lambda x: x["total_frequency"], reverse=True)
-        max_freq = result[0]["total_frequency"] if result else 1
-        for i, item in enumerate(result):
-            # 热度分 = 归一化频次 * 0.7 + 来源多样性 * 0.3
-            normalized_freq = item["total_frequency"] / max_freq
-            source_diversity = sum([
-                1 if item["title_frequency"] > 0 else 0,
-                1 if item["comment_frequency"] > 0 else 0,
-                1 if item["danmaku_frequency"] > 0 else 0
-            ]) / 3
-            item["heat_score"] = round(normalized_freq * 0.7 + source_diversity * 0.3, 4)
+        """聚合热词统计（按词合并分区预聚合结果，向量化计算）"""
+        frequency_columns = [f"{source}_frequency" for source in SOURCES]
+        df = pd.DataFrame.from_records(
+            data,
+            columns=[
+                "word", "category", *frequency_columns,
+                "frequency", "video_count", "sentiment_sum", "sentiment_count"
+            ]
+        )
+        if df.empty:
+            return []
+
+        # MySQL 的 SUM 返回 Decimal，统一转为数值类型
+        count_columns = [*frequency_columns, "frequency", "video_count", "sentiment_count"]
+        df[count_columns] = df[count_columns].astype(np.int64)
+        df["sentiment_sum"] = df["sentiment_sum"].astype(np.float64)
+
+        # 各来源频次按词求和（保持词首次出现的顺序）
+        grouped = df.groupby("word", sort=False).agg(
+            title_frequency=("title_frequency", "sum"),
+            comment_frequency=("comment_frequency", "sum"),
+            danmaku_frequency=("danmaku_frequency", "sum"),
+            total_frequency=("frequency", "sum"),
+            video_count=("video_count", "sum"),
+            sentiment_sum=("sentiment_sum", "sum"),
+            sentiment_count=("sentiment_count", "sum"),
+        )
+        # 平均情感分：各行有效情感分的均值（无有效值时为空）
+        grouped["avg_sentiment"] = (
+            grouped["sentiment_sum"] / grouped["sentiment_count"].where(grouped["sentiment_count"] > 0)
+        )
 
-        return result
+        # 分区分布：{分区: 频次}（每个 (词, 分区) 已在数据库中聚合为一行）
+        category_distribution = defaultdict(dict)
+        has_category = df["category"].notna() & (df["category"] != "")
+        for word, category, frequency in df.loc[
+            has_category, ["word", "category", "frequency"]
+        ].itertuples(index=False):
+            category_distribution[word][category] = int(frequency)
+
+        # 热度分 = 归一化频次 * 0.7 + 来源多样性 * 0.3
+        total_frequency = grouped["total_frequency"].to_numpy()
+        max_freq = total_frequency.max()
+        source_diversity = (
+            grouped[[f"{source}_frequency" for source in SOURCES]].to_numpy() > 0
+        ).sum(axis=1) / 3
+        heat_score = total_frequency / max_freq * 0.7 + source_diversity * 0.3
+
+        # 按总频次降序（稳定排序，同频次保持首次出现顺序）
+        order = np.argsort(-total_frequency, kind="stable")
+
+        grouped["heat_score"] = heat_score
+        grouped = grouped.iloc[order].reset_index()
+
+        return [{
+            "word": r.word,
+            "title_frequency": int(r.title_frequency),
+            "comment_frequency": int(r.comment_frequency),
+            "danmaku_frequency": int(r.danmaku_frequency),
+            "total_frequency": int(r.total_frequency),
+            "video_count": int(r.video_count),
+            "category_distribution": category_distribution.get(r.word, {}),
+            "avg_sentiment": None if pd.isna(r.avg_sentiment) else float(r.avg_sentiment),
+            "heat_score": round(float(r.heat_score), 4)
+        } for r in grouped.itertuples(index=False)]
 
     def load(self, data: List[Dict], stat_date: date) -> int:
         """写入热词聚合统计表"""
-        # 获取前一天的排名用于计算变化
+        # 获取前一天的排名用于计算变化（数据库端按总频次编号，同频次按写入顺序）
         prev_date = stat_date - timedelta(days=1)
-        prev_rankings = {}
-        prev_stats = self.db.query(DwsKeywordStats).filter(
-            DwsKeywordStats.stat_date == prev_date
-        ).all()
-        for i, ps in enumerate(sorted(prev_stats, key=lambda x: x.total_frequency, reverse=True)):
-            prev_rankings[ps.word] = i + 1
+        prev_rankings = dict(self.db.execute(
+            select(
+                DwsKeywordStats.word,
+                func.row_number().over(
+                    order_by=(DwsKeywordStats.total_frequency.desc(), DwsKeywordStats.id)
+                )
+            ).where(DwsKeywordStats.stat_date == prev_date)
+        ).all())
 
         # 获取7天前的数据用于计算趋势
         week_ago = stat_date - timedelta(days=self.trend_days)
-        week_ago_stats = {}
-        prev_week = self.db.query(DwsKeywordStats).filter(
-            DwsKeywordStats.stat_date == week_ago
-        ).all()
-        for ps in prev_week:
-            week_ago_stats[ps.word] = ps.total_frequency
+        week_ago_stats = dict(self.db.execute(
+            select(DwsKeywordStats.word, DwsKeywordStats.total_frequency).where(
+                DwsKeywordStats.stat_date == week_ago
+            )
+        ).all())
 
         # 先删除当日旧数据
         self.db.query(DwsKeywordStats).filter(
@@ -477,9 +517,7 @@ class KeywordStatsETL(ETLTask):
                 "danmaku_frequency": item["danmaku_frequency"],
                 "total_frequency": item["total_frequency"],
                 "video_count": item["video_count"],
-                "category_distribution": json.dumps(
-                    item["category_distribution"], ensure_ascii=False
-                ),
+                "category_distribution": orjson.dumps(item["category_distribution"]).decode(),
                 "avg_sentiment": item["avg_sentiment"],
                 "frequency_trend": round(frequency_trend, 4),
                 "rank_change": rank_change,
@@ -494,22 +532,7 @@ class KeywordStatsETL(ETLTask):
                 MAX_DWS_WORD_LENGTH,
             )
 
-        for chunk in _chunk_rows(rows):
-            stmt = mysql_insert(DwsKeywordStats.__table__).values(chunk)
-            stmt = stmt.on_duplicate_key_update(
-                title_frequency=stmt.inserted.title_frequency,
-                comment_frequency=stmt.inserted.comment_frequency,
-                danmaku_frequency=stmt.inserted.danmaku_frequency,
-                total_frequency=stmt.inserted.total_frequency,
-                video_count=stmt.inserted.video_count,
-                category_distribution=stmt.inserted.category_distribution,
-                avg_sentiment=stmt.inserted.avg_sentiment,
-                frequency_trend=stmt.inserted.frequency_trend,
-                rank_change=stmt.inserted.rank_change,
-                heat_score=stmt.inserted.heat_score,
-                created_at=stmt.inserted.created_at,
-            )
-            self.db.execute(stmt)
+        self._upsert(DwsKeywordStats, rows, update_cols=DWS_UPDATE_COLUMNS)
 
         return len(rows)
 
@@ -0,0 +1,102 @@
+"""
+DWD表分区维护
+
+dwd_video_snapshot、dwd_comment_daily 按日期做 MySQL RANGE COLUMNS 月分区
+（初始分区DDL见 docs/sql/migrations/20261016_partition_dwd_tables.sql）：
+- 分区命名 pYYYYMM，存放当月数据
+- p_future 兜底存放尚未建分区的日期（VALUES LESS THAN MAXVALUE）
+
+按日期范围的查询只扫描相关分区；过期数据可直接 DROP PARTITION 清理。
+"""
+from datetime import date
+from typing import List, Optional
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# 按月分区的DWD表
+PARTITIONED_TABLES = ("dwd_video_snapshot", "dwd_comment_daily")
+
+# 兜底分区名
+FUTURE_PARTITION = "p_future"
+
+
+def _next_month(month: date) -> date:
+    """返回下个月1日"""
+    if month.month == 12:
+        return date(month.year + 1, 1, 1)
+    return date(month.year, month.month + 1, 1)
+
+
+def _partition_bound(description: str) -> date:
+    """解析 RANGE COLUMNS 分区上界（information_schema 中形如 '2026-12-01'）"""
+    return date.fromisoformat(description.strip("'"))
+
+
+def ensure_month_partitions(db: Session, today: Optional[date] = None,
+                            months_ahead: int = 1) -> List[str]:
+    """
+    预建截至当月之后 months_ahead 个月的分区
+
+    从 p_future 之前最后一个分区的上界开始，逐月补齐到目标月，一条 REORGANIZE PARTITION
+    从 p_future 中一次拆出；分区维护中断过几个月时，缺失的每个月都会补建，
+    p_future 中已有的数据按日期落入各自的月分区，不会并入一个名不副实的分区。
+    表未分区（如由 create_all 建表）或非 MySQL 数据库时不做处理。
+
+    Args:
+        db: 数据库会话
+        today: 基准日期，默认今天
+        months_ahead: 提前预建的月数
+
+    Returns:
+        新建的分区列表（"表名.分区名"）
+    """
+    if db.get_bind().dialect.name != "mysql":
+        return []
+
+    month = (today or date.today()).replace(day=1)
+    target = month
+    for _ in range(months_ahead):
+        target = _next_month(target)
+    created = []
+
+    for table in PARTITIONED_TABLES:
+        bounds = dict(db.execute(
+            text(
+                "SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM information_schema.PARTITIONS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table "
+                "AND PARTITION_NAME IS NOT NULL"
+            ),
+            {"table": table}
+        ))
+        if FUTURE_PARTITION not in bounds:
+            logger.warning(f"{table} 未按月分区，跳过分区维护")
+            continue
+
+        # 已有分区覆盖到的日期上界即下一个待建分区的起点；只有 p_future 时从当月开始
+        del bounds[FUTURE_PARTITION]
+        start = max(map(_partition_bound, bounds.values()), default=month)
+
+        partitions = []
+        while start <= target:
+            end = _next_month(start)
+            partitions.append((f"p{start:%Y%m}", end))
+            start = end
+        if not partitions:
+            continue
+
+        definitions = "".join(
+            f"PARTITION {name} VALUES LESS THAN ('{end.isoformat()}'), " for name, end in partitions
+        )
+        db.execute(text(
+            f"ALTER TABLE `{table}` REORGANIZE PARTITION {FUTURE_PARTITION} INTO ("
+            f"{definitions}PARTITION {FUTURE_PARTITION} VALUES LESS THAN (MAXVALUE))"
+        ))
+        for name, _ in partitions:
+            created.append(f"{table}.{name}")
+            logger.info(f"已创建分区 {table}.{name}")
+
+    return created
@@ -5,15 +5,18 @@ ETL调度器
 - 每日凌晨2点自动执行所有ETL任务
 - 支持手动触发
 - 支持历史数据回填（backfill）
+- 每日预建DWD表下月分区
 """
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import date, datetime, timedelta
-from typing import List, Optional
+from typing import List, Optional, Type
 import logging
 
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 
 from app.core.database import SessionLocal
+from app.etl.base import ETLTask
 from app.etl.dwd_tasks import VideoSnapshotETL, CommentDailyETL
 from app.etl.dws_tasks import (
     StatsDailyETL,
@@ -22,9 +25,17 @@ from app.etl.dws_tasks import (
     VideoTrendETL,
 )
 from app.etl.keyword_tasks import KeywordDailyETL, KeywordStatsETL
+from app.etl.partitions import ensure_month_partitions
+from app.services.nlp import TextKeywordsCache
 
 logger = logging.getLogger(__name__)
 
+# DWS层中互不依赖、只读当天DWD数据的任务（每日ETL第3-6步）
+DWS_PARALLEL_TASKS = [StatsDailyETL, CategoryDailyETL, SentimentDailyETL, VideoTrendETL]
+
+# 回填线程数：快照链、热词链各占一个线程，其余线程按天并发评论明细；DWS阶段每个任务各占一个线程
+BACKFILL_WORKERS = 6
+
 
 class ETLScheduler:
     """
@@ -66,25 +77,9 @@ class ETLScheduler:
             task2 = CommentDailyETL(db)
             results.append(task2.run(stat_date))
 
-            # 3. DWS层：全局统计
-            logger.info("[3/8] 执行全局统计ETL...")
-            task3 = StatsDailyETL(db)
-            results.append(task3.run(stat_date))
-
-            # 4. DWS层：分区统计
-            logger.info("[4/8] 执行分区统计ETL...")
-            task4 = CategoryDailyETL(db)
-            results.append(task4.run(stat_date))
-
-            # 5. DWS层：情感统计
-            logger.info("[5/8] 执行情感统计ETL...")
-            task5 = SentimentDailyETL(db)
-            results.append(task5.run(stat_date))
-
-            # 6. DWS层：视频趋势
-            logger.info("[6/8] 执行视频趋势ETL...")
-            task6 = VideoTrendETL(db)
-            results.append(task6.run(stat_date))
+            # 3-6. DWS层：全局统计、分区统计、情感统计、视频趋势（互不依赖，并行执行）
+            logger.info("[3-6/8] 并行执行全局统计、分区统计、情感统计、视频趋势ETL...")
+            results.extend(self.run_parallel(DWS_PARALLEL_TASKS, stat_date))
 
             # 7. DWD层：热词明细
             logger.info("[7/8] 执行热词明细ETL...")
@@ -107,34 +102,162 @@ class ETLScheduler:
 
         return results
 
-    def backfill(self, start_date: date, end_date: date) -> List[dict]:
+    def run_parallel(self, task_classes: List[Type[ETLTask]], stat_date: date,
+                     max_workers: int = 4) -> List[dict]:
+        """
+        并行执行互不依赖的ETL任务
+
+        每个任务使用独立的数据库会话并各自提交；任务主要等待数据库 I/O，
+        线程并行即可获得加速。
+
+        Args:
+            task_classes: ETL任务类列表
+            stat_date: 统计日期
+            max_workers: 最大线程数
+
+        Returns:
+            按 task_classes 顺序排列的执行结果列表
+
+        Raises:
+            任一任务失败时，在所有任务结束后抛出第一个异常
+        """
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="etl") as executor:
+            futures = [
+                executor.submit(self._run_task, task_class, stat_date)
+                for task_class in task_classes
+            ]
+            wait(futures)
+
+        results = []
+        for future in futures:
+            error = future.exception()
+            if error is not None:
+                raise error
+            results.append(future.result())
+        return results
+
+    @staticmethod
+    def _run_task(task_class: Type[ETLTask], stat_date: date, **task_kwargs) -> dict:
+        """使用独立的数据库会话执行单个ETL任务（供线程池调用）"""
+        task_db = SessionLocal()
+        try:
+            return task_class(task_db, **task_kwargs).run(stat_date)
+        finally:
+            task_db.close()
+
+    def backfill(self, start_date: date, end_date: date,
+                 max_workers: int = BACKFILL_WORKERS) -> List[dict]:
         """
         历史数据回填
 
+        按任务间的跨天依赖分阶段并发执行：
+        - 视频快照依赖前一天快照（计算增量），按天串行
+        - 热词明细→热词聚合依赖前1天/前7天聚合（排名变化、趋势），按天串行，
+          且不依赖视频/评论DWD，与其余阶段并行
+        - 评论明细只读原始数据，按天并发
+        - 全局/分区/情感统计、视频趋势只读DWD数据，待快照链和评论明细完成后各任务并发，
+          同一任务按天串行（多天同时整日覆盖写同一张表，DELETE 的间隙锁会互相死锁）
+
+        某天的DWD任务失败时跳过该天依赖它的DWS任务，其余日期照常回填；
+        全部结束后汇总失败的日期和任务抛出异常。
+
         Args:
             start_date: 开始日期
             end_date: 结束日期
+            max_workers: 最大线程数
 
         Returns:
-            所有任务的执行结果列表
+            所有任务的执行结果列表（按日期、再按每日ETL的任务顺序排列）
+
+        Raises:
+            RuntimeError: 有任务失败时，在所有日期回填结束后抛出，消息中列出失败的日期和任务
         """
-        current = start_date
-        all_results = []
+        days = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+        # (日期, 任务在每日ETL中的序号) -> 执行结果；各线程写入互不相同的键
+        results = {}
+        # (日期, 序号) -> 失败原因；同样各线程写入互不相同的键
+        failures = {}
+        dwd_failed_days = set()
 
-        logger.info(f"=== 开始历史回填，从 {start_date} 到 {end_date} ===")
+        logger.info(f"=== 开始历史回填，从 {start_date} 到 {end_date}，共 {len(days)} 天 ===")
 
-        while current <= end_date:
-            logger.info(f"回填日期: {current}")
+        def run_step(day: date, order: int, task_class: Type[ETLTask], **task_kwargs) -> bool:
             try:
-                results = self.run_daily_etl(current)
-                all_results.extend(results)
+                results[(day, order)] = self._run_task(task_class, day, **task_kwargs)
+                return True
             except Exception as e:
-                logger.error(f"回填 {current} 失败: {e}")
-            current += timedelta(days=1)
-
+                logger.error(f"回填 {day} {task_class.__name__} 失败: {e}")
+                failures[(day, order)] = f"{task_class.__name__}: {e}"
+                return False
+
+        def run_snapshot_chain():
+            for day in days:
+                if not run_step(day, 0, VideoSnapshotETL):
+                    dwd_failed_days.add(day)
+
+        def run_comment_day(day: date):
+            if not run_step(day, 1, CommentDailyETL):
+                dwd_failed_days.add(day)
+
+        def run_keyword_chain():
+            # 历史语料每天重复出现，回填期间热词明细共用同一关键词缓存，回填结束即释放
+            text_keywords_cache = TextKeywordsCache()
+            for day in days:
+                if run_step(day, 6, KeywordDailyETL, text_keywords_cache=text_keywords_cache):
+                    run_step(day, 7, KeywordStatsETL)
+
+        def run_dws_chain(order: int, task_class: Type[ETLTask]):
+            for day in days:
+                if day not in dwd_failed_days:
+                    run_step(day, order, task_class)
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="etl-backfill") as executor:
+            keyword_future = executor.submit(run_keyword_chain)
+
+            # 阶段1：DWD层（快照链 + 按天评论明细）
+            dwd_futures = [executor.submit(run_snapshot_chain)]
+            dwd_futures.extend(executor.submit(run_comment_day, day) for day in days)
+            wait(dwd_futures)
+            logger.info("回填DWD层完成，开始并发执行DWS层各任务")
+
+            # 阶段2：DWS层（按任务并发，任务内按天串行）
+            dws_futures = [
+                executor.submit(run_dws_chain, order, task_class)
+                for order, task_class in enumerate(DWS_PARALLEL_TASKS, start=2)
+            ]
+            wait(dws_futures + [keyword_future])
+
+        all_results = [results[key] for key in sorted(results)]
+        if failures:
+            failed_days = sorted({day for day, _ in failures})
+            summary = "; ".join(f"{day} {error}" for (day, _), error in sorted(failures.items()))
+            logger.error(
+                f"=== 历史回填结束，成功 {len(all_results)} 个任务，"
+                f"{len(failed_days)} 天有任务失败: {summary} ==="
+            )
+            raise RuntimeError(
+                f"历史回填有 {len(failures)} 个任务失败，"
+                f"失败日期: {', '.join(str(day) for day in failed_days)}；{summary}"
+            )
         logger.info(f"=== 历史回填完成，共处理 {len(all_results)} 个任务 ===")
         return all_results
 
+    def run_partition_maintenance(self) -> List[str]:
+        """
+        预建DWD表的当月及下月分区
+
+        Returns:
+            新建的分区列表
+        """
+        db = SessionLocal()
+        try:
+            return ensure_month_partitions(db)
+        except Exception as e:
+            logger.error(f"分区维护失败: {e}")
+            return []
+        finally:
+            db.close()
+
     def start(self):
         """启动调度器"""
         if self.is_running:
@@ -150,6 +273,15 @@ class ETLScheduler:
             name='每日ETL任务'
         )
 
+        # 每天凌晨1点半预建分区（早于ETL写入）
+        self.scheduler.add_job(
+            self.run_partition_maintenance,
+            trigger=CronTrigger(hour=1, minute=30),
+            id='dwd_partition_maintenance',
+            replace_existing=True,
+            name='DWD分区维护'
+        )
+
         self.scheduler.start()
         self.is_running = True
         logger.info("ETL调度器已启动，每天凌晨2点执行")
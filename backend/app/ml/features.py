@@ -2,9 +2,10 @@
 特征工程模块
 负责从视频数据提取和转换预测所需的特征
 """
-from typing import Dict, List
+from typing import Dict, List, Optional, Sequence
 from datetime import datetime
 import numpy as np
+import pandas as pd
 
 
 class FeatureExtractor:
@@ -18,22 +19,30 @@ class FeatureExtractor:
         '番剧': 15, '国创': 16, '电影': 17, '电视剧': 18, '纪录片': 19,
     }
 
-    # 特征名称列表
-    FEATURE_NAMES = [
+    # 特征名称（固定顺序，即模型输入列顺序）
+    FEATURE_NAMES = (
         'like_rate', 'coin_rate', 'favorite_rate', 'share_rate',
         'danmaku_rate', 'comment_rate', 'interaction_rate',
         'publish_hour', 'publish_weekday', 'video_age_days',
         'title_length', 'has_description', 'duration_minutes',
         'category_code', 'current_play_count'
+    )
+
+    # 批量提取特征所需的视频字段
+    RAW_COLUMNS = [
+        'play_count', 'like_count', 'coin_count', 'favorite_count', 'share_count',
+        'danmaku_count', 'comment_count', 'publish_time', 'title', 'description',
+        'duration', 'category'
     ]
 
     @classmethod
-    def extract_features(cls, video) -> Dict[str, float]:
+    def extract_features(cls, video, now: Optional[datetime] = None) -> Dict[str, float]:
         """
         从视频 ORM 对象提取特征
 
         Args:
             video: Video ORM 对象
+            now: 计算视频天数的参考时间，默认为当前时间（批量调用时传入同一时间）
 
         Returns:
             特征字典
@@ -59,7 +68,7 @@ class FeatureExtractor:
         if video.publish_time:
             publish_hour = video.publish_time.hour
             publish_weekday = video.publish_time.weekday()
-            video_age_days = max((datetime.now() - video.publish_time).days, 1)
+            video_age_days = max(((now or datetime.now()) - video.publish_time).days, 1)
 
         # 内容特征
         title_length = len(video.title) if video.title else 0
@@ -87,6 +96,75 @@ class FeatureExtractor:
             'current_play_count': play_count,
         }
 
+    @classmethod
+    def extract_features_frame(cls, df: pd.DataFrame, now: Optional[datetime] = None) -> pd.DataFrame:
+        """
+        按列向量化提取特征（与 extract_features 逐条计算的结果一致，整数特征保持整数列）
+
+        Args:
+            df: 视频原始数据，需包含 RAW_COLUMNS 各列
+            now: 计算视频天数的参考时间，默认为当前时间
+
+        Returns:
+            列为 FEATURE_NAMES（按顺序）的特征表
+        """
+        def count(column: str) -> pd.Series:
+            return df[column].fillna(0).astype(np.float64)
+
+        play_count = df['play_count'].fillna(1).astype(np.float64).clip(lower=1)  # 避免除零
+
+        # 基础互动率特征
+        like_rate = count('like_count') / play_count
+        coin_rate = count('coin_count') / play_count
+        favorite_rate = count('favorite_count') / play_count
+        share_rate = count('share_count') / play_count
+
+        # 时间特征（无发布时间时取默认值）
+        publish_time = pd.to_datetime(df['publish_time'])
+        video_age = pd.Timestamp(now or datetime.now()) - publish_time
+
+        # 内容特征
+        title_length = df['title'].fillna('').str.len()
+        description_length = df['description'].fillna('').str.len()
+
+        features = pd.DataFrame({
+            'like_rate': like_rate,
+            'coin_rate': coin_rate,
+            'favorite_rate': favorite_rate,
+            'share_rate': share_rate,
+            'danmaku_rate': count('danmaku_count') / play_count,
+            'comment_rate': count('comment_count') / play_count,
+            'interaction_rate': like_rate + coin_rate + favorite_rate + share_rate,
+            'publish_hour': publish_time.dt.hour.fillna(12).astype(np.int64),
+            'publish_weekday': publish_time.dt.weekday.fillna(0).astype(np.int64),
+            'video_age_days': video_age.dt.days.clip(lower=1).fillna(30).astype(np.int64),
+            'title_length': title_length,
+            'has_description': (description_length > 0).astype(np.int8),
+            'duration_minutes': count('duration') / 60,
+            'category_code': df['category'].map(cls.CATEGORY_ENCODING).fillna(-1).astype(np.int64),
+            'current_play_count': play_count.astype(np.int64),
+        })
+        return features[list(cls.FEATURE_NAMES)]
+
+    @classmethod
+    def extract_features_batch(cls, videos: Sequence, now: Optional[datetime] = None) -> pd.DataFrame:
+        """
+        批量从视频 ORM 对象提取特征（取出 RAW_COLUMNS 各列后整批向量化计算）
+
+        Args:
+            videos: Video ORM 对象列表
+            now: 计算视频天数的参考时间，默认为当前时间
+
+        Returns:
+            与 videos 顺序一致、列为 FEATURE_NAMES 的特征表
+        """
+        columns = cls.RAW_COLUMNS
+        df = pd.DataFrame.from_records(
+            [tuple(getattr(video, column) for column in columns) for video in videos],
+            columns=columns
+        )
+        return cls.extract_features_frame(df, now)
+
     @classmethod
     def extract_features_from_dict(cls, data: Dict) -> Dict[str, float]:
         """
@@ -128,12 +206,7 @@ class FeatureExtractor:
     @classmethod
     def get_feature_names(cls) -> List[str]:
         """获取特征名称列表"""
-        return cls.FEATURE_NAMES.copy()
-
-    @classmethod
-    def features_to_array(cls, features: Dict[str, float]) -> np.ndarray:
-        """将特征字典转换为模型输入数组"""
-        return np.array([[features.get(name, 0) for name in cls.FEATURE_NAMES]])
+        return list(cls.FEATURE_NAMES)
 
     @classmethod
     def get_feature_name_mapping(cls) -> Dict[str, str]:
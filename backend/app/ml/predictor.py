@@ -5,11 +5,14 @@
 import os
 import pickle
 import logging
-from typing import Dict
+from typing import Dict, List, Tuple
 from datetime import datetime
 from pathlib import Path
 
+import numpy as np
+import pandas as pd
 from sqlalchemy.orm import Session
+from xgboost import XGBRegressor
 
 from app.models import Video
 from app.ml.features import FeatureExtractor
@@ -18,8 +21,15 @@ logger = logging.getLogger(__name__)
 
 # 模型文件路径
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
-MODEL_PATH = BASE_DIR / "ml_models" / "xgboost_predictor.pkl"
-COIN_MODEL_PATH = BASE_DIR / "ml_models" / "xgboost_coin_predictor.pkl"
+MODEL_PATH = BASE_DIR / "ml_models" / "xgboost_predictor.json"
+COIN_MODEL_PATH = BASE_DIR / "ml_models" / "xgboost_coin_predictor.json"
+# 旧版 pickle 格式，兼容读取
+LEGACY_MODEL_PATH = BASE_DIR / "ml_models" / "xgboost_predictor.pkl"
+LEGACY_COIN_MODEL_PATH = BASE_DIR / "ml_models" / "xgboost_coin_predictor.pkl"
+
+# 热度等级：增长率 <0 冷却、[0, 30) 正常、[30, 100) 上升、>=100 爆款潜力
+HEAT_LEVEL_THRESHOLDS = np.array([0, 30, 100], dtype=np.float64)
+HEAT_LEVELS = ("cold", "normal", "rising", "hot")
 
 
 class HotPredictor:
@@ -28,33 +38,72 @@ class HotPredictor:
     def __init__(self):
         self.model = None
         self.coin_model = None
+        # 底层 Booster：直接 inplace_predict，跳过 scikit-learn 包装层的输入校验
+        self._booster = None
+        self._coin_booster = None
+        # 训练时提前停止的模型只用到最佳迭代为止的树（(0, 0) 表示全部）
+        self._iteration_range = (0, 0)
+        self._coin_iteration_range = (0, 0)
         self.feature_names = FeatureExtractor.get_feature_names()
+        self._feature_importance: Dict[str, float] = {}
         self._load_model()
 
+    @staticmethod
+    def _read_model(path: Path, legacy_path: Path):
+        """
+        读取 XGBoost 模型：优先原生格式，不存在时回退旧版 pickle
+
+        Returns:
+            模型对象；两种文件都不存在时返回 None
+        """
+        if path.exists():
+            model = XGBRegressor()
+            model.load_model(str(path))
+            return model
+        if legacy_path.exists():
+            with open(legacy_path, 'rb') as f:
+                return pickle.load(f)
+        return None
+
+    @staticmethod
+    def _best_iteration_range(model) -> Tuple[int, int]:
+        """提前停止训练的模型返回到最佳迭代为止的树范围，否则使用全部树"""
+        try:
+            return (0, model.best_iteration + 1)
+        except AttributeError:
+            return (0, 0)
+
     def _load_model(self):
         """加载预训练模型"""
-        if MODEL_PATH.exists():
-            try:
-                with open(MODEL_PATH, 'rb') as f:
-                    self.model = pickle.load(f)
+        try:
+            self.model = self._read_model(MODEL_PATH, LEGACY_MODEL_PATH)
+            if self.model is not None:
+                self._booster = self.model.get_booster()
+                self._iteration_range = self._best_iteration_range(self.model)
                 logger.info("XGBoost 模型加载成功")
-            except Exception as e:
-                logger.error(f"模型加载失败: {e}")
-                self.model = None
-        else:
-            logger.warning(f"模型文件不存在: {MODEL_PATH}")
+            else:
+                logger.warning(f"模型文件不存在: {MODEL_PATH}")
+        except Exception as e:
+            logger.error(f"模型加载失败: {e}")
+            self.model = None
+            self._booster = None
+
+        # 特征重要性随模型固定，加载时计算一次
+        self._feature_importance = self._compute_feature_importance()
 
         # 加载投币预测模型
-        if COIN_MODEL_PATH.exists():
-            try:
-                with open(COIN_MODEL_PATH, 'rb') as f:
-                    self.coin_model = pickle.load(f)
+        try:
+            self.coin_model = self._read_model(COIN_MODEL_PATH, LEGACY_COIN_MODEL_PATH)
+            if self.coin_model is not None:
+                self._coin_booster = self.coin_model.get_booster()
+                self._coin_iteration_range = self._best_iteration_range(self.coin_model)
                 logger.info("投币预测模型加载成功")
-            except Exception as e:
-                logger.error(f"投币模型加载失败: {e}")
-                self.coin_model = None
-        else:
-            logger.warning(f"投币模型文件不存在: {COIN_MODEL_PATH}")
+            else:
+                logger.warning(f"投币模型文件不存在: {COIN_MODEL_PATH}")
+        except Exception as e:
+            logger.error(f"投币模型加载失败: {e}")
+            self.coin_model = None
+            self._coin_booster = None
 
     def reload_model(self):
         """重新加载模型"""
@@ -74,20 +123,37 @@ class HotPredictor:
         Returns:
             预测结果字典
         """
-        if not self.is_ready():
-            return {
-                "success": False,
-                "error": "模型未加载，请先训练模型"
-            }
+        return self.predict_many([video])[0]
+
+    def predict_many(self, videos: List[Video]) -> List[Dict]:
+        """
+        批量预测视频热度（整批只调用一次模型）
 
-        features = FeatureExtractor.extract_features(video)
-        result = self._predict(features, video.bvid, video.title)
+        Args:
+            videos: Video ORM 对象列表
+
+        Returns:
+            与 videos 顺序一致的预测结果字典列表
+        """
+        if not self.is_ready():
+            return [
+                {"success": False, "error": "模型未加载，请先训练模型"}
+                for _ in videos
+            ]
+
+        features = FeatureExtractor.extract_features_batch(videos, datetime.now())
+        results = self._predict_batch(
+            features,
+            [video.bvid for video in videos],
+            [video.title for video in videos]
+        )
 
         # 用实际投币数覆盖从比率计算出的值
-        if result.get("success") and "current_coin_count" in result:
-            result["current_coin_count"] = video.coin_count or 0
+        for video, result in zip(videos, results):
+            if result.get("success") and "current_coin_count" in result:
+                result["current_coin_count"] = video.coin_count or 0
 
-        return result
+        return results
 
     def predict_by_bvid(self, bvid: str, db: Session) -> Dict:
         """
@@ -100,14 +166,29 @@ class HotPredictor:
         Returns:
             预测结果字典
         """
-        video = db.query(Video).filter(Video.bvid == bvid).first()
-        if not video:
-            return {
-                "success": False,
-                "error": f"视频不存在: {bvid}"
-            }
+        return self.predict_by_bvids([bvid], db)[0]
 
-        return self.predict_by_video(video)
+    def predict_by_bvids(self, bvids: List[str], db: Session) -> List[Dict]:
+        """
+        根据多个 BVID 批量预测热度（一次查询、一次模型调用）
+
+        Args:
+            bvids: 视频 BV 号列表
+            db: 数据库会话
+
+        Returns:
+            与 bvids 顺序一致的预测结果字典列表，不存在的视频返回错误项
+        """
+        videos = db.query(Video).filter(Video.bvid.in_(bvids)).all()
+        video_map = {video.bvid: video for video in videos}
+        found = [video_map[bvid] for bvid in bvids if bvid in video_map]
+        predictions = iter(self.predict_many(found))
+
+        return [
+            next(predictions) if bvid in video_map
+            else {"success": False, "error": f"视频不存在: {bvid}"}
+            for bvid in bvids
+        ]
 
     def predict_by_params(self, params: Dict) -> Dict:
         """
@@ -126,98 +207,117 @@ class HotPredictor:
             }
 
         features = FeatureExtractor.extract_features_from_dict(params)
-        return self._predict(features, "manual", "手动输入")
-
-    def _predict(self, features: Dict[str, float], bvid: str, title: str) -> Dict:
+        features = pd.DataFrame([features], columns=FeatureExtractor.get_feature_names())
+        return self._predict_batch(features, ["manual"], ["手动输入"])[0]
+
+    def _predict_batch(
+        self,
+        features: pd.DataFrame,
+        bvids: List[str],
+        titles: List[str]
+    ) -> List[Dict]:
         """
         执行预测
 
         Args:
-            features: 特征字典
-            bvid: 视频 BV 号
-            title: 视频标题
+            features: 特征表（列为 FEATURE_NAMES，每行一个视频）
+            bvids: 视频 BV 号列表
+            titles: 视频标题列表
 
         Returns:
-            预测结果字典
+            预测结果字典列表
         """
+        if features.empty:
+            return []
+
+        features_list = features.to_dict('records')
         try:
-            X = FeatureExtractor.features_to_array(features)
+            X = features.to_numpy(dtype=np.float32)
 
             # 预测 7 天后的播放量
-            predicted_play = float(self.model.predict(X)[0])
-
-            # 计算增长量和增长率
-            current_play = features['current_play_count']
-            play_increment = predicted_play - current_play
-            growth_rate = (play_increment / current_play) * 100 if current_play > 0 else 0
-
-            # 获取特征重要性
-            feature_importance = self._get_feature_importance()
-
-            # 热度等级判断
-            heat_level = self._calculate_heat_level(growth_rate)
-
-            result = {
-                "success": True,
-                "bvid": bvid,
-                "title": title,
-                "current_play_count": int(current_play),
-                "predicted_play_count": int(max(predicted_play, current_play)),
-                "play_increment": int(play_increment),
-                "growth_rate": round(growth_rate, 2),
-                "heat_level": heat_level,
-                "prediction_days": 7,
-                "feature_importance": feature_importance,
-                "features_used": {k: round(v, 6) if isinstance(v, float) else v for k, v in features.items()},
-                "predicted_at": datetime.now().isoformat()
-            }
+            predicted_plays = self._booster.inplace_predict(X, iteration_range=self._iteration_range)
 
             # 投币量预测
-            coin_prediction = self._predict_coins(X, features)
-            result.update(coin_prediction)
-
-            return result
+            coin_predictions = self._predict_coins(X, features)
+
+            # 整批计算增长量、增长率和热度等级
+            predicted_plays = np.asarray(predicted_plays, dtype=np.float64)
+            current_plays = features['current_play_count'].to_numpy(dtype=np.float64)
+            play_increments = predicted_plays - current_plays
+            growth_rates = np.where(
+                current_plays > 0,
+                play_increments / np.where(current_plays > 0, current_plays, 1) * 100,
+                0.0
+            )
+            heat_levels = self._calculate_heat_levels(growth_rates)
+
+            predicted_at = datetime.now().isoformat()
+            results = []
+            for i, row in enumerate(features_list):
+                result = {
+                    "success": True,
+                    "bvid": bvids[i],
+                    "title": titles[i],
+                    "current_play_count": int(current_plays[i]),
+                    "predicted_play_count": int(max(predicted_plays[i], current_plays[i])),
+                    "play_increment": int(play_increments[i]),
+                    "growth_rate": round(float(growth_rates[i]), 2),
+                    "heat_level": heat_levels[i],
+                    "prediction_days": 7,
+                    "feature_importance": self._get_feature_importance(),
+                    "features_used": {k: round(v, 6) if isinstance(v, float) else v for k, v in row.items()},
+                    "predicted_at": predicted_at
+                }
+                result.update(coin_predictions[i])
+                results.append(result)
+
+            return results
 
         except Exception as e:
             logger.error(f"预测失败: {e}")
-            return {
-                "success": False,
-                "error": str(e)
-            }
+            return [{"success": False, "error": str(e)} for _ in features_list]
 
-    def _predict_coins(self, X, features: Dict[str, float]) -> Dict:
+    def _predict_coins(self, X, features: pd.DataFrame) -> List[Dict]:
         """
         预测 7 天后的投币量
 
         Args:
             X: 特征数组（已构建好的）
-            features: 特征字典
+            features: 特征表
 
         Returns:
-            投币预测结果字典
+            投币预测结果字典列表（模型不可用或预测失败时为空字典）
         """
         if self.coin_model is None:
-            return {}
+            return [{} for _ in range(len(features))]
 
         try:
-            predicted_coins = float(self.coin_model.predict(X)[0])
-            current_coins = int(features.get('coin_rate', 0) * features.get('current_play_count', 1))
-            predicted_coins = int(max(predicted_coins, 0))
-            coin_increment = predicted_coins - current_coins
-            coin_growth_rate = (coin_increment / max(current_coins, 1)) * 100
-
-            return {
-                "current_coin_count": current_coins,
-                "predicted_coin_count": predicted_coins,
-                "coin_increment": coin_increment,
-                "coin_growth_rate": round(coin_growth_rate, 2),
-            }
+            predicted = self._coin_booster.inplace_predict(X, iteration_range=self._coin_iteration_range)
+            current_coin_counts = features['coin_rate'] * features['current_play_count']
+            results = []
+            for current_coins, predicted_coins in zip(current_coin_counts.tolist(), predicted):
+                current_coins = int(current_coins)
+                predicted_coins = int(max(float(predicted_coins), 0))
+                coin_increment = predicted_coins - current_coins
+                coin_growth_rate = (coin_increment / max(current_coins, 1)) * 100
+
+                results.append({
+                    "current_coin_count": current_coins,
+                    "predicted_coin_count": predicted_coins,
+                    "coin_increment": coin_increment,
+                    "coin_growth_rate": round(coin_growth_rate, 2),
+                })
+            return results
         except Exception as e:
             logger.error(f"投币预测失败: {e}")
-            return {}
+            return [{} for _ in range(len(features))]
 
     def _get_feature_importance(self) -> Dict[str, float]:
-        """获取特征重要性"""
+        """获取特征重要性（加载模型时已缓存，返回副本）"""
+        return dict(self._feature_importance)
+
+    def _compute_feature_importance(self) -> Dict[str, float]:
+        """从模型计算特征重要性"""
         if not self.is_ready():
             return {}
 
@@ -230,24 +330,21 @@ class HotPredictor:
         except Exception:
             return {}
 
-    def _calculate_heat_level(self, growth_rate: float) -> str:
+    def _calculate_heat_levels(self, growth_rates: np.ndarray) -> List[str]:
         """
-        根据增长率判断热度等级
+        根据增长率批量判断热度等级
 
         Args:
-            growth_rate: 增长率百分比
+            growth_rates: 增长率百分比数组
 
         Returns:
-            热度等级: 'hot', 'rising', 'normal', 'cold'
+            热度等级列表: 'hot', 'rising', 'normal', 'cold'
         """
-        if growth_rate >= 100:
-            return "hot"       # 爆款潜力
-        elif growth_rate >= 30:
-            return "rising"    # 上升趋势
-        elif growth_rate >= 0:
-            return "normal"    # 正常表现
-        else:
-            return "cold"      # 热度下降
+        growth_rates = np.asarray(growth_rates, dtype=np.float64)
+        codes = np.searchsorted(HEAT_LEVEL_THRESHOLDS, growth_rates, side='right')
+        # searchsorted 把 NaN 排在最后（会判为爆款潜力），无法比较的增长率按冷却处理
+        codes[np.isnan(growth_rates)] = 0
+        return [HEAT_LEVELS[code] for code in codes]
 
     def get_model_info(self) -> Dict:
         """获取模型信息"""
@@ -3,39 +3,71 @@
 基于 TF-IDF + 多维度相似性计算
 """
 import os
+import copy
+import time
 import pickle
 import logging
-from typing import Dict, List, Optional
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
+from scipy import sparse
+from sklearn.preprocessing import normalize
+from sqlalchemy import case
 from sqlalchemy.orm import Session
-import jieba
 
 from app.models import Video
-from app.services.nlp import NLPAnalyzer
+from app.services.nlp import tokenize_title
 
 logger = logging.getLogger(__name__)
 
 # 模型文件路径
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 VECTORIZER_PATH = BASE_DIR / "ml_models" / "tfidf_vectorizer.pkl"
-MATRIX_PATH = BASE_DIR / "ml_models" / "tfidf_matrix.pkl"
+MATRIX_PATH = BASE_DIR / "ml_models" / "tfidf_matrix.npz"
+LEGACY_MATRIX_PATH = BASE_DIR / "ml_models" / "tfidf_matrix.pkl"  # 旧版 pickle 格式，兼容读取
 VIDEO_INDEX_PATH = BASE_DIR / "ml_models" / "video_index.pkl"
 
+# 推荐结果缓存：热门视频的推荐会被反复请求
+RESULT_CACHE_SIZE = 4096
+RESULT_CACHE_TTL = 300  # 秒
+# 新视频标题分词缓存容量
+TOKEN_CACHE_SIZE = 8192
+# 已入索引视频的相似行缓存容量（每项只存前 top_k*3 个行号与相似度）
+SIM_CACHE_SIZE = 2048
+
+# 推荐结果展示所需的列
+RESULT_COLUMNS = (
+    Video.bvid, Video.title, Video.cover_url, Video.author_name, Video.author_id,
+    Video.category, Video.play_count, Video.like_count,
+)
+# 多维度评分额外需要的列
+SCORE_COLUMNS = RESULT_COLUMNS + (Video.coin_count, Video.favorite_count, Video.duration)
+
+
+@lru_cache(maxsize=TOKEN_CACHE_SIZE)
+def _cached_tokenize_title(text: str) -> str:
+    """带缓存的标题分词：未入索引的新视频会被反复查询，避免每次重新调用 jieba"""
+    return tokenize_title(text)
+
 
 class VideoRecommender:
     """视频相似推荐器"""
 
-    # 使用统一停用词
-    STOP_WORDS = NLPAnalyzer.STOP_WORDS
-
     def __init__(self):
         self.vectorizer = None
         self.tfidf_matrix = None
         self.video_index: Dict[str, int] = {}   # bvid -> matrix_index
-        self.index_video: Dict[int, str] = {}   # matrix_index -> bvid
+        self.bvids = np.empty(0, dtype=object)  # matrix_index -> bvid
+        # (bvid, top_k, include_same_category, include_same_author) -> (写入时间, 结果)
+        self._result_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._result_cache_lock = threading.Lock()
+        # 矩阵行号 -> (相似行号数组, 相似度数组)
+        self._sim_cache: "OrderedDict[int, Tuple[np.ndarray, np.ndarray]]" = OrderedDict()
+        self._sim_cache_lock = threading.Lock()
         self._load_models()
 
     def _load_models(self):
@@ -47,14 +79,19 @@ class VideoRecommender:
                 logger.info("TF-IDF vectorizer 加载成功")
 
             if MATRIX_PATH.exists():
-                with open(MATRIX_PATH, 'rb') as f:
-                    self.tfidf_matrix = pickle.load(f)
+                self.tfidf_matrix = sparse.load_npz(MATRIX_PATH)
                 logger.info("TF-IDF matrix 加载成功")
+            elif LEGACY_MATRIX_PATH.exists():
+                with open(LEGACY_MATRIX_PATH, 'rb') as f:
+                    self.tfidf_matrix = pickle.load(f)
+                logger.info("TF-IDF matrix 加载成功（旧版 pickle 格式）")
 
             if VIDEO_INDEX_PATH.exists():
                 with open(VIDEO_INDEX_PATH, 'rb') as f:
                     self.video_index = pickle.load(f)
-                    self.index_video = {v: k for k, v in self.video_index.items()}
+                self.bvids = np.empty(len(self.video_index), dtype=object)
+                for video_bvid, index in self.video_index.items():
+                    self.bvids[index] = video_bvid
                 logger.info(f"视频索引加载成功，共 {len(self.video_index)} 个视频")
 
         except Exception as e:
@@ -63,6 +100,10 @@ class VideoRecommender:
     def reload_models(self):
         """重新加载模型"""
         self._load_models()
+        with self._result_cache_lock:
+            self._result_cache.clear()
+        with self._sim_cache_lock:
+            self._sim_cache.clear()
 
     def is_ready(self) -> bool:
         """检查模型是否已加载"""
@@ -74,8 +115,7 @@ class VideoRecommender:
 
     def _tokenize(self, text: str) -> str:
         """中文分词"""
-        words = jieba.cut(text)
-        return ' '.join([w for w in words if w.strip() and w not in self.STOP_WORDS])
+        return _cached_tokenize_title(text)
 
     def recommend_by_bvid(
         self,
@@ -98,8 +138,37 @@ class VideoRecommender:
         Returns:
             推荐结果字典
         """
+        key = (bvid, top_k, include_same_category, include_same_author)
+        now = time.monotonic()
+        with self._result_cache_lock:
+            cached = self._result_cache.get(key)
+            if cached is not None and now - cached[0] < RESULT_CACHE_TTL:
+                self._result_cache.move_to_end(key)
+                return copy.deepcopy(cached[1])
+
+        result = self._recommend(bvid, db, top_k, include_same_category, include_same_author)
+
+        # 只缓存成功的结果，失败（如视频尚未入库）下次重新查询
+        if result.get("success"):
+            with self._result_cache_lock:
+                self._result_cache[key] = (now, copy.deepcopy(result))
+                self._result_cache.move_to_end(key)
+                if len(self._result_cache) > RESULT_CACHE_SIZE:
+                    self._result_cache.popitem(last=False)
+
+        return result
+
+    def _recommend(
+        self,
+        bvid: str,
+        db: Session,
+        top_k: int,
+        include_same_category: bool,
+        include_same_author: bool
+    ) -> Dict:
+        """推荐主流程（不经过结果缓存）"""
         # 查询目标视频
-        target_video = db.query(Video).filter(Video.bvid == bvid).first()
+        target_video = db.query(*SCORE_COLUMNS).filter(Video.bvid == bvid).first()
         if not target_video:
             return {
                 "success": False,
@@ -127,39 +196,27 @@ class VideoRecommender:
         """基于 TF-IDF 的推荐"""
         bvid = target_video.bvid
 
+        # 只对前 top_k*3 个候选排序（目标视频自身可能在其中，多选一个）
+        pool_size = top_k * 3 + 1
+
         # 检查视频是否在索引中
         if bvid not in self.video_index:
             # 实时计算新视频的 TF-IDF 向量
             text = self._tokenize(target_video.title or "")
-            target_vector = self.vectorizer.transform([text])
+            target_vector = normalize(self.vectorizer.transform([text]), norm='l2', copy=False)
+            similar_indices, similar_scores = self._top_similar(target_vector, pool_size)
         else:
-            idx = self.video_index[bvid]
-            target_vector = self.tfidf_matrix[idx]
-
-        # 计算余弦相似度
-        similarities = cosine_similarity(target_vector, self.tfidf_matrix).flatten()
-
-        # 获取相似度排名（降序）
-        similar_indices = similarities.argsort()[::-1]
-
-        # 查询候选视频
-        candidates = []
-        for idx in similar_indices:
-            if len(candidates) >= top_k * 3:  # 多取一些用于过滤
-                break
-
-            candidate_bvid = self.index_video.get(idx)
-            if not candidate_bvid or candidate_bvid == bvid:
-                continue
-
-            similarity_score = float(similarities[idx])
-            if similarity_score <= 0:  # 只跳过完全无关的
-                continue
-
-            candidates.append({
-                "bvid": candidate_bvid,
-                "title_similarity": similarity_score
-            })
+            similar_indices, similar_scores = self._indexed_top_similar(self.video_index[bvid], pool_size)
+
+        # 查询候选视频：排除目标视频自身，只跳过完全无关的，多取一些用于过滤
+        candidate_bvids = self.bvids[similar_indices]
+        mask = (candidate_bvids != bvid) & (similar_scores > 0)
+        candidates = [
+            {"bvid": candidate_bvid, "title_similarity": float(similarity_score)}
+            for candidate_bvid, similarity_score in zip(
+                candidate_bvids[mask][:top_k * 3], similar_scores[mask][:top_k * 3]
+            )
+        ]
 
         logger.info(f"TF-IDF 为 {bvid} 找到 {len(candidates)} 个候选")
 
@@ -170,7 +227,7 @@ class VideoRecommender:
 
         # 获取完整视频信息
         candidate_bvids = [c["bvid"] for c in candidates]
-        videos = db.query(Video).filter(Video.bvid.in_(candidate_bvids)).all()
+        videos = db.query(*SCORE_COLUMNS).filter(Video.bvid.in_(candidate_bvids)).all()
         video_map = {v.bvid: v for v in videos}
 
         logger.info(f"数据库中匹配到 {len(video_map)}/{len(candidate_bvids)} 个候选视频")
@@ -181,62 +238,30 @@ class VideoRecommender:
             return self._simple_recommend(target_video, db, top_k)
 
         # 多维度评分
-        results = []
-        for candidate in candidates:
-            video = video_map.get(candidate["bvid"])
-            if not video:
-                continue
-
-            # 排除同作者（如果需要）
-            if not include_same_author and video.author_id == target_video.author_id:
-                continue
-
-            # 计算综合相似度分数
-            score = self._calculate_multi_score(
-                target_video, video, candidate["title_similarity"],
-                include_same_category
-            )
-
-            results.append({
-                "bvid": video.bvid,
-                "title": video.title,
-                "cover_url": video.cover_url,
-                "author_name": video.author_name,
-                "category": video.category,
-                "play_count": video.play_count or 0,
-                "like_count": video.like_count or 0,
-                "similarity_score": round(score, 4),
-                "title_similarity": round(candidate["title_similarity"], 4),
-                "same_category": video.category == target_video.category,
-                "same_author": video.author_id == target_video.author_id
-            })
+        matched = [
+            (video_map[candidate["bvid"]], candidate["title_similarity"])
+            for candidate in candidates
+            if candidate["bvid"] in video_map
+        ]
+
+        # 排除同作者（如果需要）
+        if include_same_author:
+            filtered = matched
+        else:
+            filtered = [
+                (video, similarity) for video, similarity in matched
+                if video.author_id != target_video.author_id
+            ]
+        results = self._build_results(target_video, filtered, include_same_category)
 
         # 如果同作者过滤后没有结果，放宽条件重试
         if not results and not include_same_author:
             logger.info(f"同作者过滤后无结果，放宽条件重试: {bvid}")
-            for candidate in candidates:
-                video = video_map.get(candidate["bvid"])
-                if not video or video.bvid == bvid:
-                    continue
-
-                score = self._calculate_multi_score(
-                    target_video, video, candidate["title_similarity"],
-                    include_same_category
-                )
-
-                results.append({
-                    "bvid": video.bvid,
-                    "title": video.title,
-                    "cover_url": video.cover_url,
-                    "author_name": video.author_name,
-                    "category": video.category,
-                    "play_count": video.play_count or 0,
-                    "like_count": video.like_count or 0,
-                    "similarity_score": round(score, 4),
-                    "title_similarity": round(candidate["title_similarity"], 4),
-                    "same_category": video.category == target_video.category,
-                    "same_author": video.author_id == target_video.author_id
-                })
+            results = self._build_results(
+                target_video,
+                [(video, similarity) for video, similarity in matched if video.bvid != bvid],
+                include_same_category
+            )
 
         # 仍然没有结果，回退到简单推荐
         if not results:
@@ -260,15 +285,79 @@ class VideoRecommender:
             "method": "tfidf_multi_score"
         }
 
-    def _calculate_multi_score(
+    def _top_similar(self, target_vector, pool_size: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        取与目标向量最相似的 pool_size 个矩阵行
+
+        Returns:
+            (行号数组, 相似度数组)，按相似度降序
+        """
+        # 计算余弦相似度（矩阵行与目标向量均已 L2 归一化，稀疏点积即余弦）
+        similarities = (target_vector @ self.tfidf_matrix.T).toarray().ravel()
+
+        pool_size = min(pool_size, len(similarities))
+        top_indices = np.argpartition(-similarities, pool_size - 1)[:pool_size]
+        top_indices = top_indices[np.argsort(-similarities[top_indices], kind="stable")]
+        return top_indices, similarities[top_indices]
+
+    def _indexed_top_similar(self, idx: int, pool_size: int) -> Tuple[np.ndarray, np.ndarray]:
+        """已入索引视频的相似行只取决于模型，按矩阵行号缓存前 pool_size 个结果"""
+        with self._sim_cache_lock:
+            cached = self._sim_cache.get(idx)
+            if cached is not None and (len(cached[0]) >= pool_size or len(cached[0]) == len(self.bvids)):
+                self._sim_cache.move_to_end(idx)
+                return cached[0][:pool_size], cached[1][:pool_size]
+
+        top = self._top_similar(self.tfidf_matrix[idx], pool_size)
+
+        with self._sim_cache_lock:
+            self._sim_cache[idx] = top
+            self._sim_cache.move_to_end(idx)
+            if len(self._sim_cache) > SIM_CACHE_SIZE:
+                self._sim_cache.popitem(last=False)
+
+        return top
+
+    def _build_results(
+        self,
+        target: Video,
+        matched: List[tuple],
+        include_same_category: bool
+    ) -> List[Dict]:
+        """对 (候选视频, 标题相似度) 列表批量评分并组装推荐结果"""
+        if not matched:
+            return []
+
+        videos = [video for video, _ in matched]
+        title_similarities = np.array([similarity for _, similarity in matched], dtype=np.float64)
+        scores = self._calculate_multi_scores(target, videos, title_similarities, include_same_category)
+
+        return [
+            {
+                "bvid": video.bvid,
+                "title": video.title,
+                "cover_url": video.cover_url,
+                "author_name": video.author_name,
+                "category": video.category,
+                "play_count": video.play_count or 0,
+                "like_count": video.like_count or 0,
+                "similarity_score": round(float(score), 4),
+                "title_similarity": round(title_similarity, 4),
+                "same_category": video.category == target.category,
+                "same_author": video.author_id == target.author_id
+            }
+            for (video, title_similarity), score in zip(matched, scores)
+        ]
+
+    def _calculate_multi_scores(
         self,
         target: Video,
-        candidate: Video,
-        title_similarity: float,
+        candidates: List[Video],
+        title_similarities: np.ndarray,
         include_same_category: bool
-    ) -> float:
+    ) -> np.ndarray:
         """
-        计算多维度综合相似分数
+        批量计算多维度综合相似分数
 
         权重分配:
         - 标题相似度: 50%
@@ -277,30 +366,35 @@ class VideoRecommender:
         - 时长相似度: 10%
         - 热度加成: 5%
         """
-        score = title_similarity * 0.5
+        scores = title_similarities * 0.5
 
         # 分区匹配加成
-        if include_same_category and candidate.category == target.category:
-            score += 0.2
-
-        # 互动率相似度
+        if include_same_category:
+            same_category = np.array([video.category == target.category for video in candidates])
+            scores = scores + np.where(same_category, 0.2, 0.0)
+
+        # 互动率相似度（目标视频只算一次）
+        play = np.array([video.play_count or 0 for video in candidates], dtype=np.float64)
+        interactions = np.array([
+            (video.like_count or 0) + (video.coin_count or 0) + (video.favorite_count or 0)
+            for video in candidates
+        ], dtype=np.float64)
+        candidate_rates = interactions / np.maximum(play, 1)
         target_rate = self._calc_interaction_rate(target)
-        candidate_rate = self._calc_interaction_rate(candidate)
-        rate_diff = abs(target_rate - candidate_rate)
-        rate_similarity = max(0, 1 - rate_diff * 10)  # 差异越小越相似
-        score += rate_similarity * 0.15
+        rate_similarity = np.maximum(0, 1 - np.abs(target_rate - candidate_rates) * 10)  # 差异越小越相似
+        scores = scores + rate_similarity * 0.15
 
         # 时长相似度
-        if target.duration and candidate.duration:
-            duration_ratio = min(target.duration, candidate.duration) / max(target.duration, candidate.duration)
-            score += duration_ratio * 0.1
+        if target.duration:
+            duration = np.array([video.duration or 0 for video in candidates], dtype=np.float64)
+            duration_ratio = np.minimum(duration, target.duration) / np.maximum(duration, target.duration)
+            scores = scores + np.where(duration > 0, duration_ratio * 0.1, 0.0)
 
         # 热度加成（播放量较高的适当加分）
-        if candidate.play_count and candidate.play_count > 10000:
-            heat_bonus = min(0.05, np.log10(candidate.play_count) / 100)
-            score += heat_bonus
+        heat_bonus = np.minimum(0.05, np.log10(np.maximum(play, 1)) / 100)
+        scores = scores + np.where(play > 10000, heat_bonus, 0.0)
 
-        return score
+        return scores
 
     def _calc_interaction_rate(self, video: Video) -> float:
         """计算互动率"""
@@ -313,53 +407,28 @@ class VideoRecommender:
         简单推荐（模型未加载时的备用方案）
         基于分区和热度推荐
         """
-        results = []
-
-        # 优先同分区
+        # 一次查询：同分区优先，其余按热度补充
+        query = db.query(*RESULT_COLUMNS).filter(Video.bvid != target_video.bvid)
         if target_video.category:
-            same_category = db.query(Video).filter(
-                Video.bvid != target_video.bvid,
-                Video.category == target_video.category
-            ).order_by(Video.play_count.desc()).limit(top_k).all()
-
-            for video in same_category:
-                results.append({
-                    "bvid": video.bvid,
-                    "title": video.title,
-                    "cover_url": video.cover_url,
-                    "author_name": video.author_name,
-                    "category": video.category,
-                    "play_count": video.play_count or 0,
-                    "like_count": video.like_count or 0,
-                    "similarity_score": 0.5,
-                    "title_similarity": 0.0,
-                    "same_category": True,
-                    "same_author": video.author_id == target_video.author_id
-                })
-
-        # 补充热门视频
-        if len(results) < top_k:
-            existing_bvids = {r["bvid"] for r in results}
-            existing_bvids.add(target_video.bvid)
-
-            hot_videos = db.query(Video).filter(
-                Video.bvid.notin_(existing_bvids)
-            ).order_by(Video.play_count.desc()).limit(top_k - len(results)).all()
-
-            for video in hot_videos:
-                results.append({
-                    "bvid": video.bvid,
-                    "title": video.title,
-                    "cover_url": video.cover_url,
-                    "author_name": video.author_name,
-                    "category": video.category,
-                    "play_count": video.play_count or 0,
-                    "like_count": video.like_count or 0,
-                    "similarity_score": 0.3,
-                    "title_similarity": 0.0,
-                    "same_category": video.category == target_video.category,
-                    "same_author": video.author_id == target_video.author_id
-                })
+            query = query.order_by(case((Video.category == target_video.category, 0), else_=1))
+        videos = query.order_by(Video.play_count.desc()).limit(top_k).all()
+
+        results = []
+        for video in videos:
+            same_category = video.category == target_video.category
+            results.append({
+                "bvid": video.bvid,
+                "title": video.title,
+                "cover_url": video.cover_url,
+                "author_name": video.author_name,
+                "category": video.category,
+                "play_count": video.play_count or 0,
+                "like_count": video.like_count or 0,
+                "similarity_score": 0.5 if target_video.category and same_category else 0.3,
+                "title_similarity": 0.0,
+                "same_category": same_category,
+                "same_author": video.author_id == target_video.author_id
+            })
 
         return {
             "success": True,
@@ -369,8 +438,8 @@ class VideoRecommender:
                 "category": target_video.category,
                 "author_name": target_video.author_name
             },
-            "recommendations": results[:top_k],
-            "total": len(results[:top_k]),
+            "recommendations": results,
+            "total": len(results),
             "method": "simple_category_based"
         }
 
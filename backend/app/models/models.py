@@ -9,8 +9,10 @@ from sqlalchemy import (
     String,
     Text,
     Float,
+    Date,
     DateTime,
     Boolean,
+    Computed,
     UniqueConstraint,
     Index,
     JSON,
@@ -61,10 +63,18 @@ class Video(Base):
     danmaku_count = Column(Integer, default=0)
     comment_count = Column(Integer, default=0)
     publish_time = Column(DateTime)
+    # 发布日期（由 publish_time 生成的存储列，按日聚合时直接分组，无需逐行调用 DATE()）
+    publish_date = Column(Date, Computed("DATE(publish_time)", persisted=True), index=True)
     duration = Column(Integer)  # 视频时长（秒）
     cover_url = Column(String(500))
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # 按发布时间范围筛选/按日聚合播放量（前缀亦可单独服务发布时间范围查询）
+        Index("idx_videos_publish_play", "publish_time", "play_count"),
+        Index("idx_videos_category_publish_time", "category", "publish_time"),
+    )
+
 
 class Comment(Base):
     """评论表"""
@@ -105,12 +115,18 @@ class Danmaku(Base):
     __tablename__ = "danmakus"
 
     id = Column(BigInteger, primary_key=True, index=True)
-    video_id = Column(BigInteger, index=True, nullable=False)
-    content = Column(String(500), nullable=False)
+    video_id = Column(BigInteger, nullable=False)
+    # 二进制排序规则：唯一键按原样比较，仅大小写或全/半角不同的弹幕各自保留
+    content = Column(String(500, collation='utf8mb4_bin'), nullable=False)
     send_time = Column(Float)  # 视频内时间点
     color = Column(String(20))
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # 同一视频相同内容的弹幕只保留一条（兼作 video_id 查询索引）
+        UniqueConstraint('video_id', 'content', name='uk_danmakus_video_content'),
+    )
+
 
 class Keyword(Base):
     """热词统计表"""
@@ -119,10 +135,14 @@ class Keyword(Base):
     id = Column(Integer, primary_key=True, index=True)
     word = Column(String(50), index=True, nullable=False)
     frequency = Column(Integer, default=0)
-    category = Column(String(50))
+    category = Column(String(50), nullable=False, default='')  # 空串表示全站热词
     stat_date = Column(DateTime, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        UniqueConstraint('word', 'category', name='uk_keywords_word_category'),
+    )
+
 
 class CrawlLog(Base):
     """采集日志表"""
@@ -30,10 +30,11 @@ class DwdVideoSnapshot(Base):
     """
     __tablename__ = "dwd_video_snapshot"
 
-    id = Column(BigInteger, primary_key=True, index=True)
+    # 按月 RANGE 分区，MySQL 要求主键包含分区键（分区DDL见 docs/sql/migrations，新分区由ETL调度器预建）
+    id = Column(BigInteger, primary_key=True, autoincrement=True, index=True)
 
     # 快照日期（分区键）
-    snapshot_date = Column(Date, nullable=False, index=True)
+    snapshot_date = Column(Date, primary_key=True, nullable=False, index=True)
 
     # 视频基础信息
     video_id = Column(BigInteger, nullable=False, index=True)
@@ -83,10 +84,11 @@ class DwdCommentDaily(Base):
     """
     __tablename__ = "dwd_comment_daily"
 
-    id = Column(BigInteger, primary_key=True, index=True)
+    # 按月 RANGE 分区，主键包含分区键（同 dwd_video_snapshot）
+    id = Column(BigInteger, primary_key=True, autoincrement=True, index=True)
 
-    # 统计日期
-    stat_date = Column(Date, nullable=False, index=True)
+    # 统计日期（分区键）
+    stat_date = Column(Date, primary_key=True, nullable=False, index=True)
 
     # 评论信息
     comment_id = Column(BigInteger, nullable=False, index=True)
@@ -300,7 +302,8 @@ class DwdKeywordDaily(Base):
     __table_args__ = (
         UniqueConstraint('word', 'stat_date', 'source', 'category', name='uk_keyword_daily'),
         Index('idx_keyword_date_freq', 'stat_date', 'frequency'),
-        Index('idx_keyword_source', 'stat_date', 'source'),
+        # 按日期+来源取频次 Top-K：索引内已按频次降序，word 一并覆盖，无需回表和排序
+        Index('idx_keyword_date_source_freq', 'stat_date', 'source', frequency.desc(), 'word'),
     )
 
 
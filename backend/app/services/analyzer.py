@@ -1,13 +1,47 @@
 """
 数据分析服务
 """
-from typing import List, Dict, Optional
-from datetime import datetime, timedelta
+from collections import Counter
+from typing import List, Dict, Optional, Tuple
+from datetime import date, datetime, timedelta
+
+import orjson
+from sqlalchemy.dialects.mysql import insert as mysql_insert
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, or_
 
 from app.models import Video, Comment, Keyword
-from app.services.nlp import NLPAnalyzer
+from app.models.warehouse import DwsCategoryDaily, DwsKeywordStats
+from app.services.nlp import get_nlp
+from app.services.redis_service import get_cached_json, set_cached_json
+
+# 流式读取标题时每批的行数
+STREAM_BATCH_SIZE = 5000
+# 热词表保留的词数
+KEYWORD_LIMIT = 200
+# 情感分析采样的评论数及每批处理的条数
+SENTIMENT_SAMPLE_LIMIT = 1000
+SENTIMENT_BATCH_SIZE = 256
+
+# 分区分布/每日趋势结果缓存（键含当天日期，跨天自动换键；采集后ETL完成时整体失效）
+ANALYSIS_CACHE_PREFIX = "analyzer:"
+ANALYSIS_CACHE_TTL = 300
+
+# 分区为空时的展示名；数仓 ETL 把空分区记为“未分类”，读取数仓时统一换成该名称
+UNKNOWN_CATEGORY = '未知'
+DWS_UNCATEGORIZED = '未分类'
+
+# 每日趋势可选指标：指标名 -> (聚合函数, 列)；未知指标按播放量统计
+TREND_METRICS = {
+    'video_count': (func.count, Video.id),
+    'play_count': (func.sum, Video.play_count),
+    'like_count': (func.sum, Video.like_count),
+    'coin_count': (func.sum, Video.coin_count),
+    'share_count': (func.sum, Video.share_count),
+    'favorite_count': (func.sum, Video.favorite_count),
+    'danmaku_count': (func.sum, Video.danmaku_count),
+    'comment_count': (func.sum, Video.comment_count),
+}
 
 
 class DataAnalyzer:
@@ -15,103 +49,201 @@ class DataAnalyzer:
 
     def __init__(self, db: Session):
         self.db = db
-        self.nlp = NLPAnalyzer()
+        self.nlp = get_nlp()
 
     def analyze_video_titles(self, days: int = 7) -> List[Dict]:
         """
         分析视频标题热词
         """
         start_date = datetime.now() - timedelta(days=days)
-        videos = self.db.query(Video).filter(
-            Video.publish_time >= start_date
-        ).all()
-
-        titles = [v.title for v in videos]
+        titles = [
+            title for (title,) in self.db.query(Video.title).filter(
+                Video.publish_time >= start_date
+            ).yield_per(STREAM_BATCH_SIZE)
+        ]
         return self.nlp.get_word_cloud_data(titles, top_k=100)
 
     def analyze_comments_sentiment(self, video_id: Optional[int] = None) -> Dict:
         """
         分析评论情感分布
         """
-        query = self.db.query(Comment)
+        query = self.db.query(Comment.content)
         if video_id:
             query = query.filter(Comment.video_id == video_id)
 
-        comments = query.limit(1000).all()
-        texts = [c.content for c in comments]
+        # 分批流式读取并累加各类计数，内存中只保留一批评论
+        counts = Counter()
+        chunk = []
+        for (content,) in query.limit(SENTIMENT_SAMPLE_LIMIT).yield_per(SENTIMENT_BATCH_SIZE):
+            chunk.append(content)
+            if len(chunk) >= SENTIMENT_BATCH_SIZE:
+                counts.update(self.nlp.batch_sentiment_analysis(chunk))
+                chunk = []
+        if chunk:
+            counts.update(self.nlp.batch_sentiment_analysis(chunk))
 
-        return self.nlp.batch_sentiment_analysis(texts)
+        return {label: counts[label] for label in ('positive', 'neutral', 'negative')}
 
     def get_category_distribution(self) -> List[Dict]:
         """
-        获取分区分布
+        获取分区分布（结果按天缓存 ANALYSIS_CACHE_TTL 秒）
+        """
+        cache_key = f"{ANALYSIS_CACHE_PREFIX}categories:{date.today()}"
+        cached = get_cached_json(cache_key)
+        if cached is not None:
+            return cached
+
+        result = self._query_category_distribution()
+        set_cached_json(cache_key, result, expire=ANALYSIS_CACHE_TTL)
+        return result
+
+    def _query_category_distribution(self) -> List[Dict]:
+        """
+        查询分区分布
+
+        优先读取数仓 dws_category_daily 最近一天的预聚合结果（ETL 按日统计前一天，
+        最新日期不早于昨天即视为新鲜）；数仓数据缺失或过期时回退到实时聚合 videos 表。
         """
+        latest_date = self.db.query(func.max(DwsCategoryDaily.stat_date)).scalar()
+        if latest_date is not None and latest_date >= date.today() - timedelta(days=1):
+            result = self.db.query(
+                DwsCategoryDaily.category,
+                DwsCategoryDaily.video_count,
+                DwsCategoryDaily.total_play_count
+            ).filter(DwsCategoryDaily.stat_date == latest_date).all()
+            return self._merge_category_rows(
+                (r.category, r.video_count, r.total_play_count) for r in result
+            )
+
         result = self.db.query(
             Video.category,
             func.count(Video.id).label('count'),
             func.sum(Video.play_count).label('total_play')
         ).group_by(Video.category).all()
+        return self._merge_category_rows((r.category, r.count, r.total_play) for r in result)
 
-        return [
-            {
-                'category': r.category or '未知',
-                'count': r.count,
-                'total_play': r.total_play or 0
-            }
-            for r in result
-        ]
+    @staticmethod
+    def _merge_category_rows(rows) -> List[Dict]:
+        """
+        (分区, 视频数, 总播放量) 行转为分布列表
+
+        空分区（NULL、空串及数仓中的“未分类”）统一记为“未知”并合并为一项，
+        数仓与实时聚合两条路径的结果一致。
+        """
+        merged: Dict[str, Dict] = {}
+        for category, count, total_play in rows:
+            label = UNKNOWN_CATEGORY if category in (None, '', DWS_UNCATEGORIZED) else category
+            item = merged.setdefault(label, {'category': label, 'count': 0, 'total_play': 0})
+            item['count'] += count or 0
+            item['total_play'] += int(total_play or 0)
+        return list(merged.values())
 
     def get_daily_trends(self, days: int = 7, metric: str = 'video_count') -> List[Dict]:
         """
-        获取每日趋势
+        获取每日趋势（结果按天缓存 ANALYSIS_CACHE_TTL 秒）
         """
+        cache_key = f"{ANALYSIS_CACHE_PREFIX}trends:{metric}:{days}:{date.today()}"
+        cached = get_cached_json(cache_key)
+        if cached is not None:
+            return cached
+
+        result = self._query_daily_trends(days, metric)
+        set_cached_json(cache_key, result, expire=ANALYSIS_CACHE_TTL)
+        return result
+
+    def _query_daily_trends(self, days: int, metric: str) -> List[Dict]:
+        """查询每日趋势"""
         start_date = datetime.now() - timedelta(days=days)
+        aggregate, column = TREND_METRICS.get(metric, TREND_METRICS['play_count'])
 
-        if metric == 'video_count':
-            result = self.db.query(
-                func.date(Video.publish_time).label('date'),
-                func.count(Video.id).label('value')
-            ).filter(
-                Video.publish_time >= start_date
-            ).group_by(func.date(Video.publish_time)).all()
-        else:
-            column = getattr(Video, metric, Video.play_count)
-            result = self.db.query(
-                func.date(Video.publish_time).label('date'),
-                func.sum(column).label('value')
-            ).filter(
-                Video.publish_time >= start_date
-            ).group_by(func.date(Video.publish_time)).all()
+        result = self.db.query(
+            Video.publish_date.label('date'),
+            aggregate(column).label('value')
+        ).filter(
+            Video.publish_time >= start_date
+        ).group_by(Video.publish_date).all()
 
-        return [{'date': str(r.date), 'value': r.value or 0} for r in result]
+        return [{'date': str(r.date), 'value': int(r.value or 0)} for r in result]
 
     def update_keywords(self, category: Optional[str] = None):
         """
         更新热词统计表
-        """
-        query = self.db.query(Video)
-        if category:
-            query = query.filter(Video.category == category)
-
-        videos = query.all()
-        titles = [v.title for v in videos]
 
-        keywords_data = self.nlp.extract_keywords_tfidf(titles, top_k=200)
+        优先取数仓 dws_keyword_stats 最新一天的热词频次（数据库内聚合，不再对全部标题重跑 TF-IDF）；
+        数仓尚无数据时回退到标题 TF-IDF。
 
-        # 清除旧数据
-        if category:
-            self.db.query(Keyword).filter(Keyword.category == category).delete()
+        按 (word, category) UPSERT 后删除本次未出现的旧词，全站热词的 category 记为空串。
+        """
+        latest_date = self.db.query(func.max(DwsKeywordStats.stat_date)).scalar()
+        if latest_date is None:
+            keywords_data = self._extract_title_keywords(category)
+        elif category:
+            keywords_data = self._category_keywords(latest_date, category)
         else:
-            self.db.query(Keyword).delete()
-
-        # 插入新数据
-        for word, freq in keywords_data:
-            keyword = Keyword(
-                word=word,
-                frequency=freq,
-                category=category,
-                stat_date=datetime.now()
+            keywords_data = self._site_keywords(latest_date)
+
+        # DATETIME 列只存到秒，去掉微秒以便按本次写入时间识别旧词
+        stat_date = datetime.now().replace(microsecond=0)
+        category_key = category or ''
+        rows = [
+            {"word": word, "frequency": freq, "category": category_key, "stat_date": stat_date}
+            for word, freq in keywords_data
+        ]
+        if rows:
+            stmt = mysql_insert(Keyword.__table__).values(rows)
+            stmt = stmt.on_duplicate_key_update(
+                frequency=stmt.inserted.frequency,
+                stat_date=stmt.inserted.stat_date
             )
-            self.db.add(keyword)
+            self.db.execute(stmt)
+
+        # 清除本次未写入的旧词（与写入在同一事务内提交）
+        self.db.query(Keyword).filter(
+            Keyword.category == category_key,
+            or_(Keyword.stat_date < stat_date, Keyword.stat_date.is_(None))
+        ).delete(synchronize_session=False)
 
         self.db.commit()
+
+    def _site_keywords(self, stat_date) -> List[Tuple[str, int]]:
+        """从 DWS 当日热词中取全站频次最高的词"""
+        return self.db.query(
+            DwsKeywordStats.word,
+            DwsKeywordStats.total_frequency
+        ).filter(
+            DwsKeywordStats.stat_date == stat_date,
+            DwsKeywordStats.total_frequency > 0
+        ).order_by(
+            DwsKeywordStats.total_frequency.desc()
+        ).limit(KEYWORD_LIMIT).all()
+
+    def _extract_title_keywords(self, category: Optional[str]) -> List[Tuple[str, int]]:
+        """对视频标题跑 TF-IDF 提取热词（数仓无数据时的回退方案）"""
+        query = self.db.query(Video.title)
+        if category:
+            query = query.filter(Video.category == category)
+
+        titles = [title for (title,) in query.yield_per(STREAM_BATCH_SIZE)]
+        return self.nlp.extract_keywords_tfidf(titles, top_k=KEYWORD_LIMIT)
+
+    def _category_keywords(self, stat_date, category: str) -> List[Tuple[str, int]]:
+        """从 DWS 当日热词的分区分布中取指定分区的频次"""
+        rows = self.db.query(
+            DwsKeywordStats.word,
+            DwsKeywordStats.category_distribution
+        ).filter(
+            DwsKeywordStats.stat_date == stat_date,
+            DwsKeywordStats.category_distribution.isnot(None)
+        ).all()
+
+        keywords_data = []
+        for word, distribution in rows:
+            try:
+                frequency = orjson.loads(distribution).get(category, 0)
+            except (orjson.JSONDecodeError, AttributeError):
+                continue
+            if frequency > 0:
+                keywords_data.append((word, frequency))
+
+        keywords_data.sort(key=lambda item: item[1], reverse=True)
+        return keywords_data[:KEYWORD_LIMIT]
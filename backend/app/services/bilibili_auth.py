@@ -8,9 +8,14 @@ B站账号认证服务
 """
 import os
 import re
+import stat
+import time
+import threading
 import requests
-from typing import Dict, Any, Optional
+from requests.adapters import HTTPAdapter
+from typing import Dict, Any, Optional, Tuple
 from pathlib import Path
+from urllib3.util.retry import Retry
 
 from app.core.config import settings, get_settings
 
@@ -20,10 +25,35 @@ _runtime_cookie: Optional[str] = None
 
 # B站用户信息API
 BILIBILI_NAV_API = "https://api.bilibili.com/x/web-interface/nav"
+# 用户信息API的未登录返回码（Cookie失效）；-412、-352 等为风控拦截，属临时状态
+NAV_CODE_NOT_LOGGED_IN = -101
+
+# 复用连接的会话（保持 keep-alive，免去每次验证的 TCP/TLS 握手）；
+# 连接失败重试两次，读超时直接返回超时提示
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=8,
+    max_retries=Retry(total=2, read=False, backoff_factor=0.2)
+))
 
 # .env文件路径
 ENV_FILE_PATH = Path(__file__).parent.parent.parent / ".env"
 
+# .env中的Cookie配置行
+_COOKIE_RE = re.compile(r'^BILIBILI_COOKIE=.*$', re.MULTILINE)
+
+# 最近一次写入的.env内容及其修改时间（文件未被外部改动时免去重复读取）
+_env_cache: Optional[str] = None
+_env_cache_mtime: Optional[int] = None
+_env_file_lock = threading.Lock()
+
+# Cookie验证结果缓存：Cookie -> (验证时间, 结果)，避免状态轮询每次都请求B站
+VALIDATION_CACHE_TTL = 60  # 秒
+VALIDATION_CACHE_SIZE = 8
+_validation_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+_validation_cache_lock = threading.Lock()
+
 
 def get_current_cookie() -> str:
     """
@@ -71,6 +101,31 @@ def validate_cookie(cookie_str: str) -> Dict[str, Any]:
             "message": "Cookie中缺少SESSDATA字段"
         }
 
+    now = time.monotonic()
+    with _validation_cache_lock:
+        cached = _validation_cache.get(cookie_str)
+    if cached is not None and now - cached[0] < VALIDATION_CACHE_TTL:
+        return dict(cached[1])
+
+    result, cacheable = _request_cookie_validation(cookie_str)
+
+    # 只缓存确定的结果（有效或未登录），风控拦截、超时和网络错误下次重新请求
+    if cacheable:
+        with _validation_cache_lock:
+            if len(_validation_cache) >= VALIDATION_CACHE_SIZE:
+                del _validation_cache[next(iter(_validation_cache))]
+            _validation_cache[cookie_str] = (now, dict(result))
+
+    return result
+
+
+def _request_cookie_validation(cookie_str: str) -> Tuple[Dict[str, Any], bool]:
+    """
+    请求B站导航栏API验证Cookie
+
+    Returns:
+        (验证结果字典, 结果是否可缓存)
+    """
     headers = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
         "Referer": "https://www.bilibili.com",
@@ -78,7 +133,7 @@ def validate_cookie(cookie_str: str) -> Dict[str, Any]:
     }
 
     try:
-        resp = requests.get(BILIBILI_NAV_API, headers=headers, timeout=10)
+        resp = _session.get(BILIBILI_NAV_API, headers=headers, timeout=(3, 7))
         data = resp.json()
 
         if data.get("code") == 0:
@@ -95,37 +150,37 @@ def validate_cookie(cookie_str: str) -> Dict[str, Any]:
                     "vip_type": user_info.get("vipType", 0),
                     "level": user_info.get("level_info", {}).get("current_level", 0),
                     "message": "Cookie有效"
-                }
+                }, True
             else:
                 return {
                     "valid": False,
                     "logged_in": False,
                     "message": "Cookie已过期或无效"
-                }
+                }, True
         else:
             return {
                 "valid": False,
                 "logged_in": False,
                 "message": data.get("message", "验证失败")
-            }
+            }, data.get("code") == NAV_CODE_NOT_LOGGED_IN
     except requests.exceptions.Timeout:
         return {
             "valid": False,
             "logged_in": False,
             "message": "验证请求超时，请稍后重试"
-        }
+        }, False
     except requests.exceptions.RequestException as e:
         return {
             "valid": False,
             "logged_in": False,
             "message": f"网络请求失败: {str(e)}"
-        }
+        }, False
     except Exception as e:
         return {
             "valid": False,
             "logged_in": False,
             "message": f"验证异常: {str(e)}"
-        }
+        }, False
 
 
 def update_cookie_in_env(cookie_str: str) -> bool:
@@ -138,37 +193,55 @@ def update_cookie_in_env(cookie_str: str) -> bool:
     Returns:
         是否更新成功
     """
-    global _runtime_cookie
+    global _runtime_cookie, _env_cache, _env_cache_mtime
 
     try:
         # 更新运行时Cookie
         _runtime_cookie = cookie_str.strip()
-
-        # 读取现有.env内容
-        env_content = ""
-        if ENV_FILE_PATH.exists():
-            with open(ENV_FILE_PATH, "r", encoding="utf-8") as f:
-                env_content = f.read()
+        clear_validation_cache()
 
         # 转义Cookie中的特殊字符（用于正则替换）
         escaped_cookie = cookie_str.strip().replace("\\", "\\\\")
-
-        # 检查是否已存在BILIBILI_COOKIE配置
-        pattern = r'^BILIBILI_COOKIE=.*$'
         new_line = f'BILIBILI_COOKIE={escaped_cookie}'
 
-        if re.search(pattern, env_content, re.MULTILINE):
-            # 替换现有配置
-            env_content = re.sub(pattern, new_line, env_content, flags=re.MULTILINE)
-        else:
-            # 添加新配置
-            if env_content and not env_content.endswith("\n"):
-                env_content += "\n"
-            env_content += new_line + "\n"
-
-        # 写入.env文件
-        with open(ENV_FILE_PATH, "w", encoding="utf-8") as f:
-            f.write(env_content)
+        with _env_file_lock:
+            # 读取现有.env内容（文件自上次写入后未变化则直接使用缓存）
+            env_content = ""
+            if ENV_FILE_PATH.exists():
+                mtime = ENV_FILE_PATH.stat().st_mtime_ns
+                if _env_cache is not None and mtime == _env_cache_mtime:
+                    env_content = _env_cache
+                else:
+                    with open(ENV_FILE_PATH, "r", encoding="utf-8") as f:
+                        env_content = f.read()
+
+            # 检查是否已存在BILIBILI_COOKIE配置
+            if _COOKIE_RE.search(env_content):
+                # 替换现有配置
+                env_content = _COOKIE_RE.sub(new_line, env_content)
+            else:
+                # 添加新配置
+                if env_content and not env_content.endswith("\n"):
+                    env_content += "\n"
+                env_content += new_line + "\n"
+
+            # 先写临时文件再原子替换，写入中途崩溃不会截断.env
+            tmp_path = ENV_FILE_PATH.with_name(ENV_FILE_PATH.name + ".tmp")
+            # 临时文件创建时即带上原.env的权限（新建时仅属主可读写），Cookie 写入前不会以默认权限暴露；
+            # fchmod 补回被 umask 去掉的位，结果不会比原文件更宽松
+            mode = stat.S_IMODE(ENV_FILE_PATH.stat().st_mode) if ENV_FILE_PATH.exists() else 0o600
+            # 清理上次崩溃残留的临时文件（O_EXCL 要求文件不存在）
+            tmp_path.unlink(missing_ok=True)
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, mode)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                os.fchmod(fd, mode)
+                f.write(env_content)
+                f.flush()
+                os.fsync(fd)
+            os.replace(tmp_path, ENV_FILE_PATH)
+
+            _env_cache = env_content
+            _env_cache_mtime = ENV_FILE_PATH.stat().st_mtime_ns
 
         return True
     except Exception as e:
@@ -206,3 +279,10 @@ def clear_runtime_cookie():
     """清除运行时Cookie，恢复使用.env配置"""
     global _runtime_cookie
     _runtime_cookie = None
+    clear_validation_cache()
+
+
+def clear_validation_cache():
+    """清空Cookie验证结果缓存（Cookie变更后调用）"""
+    with _validation_cache_lock:
+        _validation_cache.clear()
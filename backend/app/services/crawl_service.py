@@ -2,10 +2,12 @@
 采集服务层
 封装完整的采集业务逻辑，集成情感分析和日志记录
 """
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import date, datetime
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
+from sqlalchemy.dialects.mysql import insert as mysql_insert
 from sqlalchemy.orm import Session
-from sqlalchemy.exc import IntegrityError
 import logging
 
 from app.services.crawler import BilibiliCrawler
@@ -14,6 +16,12 @@ from app.core.database import SessionLocal
 
 logger = logging.getLogger(__name__)
 
+# 批量采集时提前请求详情和弹幕的视频数
+VIDEO_PREFETCH_DEPTH = 4
+
+# 弹幕内容列长度：超长内容写入前显式截断（INSERT IGNORE 会把超长报错降级为警告并静默截断）
+DANMAKU_CONTENT_MAX_LENGTH = Danmaku.__table__.c.content.type.length
+
 
 class CrawlService:
     """采集服务"""
@@ -31,6 +39,11 @@ class CrawlService:
             print("\n[采集后ETL] 自动执行当天ETL任务...")
             results = etl_scheduler.run_daily_etl(stat_date=date.today())
             success_count = sum(1 for r in results if r.get('status') == 'success')
+            # 数据已刷新，失效视频筛选统计及分区/趋势分析缓存
+            from app.services.redis_service import delete_cached_pattern
+            from app.services.analyzer import ANALYSIS_CACHE_PREFIX
+            delete_cached_pattern("videos:stats:*")
+            delete_cached_pattern(ANALYSIS_CACHE_PREFIX + "*")
             logger.info(f"[采集后ETL] 完成，{success_count}/{len(results)} 个任务成功")
             print(f"[采集后ETL] 完成，{success_count}/{len(results)} 个任务成功")
         except Exception as e:
@@ -206,6 +219,9 @@ class CrawlService:
         """
         采集评论并进行情感分析
 
+        下一页在后台线程中提前请求，与本页的情绪分析和写入重叠；
+        评论接口的频率限制不变，数据库只在当前线程访问
+
         Args:
             video_id: 视频数据库ID
             oid: B站视频aid
@@ -216,117 +232,148 @@ class CrawlService:
             保存的评论数量
         """
         saved_count = 0
-        page_size = 20
-        total_pages = (max_comments + page_size - 1) // page_size
-        next_cursor = 0
-        use_main_api = True
-        legacy_page = 1
+        pages = self._iter_comment_pages(oid, max_comments)
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="crawl-comments")
 
         try:
-            while saved_count < max_comments:
-                comments_raw = None
-
-                if use_main_api:
-                    main_data = self.crawler.get_video_comments_main(
-                        oid,
-                        next_cursor=next_cursor,
-                        page_size=page_size,
-                        mode=3,
-                    )
-                    if main_data and main_data.get("replies"):
-                        comments_raw = main_data.get("replies")
-                        cursor = main_data.get("cursor") or {}
-                        next_value = cursor.get("next")
-                        is_end = bool(cursor.get("is_end"))
-                        if is_end:
-                            next_cursor = None
-                        elif isinstance(next_value, int):
-                            # 防止 next 不推进导致死循环
-                            if next_value == next_cursor:
-                                use_main_api = False
-                            next_cursor = next_value
-                        else:
-                            use_main_api = False
-                    else:
-                        # 新接口异常时降级到旧接口，保证采集不中断
-                        use_main_api = False
-
-                if not use_main_api:
-                    if legacy_page > total_pages:
-                        break
-                    comments_raw = self.crawler.get_video_comments(oid, page=legacy_page, page_size=page_size)
-                    legacy_page += 1
-
+            next_page = executor.submit(next, pages, None)
+            while next_page is not None:
+                comments_raw = next_page.result()
+                next_page = None
                 if not comments_raw:
                     break
 
+                # 整页评论一次查询已存在的 rpid（去重）
+                page_rpids = [c.get('rpid') for c in comments_raw if c.get('rpid')]
+                existing_rpids = {
+                    r for (r,) in db.query(Comment.rpid).filter(Comment.rpid.in_(page_rpids))
+                } if page_rpids else set()
+
+                new_comments = []
                 for comment_raw in comments_raw:
-                    if saved_count >= max_comments:
+                    if saved_count + len(new_comments) >= max_comments:
                         break
                     rpid = comment_raw.get('rpid')  # B站评论ID
                     content = comment_raw.get('content', {}).get('message', '')
-                    user_name = comment_raw.get('member', {}).get('uname', '')
-                    like_count = comment_raw.get('like', 0)
-
-                    if not content or not rpid:
+                    if not content or not rpid or rpid in existing_rpids:
                         continue
+                    new_comments.append((rpid, content, comment_raw))
+                    existing_rpids.add(rpid)
 
-                    # 检查评论是否已存在（去重）
-                    existing = db.query(Comment).filter(Comment.rpid == rpid).first()
-                    if existing:
-                        continue
+                # 本页写满后仍不够数时，提前请求下一页
+                if saved_count + len(new_comments) < max_comments:
+                    next_page = executor.submit(next, pages, None)
 
-                    # 细粒度情绪分析 + 三分类兼容分数
-                    emotion_result = self.crawler.emotion.analyze_emotion(content)
-                    profile = self.crawler.parse_comment_user_profile(comment_raw)
+                # 整页评论一次批量情绪分析 + 三分类兼容分数
+                emotion_results = self.crawler.emotion.analyze_batch(
+                    [content for _, content, _ in new_comments]
+                )
 
-                    # 创建评论记录，使用 SAVEPOINT 防止重复键冲突丢失整批数据
-                    comment = Comment(
-                        rpid=rpid,
-                        video_id=video_id,
-                        content=content,
-                        user_name=user_name,
-                        commenter_mid=profile["commenter_mid"],
-                        commenter_level=profile["commenter_level"],
-                        commenter_sex=profile["commenter_sex"],
-                        commenter_vip_type=profile["commenter_vip_type"],
-                        commenter_is_official=profile["commenter_is_official"],
-                        sentiment_score=emotion_result.sentiment_score,
-                        emotion_label=emotion_result.emotion_label,
-                        emotion_scores_json=emotion_result.emotion_scores,
-                        emotion_model_version=emotion_result.model_version,
-                        emotion_analyzed_at=emotion_result.analyzed_at,
-                        like_count=like_count,
-                        reply_count=profile["reply_count"],
-                        up_replied=profile["up_replied"],
-                        comment_ctime=profile["comment_ctime"],
-                    )
-                    try:
-                        nested = db.begin_nested()
-                        db.add(comment)
-                        db.flush()
-                        saved_count += 1
-                    except IntegrityError:
-                        nested.rollback()
-
-                    # 每20条提交一次
-                    if saved_count % 20 == 0:
-                        db.commit()
-
-                if saved_count >= max_comments:
-                    break
-                if use_main_api and next_cursor is None:
-                    break
+                comment_rows = []
+                for (rpid, content, comment_raw), emotion_result in zip(new_comments, emotion_results):
+                    profile = self.crawler.parse_comment_user_profile(comment_raw)
 
-            # 最后提交剩余的
+                    comment_rows.append({
+                        "rpid": rpid,
+                        "video_id": video_id,
+                        "content": content,
+                        "user_name": comment_raw.get('member', {}).get('uname', ''),
+                        "commenter_mid": profile["commenter_mid"],
+                        "commenter_level": profile["commenter_level"],
+                        "commenter_sex": profile["commenter_sex"],
+                        "commenter_vip_type": profile["commenter_vip_type"],
+                        "commenter_is_official": profile["commenter_is_official"],
+                        "sentiment_score": emotion_result.sentiment_score,
+                        "emotion_label": emotion_result.emotion_label,
+                        "emotion_scores_json": emotion_result.emotion_scores,
+                        "emotion_model_version": emotion_result.model_version,
+                        "emotion_analyzed_at": emotion_result.analyzed_at,
+                        "like_count": comment_raw.get('like', 0),
+                        "reply_count": profile["reply_count"],
+                        "up_replied": profile["up_replied"],
+                        "comment_ctime": profile["comment_ctime"],
+                    })
+
+                # 整页一条多行 INSERT（SAVEPOINT 内执行，失败只回滚本页）；INSERT IGNORE 跳过并发写入的重复 rpid
+                if comment_rows:
+                    stmt = mysql_insert(Comment.__table__).values(comment_rows).prefix_with("IGNORE")
+                    with db.begin_nested():
+                        saved_count += db.execute(stmt).rowcount
+
+                # 有评论被并发写入跳过、未提前请求时补请求下一页
+                if next_page is None and saved_count < max_comments:
+                    next_page = executor.submit(next, pages, None)
+
+            # 整个视频的评论一次提交
             db.commit()
             return saved_count
 
         except Exception as e:
-            db.rollback()
             print(f"    [WARN] 评论采集部分失败: {e}")
+            # 保留出错前已写入的页
+            try:
+                db.commit()
+            except Exception:
+                db.rollback()
+                saved_count = 0
             return saved_count
 
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _iter_comment_pages(self, oid: int, max_comments: int, page_size: int = 20) -> Iterator[List[Dict]]:
+        """
+        逐页请求评论（主接口按游标翻页，异常时降级到旧接口按页码翻页）
+
+        只访问B站接口、不访问数据库，可在后台线程中推进
+        """
+        total_pages = (max_comments + page_size - 1) // page_size
+        next_cursor = 0
+        use_main_api = True
+        legacy_page = 1
+
+        while True:
+            comments_raw = None
+
+            if use_main_api:
+                main_data = self.crawler.get_video_comments_main(
+                    oid,
+                    next_cursor=next_cursor,
+                    page_size=page_size,
+                    mode=3,
+                )
+                if main_data and main_data.get("replies"):
+                    comments_raw = main_data.get("replies")
+                    cursor = main_data.get("cursor") or {}
+                    next_value = cursor.get("next")
+                    is_end = bool(cursor.get("is_end"))
+                    if is_end:
+                        next_cursor = None
+                    elif isinstance(next_value, int):
+                        # 防止 next 不推进导致死循环
+                        if next_value == next_cursor:
+                            use_main_api = False
+                        next_cursor = next_value
+                    else:
+                        use_main_api = False
+                else:
+                    # 新接口异常时降级到旧接口，保证采集不中断
+                    use_main_api = False
+
+            if not use_main_api:
+                if legacy_page > total_pages:
+                    return
+                comments_raw = self.crawler.get_video_comments(oid, page=legacy_page, page_size=page_size)
+                legacy_page += 1
+
+            if not comments_raw:
+                return
+
+            yield comments_raw
+
+            if use_main_api and next_cursor is None:
+                return
+
     def _crawl_danmakus(
         self,
         video_id: int,
@@ -354,39 +401,24 @@ class CrawlService:
             if not danmakus_raw:
                 return 0
 
-            # 获取该视频已有的弹幕内容（用于去重）
-            existing_contents = set(
-                d[0] for d in db.query(Danmaku.content)
-                .filter(Danmaku.video_id == video_id)
-                .all()
-            )
-
+            danmaku_rows = []
             for danmaku_raw in danmakus_raw:
-                content = danmaku_raw.get('content', '').strip()
+                content = danmaku_raw.get('content', '').strip()[:DANMAKU_CONTENT_MAX_LENGTH]
                 if not content:
                     continue
 
-                # 简单去重：相同内容跳过
-                if content in existing_contents:
-                    continue
-
-                # 创建弹幕记录
-                danmaku = Danmaku(
-                    video_id=video_id,
-                    content=content,
-                    send_time=danmaku_raw.get('send_time'),
-                    color=danmaku_raw.get('color')
-                )
-                db.add(danmaku)
-                existing_contents.add(content)
-                saved_count += 1
-
-                # 每50条提交一次
-                if saved_count % 50 == 0:
-                    db.commit()
-
-            # 最后提交剩余的
-            db.commit()
+                danmaku_rows.append({
+                    "video_id": video_id,
+                    "content": content,
+                    "send_time": danmaku_raw.get('send_time'),
+                    "color": danmaku_raw.get('color')
+                })
+
+            # 一条多行 INSERT IGNORE 写入并提交；内容完全相同的弹幕由 (video_id, content) 唯一键去重
+            if danmaku_rows:
+                stmt = mysql_insert(Danmaku.__table__).values(danmaku_rows).prefix_with("IGNORE")
+                saved_count = db.execute(stmt).rowcount
+                db.commit()
             return saved_count
 
         except Exception as e:
@@ -439,11 +471,14 @@ class CrawlService:
             db.add(log)
             db.commit()
 
+        # 后台线程提前拉取后续视频的详情，与当前视频的评论、弹幕采集重叠（数据库写入仍在当前线程）
+        executor = ThreadPoolExecutor(max_workers=VIDEO_PREFETCH_DEPTH, thread_name_prefix="crawl-prefetch")
+
         try:
             print(f"\n[批量采集] 开始采集 {len(bvids)} 个指定视频")
 
             stopped = False
-            for i, bvid in enumerate(bvids, 1):
+            for i, (bvid, fetch_future) in enumerate(self._prefetch_videos(bvids, executor), 1):
                 if stop_event and stop_event.is_set():
                     stopped = True
                     print("[批量采集] 收到停止信号，已停止")
@@ -460,8 +495,8 @@ class CrawlService:
                 try:
                     print(f"\n[{i}/{len(bvids)}] 处理视频: {bvid}")
 
-                    # 获取视频详情
-                    detail = self.crawler.get_video_detail(bvid)
+                    # 获取视频详情（已由后台线程提前请求）
+                    detail = fetch_future.result()
                     if not detail:
                         video_result['status'] = 'failed'
                         video_result['error'] = '获取详情失败(可能视频不存在或已删除)'
@@ -556,4 +591,24 @@ class CrawlService:
             return stats
 
         finally:
+            executor.shutdown(wait=False, cancel_futures=True)
             db.close()
+
+    def _prefetch_videos(
+        self,
+        bvids: List[str],
+        executor: ThreadPoolExecutor
+    ) -> Iterator[Tuple[str, Future]]:
+        """
+        按顺序产出 (bvid, Future[视频详情])，始终保持最多 VIDEO_PREFETCH_DEPTH 个视频在途
+
+        只提前请求详情：详情接口自身的频率限制不变，同一时刻最多只比串行采集多一路详情请求；
+        弹幕仅对新保存的视频在当前线程请求，已存在的视频不产生多余请求
+        """
+        pending = deque()
+        for bvid in bvids:
+            pending.append((bvid, executor.submit(self.crawler.get_video_detail, bvid)))
+            if len(pending) >= VIDEO_PREFETCH_DEPTH:
+                yield pending.popleft()
+        while pending:
+            yield pending.popleft()
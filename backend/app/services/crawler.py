@@ -3,6 +3,7 @@ B站数据采集服务
 """
 import time
 import random
+import threading
 import requests
 from typing import Any, List, Dict, Optional
 from functools import wraps
@@ -30,30 +31,57 @@ class BilibiliCrawler:
     BASE_URL = "https://api.bilibili.com"
 
     def __init__(self, cookie: str = ""):
-        self.session = requests.Session()
         self.emotion = EmotionAnalyzer()
-        self.session.headers = {
+        self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Referer': 'https://www.bilibili.com',
         }
         if cookie:
-            self.session.headers['Cookie'] = cookie
+            self.headers['Cookie'] = cookie
+        self._local = threading.local()
+
+    @property
+    def session(self) -> requests.Session:
+        """
+        当前线程的 requests 会话
+
+        requests.Session 不保证线程安全（共享 Cookie 和连接池），采集预取线程各自使用独立会话
+        """
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.headers = dict(self.headers)
+            self._local.session = session
+        return session
 
     @staticmethod
     def rate_limit(interval: float = 2.0):
-        """频率限制装饰器"""
+        """
+        频率限制装饰器
+
+        线程安全：并发调用在锁内依次预约调用时间，同一接口的请求间隔仍不小于 interval，
+        不同接口（详情/评论/弹幕）可在多个线程中同时进行
+        """
         def decorator(func):
-            last_call = [0]
+            # 下一次允许调用的时间（上次调用结束 + interval，或已被预约的时间）
+            next_call = [0.0]
+            lock = threading.Lock()
 
             @wraps(func)
             def wrapper(*args, **kwargs):
-                elapsed = time.time() - last_call[0]
-                if elapsed < interval:
-                    sleep_time = interval - elapsed + random.uniform(0.1, 0.5)
+                with lock:
+                    now = time.time()
+                    sleep_time = next_call[0] - now
+                    if sleep_time > 0:
+                        sleep_time += random.uniform(0.1, 0.5)
+                    next_call[0] = now + max(sleep_time, 0) + interval
+                if sleep_time > 0:
                     time.sleep(sleep_time)
-                result = func(*args, **kwargs)
-                last_call[0] = time.time()
-                return result
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    with lock:
+                        next_call[0] = max(next_call[0], time.time() + interval)
             return wrapper
         return decorator
 
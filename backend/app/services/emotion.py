@@ -141,14 +141,21 @@ class EmotionAnalyzer:
         model_name: Optional[str] = None,
         device: Optional[str] = None,
         max_length: Optional[int] = None,
+        onnx_path: Optional[str] = None,
     ):
         self.model_name = model_name or settings.EMOTION_MODEL_NAME
         self.device = self._resolve_device(device or settings.EMOTION_DEVICE)
         self.max_length = max_length or settings.EMOTION_MAX_LENGTH
+        self.onnx_path = onnx_path or settings.EMOTION_ONNX_PATH
         self._classifier = None
         self._load_error: Optional[str] = None
         self._load_lock = threading.Lock()
 
+    @classmethod
+    def from_onnx(cls, path: str, **kwargs) -> "EmotionAnalyzer":
+        """使用 scripts/export_emotion_onnx.py 导出的 ONNX 模型目录构建分析器"""
+        return cls(onnx_path=path, **kwargs)
+
     @staticmethod
     def _resolve_device(device: str) -> int:
         if isinstance(device, int):
@@ -176,25 +183,64 @@ class EmotionAnalyzer:
             if self._classifier is not None or self._load_error:
                 return
 
+            if self.onnx_path:
+                self._classifier = self._load_onnx_classifier()
+                if self._classifier is not None:
+                    return
+
             try:
+                import torch
                 from transformers import pipeline
 
+                model_kwargs = {}
+                if self.device >= 0 and settings.EMOTION_FP16:
+                    # GPU 上半精度推理，显存带宽减半
+                    model_kwargs["torch_dtype"] = torch.float16
+                elif self.device < 0 and settings.EMOTION_NUM_THREADS > 0:
+                    torch.set_num_threads(settings.EMOTION_NUM_THREADS)
+
                 self._classifier = pipeline(
                     task="text-classification",
                     model=self.model_name,
                     tokenizer=self.model_name,
                     device=self.device,
                     top_k=None,
+                    **model_kwargs,
                 )
                 logger.info(
-                    "EmotionAnalyzer 模型加载完成: model=%s device=%s",
+                    "EmotionAnalyzer 模型加载完成: model=%s device=%s dtype=%s",
                     self.model_name,
                     self.device,
+                    self._classifier.model.dtype,
                 )
             except Exception as exc:
                 self._load_error = str(exc)
                 logger.warning("EmotionAnalyzer 模型加载失败，使用中性兜底: %s", exc)
 
+    def _load_onnx_classifier(self):
+        """加载 ONNX Runtime 模型（需要 optimum[onnxruntime]），失败时返回 None 回退 PyTorch"""
+        try:
+            from optimum.onnxruntime import ORTModelForSequenceClassification
+            from transformers import AutoTokenizer, pipeline
+
+            provider = "CUDAExecutionProvider" if self.device >= 0 else "CPUExecutionProvider"
+            classifier = pipeline(
+                task="text-classification",
+                model=ORTModelForSequenceClassification.from_pretrained(self.onnx_path, provider=provider),
+                tokenizer=AutoTokenizer.from_pretrained(self.onnx_path),
+                device=self.device,
+                top_k=None,
+            )
+            logger.info(
+                "EmotionAnalyzer ONNX 模型加载完成: path=%s provider=%s",
+                self.onnx_path,
+                provider,
+            )
+            return classifier
+        except Exception as exc:
+            logger.warning("EmotionAnalyzer ONNX 模型加载失败，回退 PyTorch 模型: %s", exc)
+            return None
+
     @staticmethod
     def normalize_emotion_label(label: str) -> Optional[str]:
         if not label:
@@ -263,6 +309,48 @@ class EmotionAnalyzer:
             analyzed_at=datetime.utcnow(),
         )
 
+    def _infer(self, inputs, **kwargs):
+        """推理时关闭 autograd 记录"""
+        import torch
+
+        with torch.inference_mode():
+            return self._classifier(
+                inputs,
+                truncation=True,
+                max_length=self.max_length,
+                **kwargs,
+            )
+
+    def _result_from_outputs(self, outputs) -> EmotionResult:
+        if outputs and isinstance(outputs[0], list):
+            outputs = outputs[0]
+
+        scores = {label: 0.0 for label in EMOTION_LABELS}
+        for item in outputs:
+            label = self.normalize_emotion_label(str(item.get("label", "")))
+            if not label:
+                continue
+            score = float(item.get("score", 0.0))
+            if score > scores[label]:
+                scores[label] = score
+
+        total = sum(scores.values())
+        if total <= 0:
+            return self._neutral_result()
+
+        normalized = {k: round(v / total, 6) for k, v in scores.items()}
+        emotion_label = max(normalized.items(), key=lambda item: item[1])[0]
+        sentiment_score = self.build_sentiment_score(normalized)
+
+        return EmotionResult(
+            emotion_label=emotion_label,
+            emotion_scores=normalized,
+            sentiment_score=sentiment_score,
+            sentiment_label=self.sentiment_label_from_score(sentiment_score),
+            model_version=self.model_name,
+            analyzed_at=datetime.utcnow(),
+        )
+
     def analyze_emotion(self, text: str) -> EmotionResult:
         if not text or not text.strip():
             return self._neutral_result()
@@ -272,42 +360,40 @@ class EmotionAnalyzer:
             return self._neutral_result()
 
         try:
-            outputs = self._classifier(
-                text,
-                truncation=True,
-                max_length=self.max_length,
-            )
-            if outputs and isinstance(outputs[0], list):
-                outputs = outputs[0]
-
-            scores = {label: 0.0 for label in EMOTION_LABELS}
-            for item in outputs:
-                label = self.normalize_emotion_label(str(item.get("label", "")))
-                if not label:
-                    continue
-                score = float(item.get("score", 0.0))
-                if score > scores[label]:
-                    scores[label] = score
-
-            total = sum(scores.values())
-            if total <= 0:
-                return self._neutral_result()
-
-            normalized = {k: round(v / total, 6) for k, v in scores.items()}
-            emotion_label = max(normalized.items(), key=lambda item: item[1])[0]
-            sentiment_score = self.build_sentiment_score(normalized)
-
-            return EmotionResult(
-                emotion_label=emotion_label,
-                emotion_scores=normalized,
-                sentiment_score=sentiment_score,
-                sentiment_label=self.sentiment_label_from_score(sentiment_score),
-                model_version=self.model_name,
-                analyzed_at=datetime.utcnow(),
-            )
+            outputs = self._infer(text)
+            return self._result_from_outputs(outputs)
         except Exception as exc:
             logger.warning("EmotionAnalyzer 推理失败，使用中性兜底: %s", exc)
             return self._neutral_result()
 
-    def analyze_batch(self, texts: List[str]) -> List[EmotionResult]:
-        return [self.analyze_emotion(text) for text in texts]
+    def analyze_batch(
+        self,
+        texts: List[str],
+        batch_size: Optional[int] = None,
+    ) -> List[EmotionResult]:
+        """批量推理：非空文本按 batch_size 成批送入模型（padding 后一次前向），结果与 texts 一一对应"""
+        results: List[Optional[EmotionResult]] = [None] * len(texts)
+        # 按长度排序后分批，同批文本长度相近，padding 到批内最长时浪费的计算最少
+        pending = sorted(
+            (i for i, text in enumerate(texts) if text and text.strip()),
+            key=lambda i: len(texts[i]),
+        )
+
+        if pending:
+            self._load_classifier()
+
+        if pending and self._classifier is not None:
+            try:
+                outputs = self._infer(
+                    [texts[i] for i in pending],
+                    batch_size=batch_size or settings.EMOTION_BATCH_SIZE,
+                )
+                for i, output in zip(pending, outputs):
+                    results[i] = self._result_from_outputs(output)
+            except Exception as exc:
+                # 整批失败时逐条重试，避免个别文本拖累整批
+                logger.warning("EmotionAnalyzer 批量推理失败，逐条重试: %s", exc)
+                for i in pending:
+                    results[i] = self.analyze_emotion(texts[i])
+
+        return [result or self._neutral_result() for result in results]
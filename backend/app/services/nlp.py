@@ -3,19 +3,34 @@ NLP分析服务
 """
 import os
 import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
 from pathlib import Path
 
 import jieba
 import jieba.analyse
+import numpy as np
+from scipy import sparse
 from snownlp import SnowNLP
-from typing import List, Dict, Tuple
-from collections import Counter
+from typing import List, Dict, Optional, Tuple
+from collections import Counter, OrderedDict
 
 logger = logging.getLogger(__name__)
 
 # 停用词文件路径
 STOPWORDS_FILE = Path(__file__).resolve().parent.parent.parent / "data" / "stopwords.txt"
 
+# 文本数达到该阈值才启用多进程分词（进程启动与传输开销在小语料上得不偿失）
+PARALLEL_MIN_TEXTS = 2000
+
+# 多进程分词的启动方式：进程内有调度器、线程池等多个线程，fork 可能继承被其他线程持有的锁导致子进程死锁
+MP_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+# 热词ETL单条文本关键词缓存容量（评论/弹幕重复率高，如“233”“前排”；回填时历史语料每天重复出现）
+TEXT_KEYWORDS_CACHE_SIZE = 131072
+
 
 def load_stopwords_from_file(filepath: Path) -> set:
     """从文件加载停用词"""
@@ -96,36 +111,112 @@ class NLPAnalyzer:
         从多个文本中提取热词（TF-IDF加权 + 词性过滤）
         返回: [(词, 权重分数), ...] 权重为整数，兼容现有调用方
         """
-        word_weights: Dict[str, float] = {}
+        matrix, vocabulary = self.build_keyword_matrix(texts)
+        return self.rank_keywords(matrix, vocabulary, top_k)
 
-        for text in texts:
-            if not text or not text.strip():
-                continue
-            # 使用 jieba TF-IDF 提取，带词性过滤
-            keywords = jieba.analyse.extract_tags(
-                text,
-                topK=20,
-                withWeight=True,
-                allowPOS=self.ALLOW_POS
-            )
+    @staticmethod
+    def _text_keywords(text: str, cache: "TextKeywordsCache") -> Tuple[Tuple[str, float], ...]:
+        """单条文本的 TF-IDF 关键词（已过滤单字和停用词），相同文本只分词一次"""
+        if not text or not text.strip():
+            return ()
+        keywords = cache.get(text)
+        if keywords is None:
+            keywords = _compute_text_keywords(text)
+            cache.put(text, keywords)
+        return keywords
+
+    def build_keyword_matrix(
+        self,
+        texts: List[str],
+        workers: int = 1,
+        cache: Optional["TextKeywordsCache"] = None
+    ) -> Tuple[sparse.csr_matrix, List[str]]:
+        """
+        逐条提取关键词，构建 文本×词 的 TF-IDF 权重稀疏矩阵
+
+        每个文本只分词一次；行内非零元素按关键词提取顺序存放。
+        workers > 1 且文本足够多时，分词在多个子进程中按连续分片并行执行，
+        结果按原顺序合并，与单进程一致。
+        cache 为调用方持有的关键词缓存（热词ETL传入，可跨天复用）；未传入时只在本次调用内去重。
+        返回: (CSR 矩阵, 词表)，矩阵列号即词表下标
+        """
+        vocabulary: Dict[str, int] = {}
+        indices: List[int] = []
+        weights: List[float] = []
+        indptr = [0]
+        if cache is None:
+            cache = TextKeywordsCache(maxsize=max(len(texts), 1))
+
+        if workers > 1 and len(texts) >= PARALLEL_MIN_TEXTS:
+            # 重复文本只处理一次；已缓存的文本（如回填时前几天处理过的历史语料）不再分词
+            unique_texts = list(dict.fromkeys(texts))
+            keywords_by_text = {text: cache.get(text) for text in unique_texts}
+            missing = [text for text, keywords in keywords_by_text.items() if keywords is None]
+            if len(missing) >= PARALLEL_MIN_TEXTS:
+                # 每个进程分到多个分片，平衡长短文本的负载；结果写回缓存
+                shard_size = -(-len(missing) // (workers * 4))
+                shards = [missing[i:i + shard_size] for i in range(0, len(missing), shard_size)]
+                with ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=get_mp_context()
+                ) as executor:
+                    results = chain.from_iterable(executor.map(_extract_texts_keywords, shards))
+                    for text, keywords in zip(missing, results):
+                        keywords_by_text[text] = keywords
+                        cache.put(text, keywords)
+            else:
+                for text in missing:
+                    keywords_by_text[text] = self._text_keywords(text, cache)
+            text_keywords = (keywords_by_text[text] for text in texts)
+        else:
+            text_keywords = (self._text_keywords(text, cache) for text in texts)
+
+        for keywords in text_keywords:
             for word, weight in keywords:
-                if len(word) > 1 and word not in self.STOP_WORDS:
-                    word_weights[word] = word_weights.get(word, 0) + weight
+                indices.append(vocabulary.setdefault(word, len(vocabulary)))
+                weights.append(weight)
+            indptr.append(len(indices))
 
-        # 按聚合权重排序，转为整数分数兼容现有格式
-        sorted_words = sorted(word_weights.items(), key=lambda x: x[1], reverse=True)[:top_k]
+        matrix = sparse.csr_matrix(
+            (
+                np.asarray(weights, dtype=np.float64),
+                np.asarray(indices, dtype=np.int32),
+                np.asarray(indptr, dtype=np.int32)
+            ),
+            shape=(len(texts), len(vocabulary))
+        )
+        return matrix, list(vocabulary)
 
-        if not sorted_words:
+    @staticmethod
+    def rank_keywords(
+        matrix: sparse.csr_matrix,
+        vocabulary: List[str],
+        top_k: int = 50,
+        rows: slice = slice(None)
+    ) -> List[Tuple[str, int]]:
+        """
+        聚合矩阵中一段连续行的关键词权重，返回前 top_k 个热词
+
+        权重相同的词按在这些行中首次出现的先后排序。
+        返回: [(词, 权重分数), ...] 最高权重映射到 100
+        """
+        start, stop, _ = rows.indices(matrix.shape[0])
+        begin, end = matrix.indptr[start], matrix.indptr[stop]
+        columns = matrix.indices[begin:end]
+        if columns.size == 0:
             return []
 
-        # 归一化为整数分数（最高权重映射到 100）
-        max_weight = sorted_words[0][1]
-        result = []
-        for word, weight in sorted_words:
-            score = int(round(weight / max_weight * 100))
-            result.append((word, max(score, 1)))
+        # 按列求和（顺序累加），并记录每个词首次出现的位置
+        words, first_seen, inverse = np.unique(columns, return_index=True, return_inverse=True)
+        word_weights = np.bincount(inverse, weights=matrix.data[begin:end])
+        order = np.lexsort((first_seen, -word_weights))[:top_k]
 
-        return result
+        # 归一化为整数分数（最高权重映射到 100）
+        max_weight = float(word_weights[order[0]])
+        return [
+            (vocabulary[words[i]], max(int(round(float(word_weights[i]) / max_weight * 100)), 1))
+            for i in order
+        ]
 
     def analyze_sentiment(self, text: str) -> float:
         """
@@ -170,3 +261,97 @@ class NLPAnalyzer:
 
 
 NLPAnalyzer.ensure_stop_words_loaded()
+
+
+class TextKeywordsCache:
+    """
+    单条文本关键词的 LRU 缓存：原始文本 -> 关键词（停用词加载后不再变化，条目不会过期）
+
+    由调用方持有并随之释放，不做进程级缓存：热词ETL每次运行新建一个（回填时跨天复用），
+    Web 请求只在单次调用内去重。超出容量时淘汰最久未使用的条目。
+    """
+
+    def __init__(self, maxsize: int = TEXT_KEYWORDS_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, Tuple[Tuple[str, float], ...]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, text: str) -> Optional[Tuple[Tuple[str, float], ...]]:
+        """读取缓存，命中时刷新为最近使用"""
+        with self._lock:
+            keywords = self._data.get(text)
+            if keywords is not None:
+                self._data.move_to_end(text)
+            return keywords
+
+    def put(self, text: str, keywords: Tuple[Tuple[str, float], ...]) -> None:
+        """写入缓存，超出容量时淘汰最久未使用的条目"""
+        with self._lock:
+            self._data[text] = keywords
+            self._data.move_to_end(text)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+def _compute_text_keywords(text: str) -> Tuple[Tuple[str, float], ...]:
+    """单条文本的 jieba TF-IDF 关键词（不经缓存）"""
+    # 使用 jieba TF-IDF 提取，带词性过滤
+    keywords = jieba.analyse.extract_tags(
+        text,
+        topK=20,
+        withWeight=True,
+        allowPOS=NLPAnalyzer.ALLOW_POS
+    )
+    return tuple(
+        (word, weight) for word, weight in keywords
+        if len(word) > 1 and word not in NLPAnalyzer.STOP_WORDS
+    )
+
+
+# 进程内共享的分析器单例
+_nlp_instance: Optional[NLPAnalyzer] = None
+
+
+def get_nlp() -> NLPAnalyzer:
+    """获取进程内共享的 NLPAnalyzer 单例（首次调用时加载停用词并预热 jieba 词典）"""
+    global _nlp_instance
+    if _nlp_instance is None:
+        # 构建前缀树约需1-2秒，提前完成以免首个分词请求阻塞；回填多天时只付一次
+        jieba.initialize()
+        _nlp_instance = NLPAnalyzer()
+    return _nlp_instance
+
+
+def get_mp_context() -> multiprocessing.context.BaseContext:
+    """
+    多进程分词使用的启动上下文
+
+    forkserver 默认预加载 __main__，以 python main.py 启动时会在服务进程中重新执行入口脚本
+    （建表、注册路由、加载模型单例）；这里只预加载本模块，工作函数都定义在本模块中
+    """
+    ctx = multiprocessing.get_context(MP_START_METHOD)
+    if MP_START_METHOD == "forkserver":
+        ctx.set_forkserver_preload([__name__])
+    return ctx
+
+
+def tokenize_title(text: str) -> str:
+    """标题分词（去除空白词与停用词，空格连接），训练与实时推荐共用"""
+    # 确保停用词文件已并入统一停用词表，训练与推荐使用同一份停用词
+    stop_words = NLPAnalyzer.ensure_stop_words_loaded()
+    return ' '.join([w for w in jieba.lcut(text) if w.strip() and w not in stop_words])
+
+
+def tokenize_titles(titles: List[str]) -> List[str]:
+    """批量标题分词（多进程分词的工作函数）"""
+    return [tokenize_title(title) for title in titles]
+
+
+def _extract_texts_keywords(texts: List[str]) -> List[Tuple[Tuple[str, float], ...]]:
+    """多进程分词的工作函数：返回每条文本的关键词列表"""
+    # 子进程随执行器一起销毁，不必写缓存；子进程不继承父进程状态，首次调用时加载停用词与 jieba 词典
+    get_nlp()
+    return [_compute_text_keywords(text) if text and text.strip() else () for text in texts]
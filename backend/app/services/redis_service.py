@@ -6,16 +6,21 @@ Redis 客户端模块
 - 与 Spark Streaming 结果交互
 """
 
-import json
 import logging
 from typing import Optional, Dict, List, Any
 
+import orjson
+
 logger = logging.getLogger(__name__)
 
 # Redis 配置
 REDIS_HOST = "localhost"
 REDIS_PORT = 6379
 REDIS_DB = 0
+REDIS_MAX_CONNECTIONS = 64
+REDIS_POOL_TIMEOUT = 2
+REDIS_SOCKET_TIMEOUT = 5
+REDIS_HEALTH_CHECK_INTERVAL = 30
 
 # 标记 Redis 是否可用
 _redis_available = False
@@ -37,12 +42,19 @@ def get_redis_client():
 
     if _client is None:
         try:
-            _client = redis.Redis(
+            # 显式连接池：限制最大连接数，空闲连接定期健康检查，避免请求时重连
+            pool = redis.BlockingConnectionPool(
                 host=REDIS_HOST,
                 port=REDIS_PORT,
                 db=REDIS_DB,
+                max_connections=REDIS_MAX_CONNECTIONS,
+                timeout=REDIS_POOL_TIMEOUT,
+                socket_timeout=REDIS_SOCKET_TIMEOUT,
+                socket_keepalive=True,
+                health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
                 decode_responses=True,
             )
+            _client = redis.Redis(connection_pool=pool)
             # 测试连接
             _client.ping()
             logger.info(f"Redis 已连接: {REDIS_HOST}:{REDIS_PORT}")
@@ -109,7 +121,7 @@ def get_room_stats_history(room_id: int, limit: int = 50) -> List[Dict[str, Any]
     try:
         key = f"live:stats:{room_id}:history"
         data = client.lrange(key, 0, limit - 1)
-        return [json.loads(item) for item in data]
+        return [orjson.loads(item) for item in data]
     except Exception as e:
         logger.error(f"获取历史统计失败: {e}")
         return []
@@ -168,7 +180,7 @@ def get_global_wordcloud() -> List[Dict[str, Any]]:
         key = "live:global:wordcloud"
         data = client.get(key)
         if data:
-            return json.loads(data)
+            return orjson.loads(data)
         return []
     except Exception as e:
         logger.error(f"获取全局词云失败: {e}")
@@ -193,6 +205,64 @@ def set_room_stats(room_id: int, stats: Dict[str, Any], expire: int = 3600):
         return False
 
 
+def get_cached_json(key: str) -> Optional[Any]:
+    """
+    读取 JSON 缓存（供接口结果缓存使用）
+
+    Returns:
+        反序列化后的对象；未命中或 Redis 不可用时返回 None
+    """
+    client = get_redis_client()
+    if client is None:
+        return None
+
+    try:
+        data = client.get(key)
+        if data:
+            return orjson.loads(data)
+        return None
+    except Exception as e:
+        logger.error(f"读取缓存失败: {e}")
+        return None
+
+
+def set_cached_json(key: str, value: Any, expire: int = 60) -> bool:
+    """
+    写入 JSON 缓存（带过期时间）
+    """
+    client = get_redis_client()
+    if client is None:
+        return False
+
+    try:
+        client.setex(key, expire, orjson.dumps(value))
+        return True
+    except Exception as e:
+        logger.error(f"写入缓存失败: {e}")
+        return False
+
+
+def delete_cached_pattern(pattern: str) -> int:
+    """
+    按通配符删除缓存（数据刷新后失效接口缓存）
+
+    Returns:
+        删除的 key 数量
+    """
+    client = get_redis_client()
+    if client is None:
+        return 0
+
+    try:
+        keys = list(client.scan_iter(match=pattern, count=500))
+        if keys:
+            return client.delete(*keys)
+        return 0
+    except Exception as e:
+        logger.error(f"删除缓存失败: {e}")
+        return 0
+
+
 def is_redis_available() -> bool:
     """检查 Redis 是否可用"""
     return _redis_available and get_redis_client() is not None
@@ -203,5 +273,6 @@ def close_redis_client():
     global _client
     if _client is not None:
         _client.close()
+        _client.connection_pool.disconnect()
         _client = None
         logger.info("Redis 客户端已关闭")
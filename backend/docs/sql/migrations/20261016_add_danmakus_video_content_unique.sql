@@ -0,0 +1,18 @@
+USE bilibili_analyzer;
+
+-- 采集弹幕改为 INSERT IGNORE 依赖 (video_id, content) 唯一键去重
+-- 内容列改用二进制排序规则：原 utf8mb4_unicode_ci 下大小写、全/半角不同的弹幕会被当作重复
+ALTER TABLE `danmakus`
+  MODIFY COLUMN `content` varchar(500) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL;
+
+-- 先删除同一视频下内容完全相同的弹幕，保留最早一条
+DELETE d1 FROM `danmakus` d1
+JOIN `danmakus` d2
+  ON d1.`video_id` = d2.`video_id`
+ AND d1.`content` = d2.`content`
+ AND d1.`id` > d2.`id`;
+
+-- 唯一键以 video_id 开头，可替代原 video_id 单列索引
+ALTER TABLE `danmakus`
+  ADD UNIQUE INDEX `uk_danmakus_video_content` (`video_id`, `content`),
+  DROP INDEX `ix_danmakus_video_id`;
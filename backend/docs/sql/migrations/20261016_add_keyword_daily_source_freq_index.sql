@@ -0,0 +1,6 @@
+USE bilibili_analyzer;
+
+-- (stat_date, source) 是新索引的前缀，旧索引一并移除
+ALTER TABLE `dwd_keyword_daily`
+  ADD INDEX `idx_keyword_date_source_freq` (`stat_date`, `source`, `frequency` DESC, `word`),
+  DROP INDEX `idx_keyword_source`;
@@ -0,0 +1,9 @@
+USE bilibili_analyzer;
+
+-- keywords 为每次采集后重建的派生表，清空后由下一次 update_keywords 重新生成
+-- 全站热词的 category 由 NULL 改为空串，使 (word, category) 唯一键对全站热词同样生效
+DELETE FROM `keywords`;
+
+ALTER TABLE `keywords`
+  MODIFY COLUMN `category` varchar(50) NOT NULL DEFAULT '',
+  ADD UNIQUE INDEX `uk_keywords_word_category` (`word`, `category`);
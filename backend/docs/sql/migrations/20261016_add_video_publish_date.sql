@@ -0,0 +1,6 @@
+USE bilibili_analyzer;
+
+-- 存储生成列，添加时由 MySQL 自动回填已有数据
+ALTER TABLE `videos`
+  ADD COLUMN `publish_date` date GENERATED ALWAYS AS (DATE(`publish_time`)) STORED AFTER `publish_time`,
+  ADD INDEX `ix_videos_publish_date` (`publish_date`);
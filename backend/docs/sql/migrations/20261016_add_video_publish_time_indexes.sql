@@ -0,0 +1,5 @@
+USE bilibili_analyzer;
+
+ALTER TABLE `videos`
+  ADD INDEX `idx_videos_publish_play` (`publish_time`, `play_count`),
+  ADD INDEX `idx_videos_category_publish_time` (`category`, `publish_time`);
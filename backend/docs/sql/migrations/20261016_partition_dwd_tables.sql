@@ -0,0 +1,29 @@
+USE bilibili_analyzer;
+
+-- DWD 明细表按月 RANGE 分区（MySQL 8）
+-- 分区表的主键/唯一键必须包含分区键：主键改为 (id, 日期)，唯一键已包含日期
+-- 之后的月分区由 ETL 调度器每日从 p_future 中拆出（app/etl/partitions.py）
+
+ALTER TABLE `dwd_video_snapshot`
+  DROP PRIMARY KEY,
+  ADD PRIMARY KEY (`id`, `snapshot_date`);
+
+ALTER TABLE `dwd_video_snapshot`
+  PARTITION BY RANGE COLUMNS (`snapshot_date`) (
+    PARTITION p_history VALUES LESS THAN ('2026-10-01'),
+    PARTITION p202610 VALUES LESS THAN ('2026-11-01'),
+    PARTITION p202611 VALUES LESS THAN ('2026-12-01'),
+    PARTITION p_future VALUES LESS THAN (MAXVALUE)
+  );
+
+ALTER TABLE `dwd_comment_daily`
+  DROP PRIMARY KEY,
+  ADD PRIMARY KEY (`id`, `stat_date`);
+
+ALTER TABLE `dwd_comment_daily`
+  PARTITION BY RANGE COLUMNS (`stat_date`) (
+    PARTITION p_history VALUES LESS THAN ('2026-10-01'),
+    PARTITION p202610 VALUES LESS THAN ('2026-11-01'),
+    PARTITION p202611 VALUES LESS THAN ('2026-12-01'),
+    PARTITION p_future VALUES LESS THAN (MAXVALUE)
+  );
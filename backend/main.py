@@ -71,6 +71,11 @@ async def lifespan(app: FastAPI):
     finally:
         _db.close()
 
+    # 后台预热 jieba 词典（构建前缀树约需1-2秒），避免首个分词请求阻塞
+    import threading
+    import jieba
+    threading.Thread(target=jieba.initialize, name="jieba-init", daemon=True).start()
+
     etl_scheduler.start()
     logger.info("ETL调度器已启动")
 
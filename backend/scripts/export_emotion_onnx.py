@@ -0,0 +1,58 @@
+"""
+情绪模型 ONNX 导出脚本
+
+导出一次后在 .env 中配置 EMOTION_ONNX_PATH 指向输出目录，
+EmotionAnalyzer 即改用 ONNX Runtime 推理（需要 optimum[onnxruntime]）。
+
+用法:
+  cd backend
+  python scripts/export_emotion_onnx.py
+  python scripts/export_emotion_onnx.py --output ml_models/emotion-onnx
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.config import settings
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="情绪模型 ONNX 导出脚本")
+    parser.add_argument(
+        "--model",
+        type=str,
+        default=settings.EMOTION_MODEL_NAME,
+        help="Hugging Face 模型名或本地目录，默认 EMOTION_MODEL_NAME",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default="ml_models/emotion-onnx",
+        help="导出目录，默认 ml_models/emotion-onnx",
+    )
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+
+    from optimum.onnxruntime import ORTModelForSequenceClassification
+    from transformers import AutoTokenizer
+
+    output = Path(args.output)
+    print(f"[导出] 模型: {args.model}")
+    model = ORTModelForSequenceClassification.from_pretrained(args.model, export=True)
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+
+    model.save_pretrained(output)
+    tokenizer.save_pretrained(output)
+    print(f"[导出] 完成: {output.resolve()}")
+    print(f"请在 .env 中配置 EMOTION_ONNX_PATH={output}")
+
+
+if __name__ == "__main__":
+    main()
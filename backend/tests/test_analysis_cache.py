@@ -0,0 +1,104 @@
+"""
+测试分区分布与每日趋势的 Redis 缓存在采集入库后失效
+
+用法：
+  cd backend
+  python tests/test_analysis_cache.py
+
+说明：
+    该脚本不依赖数据库和 Redis：以内存字典模拟 Redis 客户端，分析查询返回可修改的
+    “库中数据”，采集后ETL的执行替换为空操作，只验证缓存的读写与失效。
+"""
+import sys
+from fnmatch import fnmatch
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.etl.scheduler import etl_scheduler
+from app.services import redis_service
+from app.services.analyzer import DataAnalyzer
+from app.services.crawl_service import CrawlService
+
+
+class FakeRedis:
+    """只实现缓存读写用到的命令"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def setex(self, key, expire, value):
+        self.data[key] = value
+
+    def scan_iter(self, match, count=None):
+        return [key for key in list(self.data) if fnmatch(key, match)]
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+        return len(keys)
+
+
+class FakeAnalyzer(DataAnalyzer):
+    """查询直接返回当前“库中数据”，并记录查询次数"""
+
+    def __init__(self):
+        super().__init__(db=None)
+        self.categories = [{"category": "游戏", "count": 1, "total_play": 100}]
+        self.trends = [{"date": "2026-10-15", "value": 1}]
+        self.query_count = 0
+
+    def _query_category_distribution(self):
+        self.query_count += 1
+        return list(self.categories)
+
+    def _query_daily_trends(self, days, metric):
+        self.query_count += 1
+        return list(self.trends)
+
+
+def main():
+    print("=" * 60)
+    print("测试分析结果缓存的失效")
+    print("=" * 60)
+
+    fake_redis = FakeRedis()
+    redis_service._redis_available = True
+    redis_service._client = fake_redis
+    etl_scheduler.run_daily_etl = lambda stat_date=None: []
+    analyzer = FakeAnalyzer()
+
+    print("\n[1] 重复请求命中缓存...")
+    categories = analyzer.get_category_distribution()
+    trends = analyzer.get_daily_trends(days=7, metric="play_count")
+    assert analyzer.get_category_distribution() == categories
+    assert analyzer.get_daily_trends(days=7, metric="play_count") == trends
+    assert analyzer.query_count == 2, "重复请求应命中缓存"
+    print(f"  缓存键: {sorted(fake_redis.data)}")
+
+    print("\n[2] 采集入库后缓存失效，重新查询得到新数据...")
+    analyzer.categories.append({"category": "音乐", "count": 2, "total_play": 50})
+    analyzer.trends = [{"date": "2026-10-15", "value": 3}]
+    assert analyzer.get_category_distribution() == categories, "未失效前应返回缓存"
+    fake_redis.data["videos:stats:[null]"] = b"{}"
+    CrawlService.__new__(CrawlService)._run_etl_after_crawl()
+    assert not fake_redis.data, f"采集后仍残留缓存: {list(fake_redis.data)}"
+    assert analyzer.get_category_distribution() == analyzer.categories, "采集后仍返回旧的分区分布"
+    assert analyzer.get_daily_trends(days=7, metric="play_count") == analyzer.trends, "采集后仍返回旧的每日趋势"
+    assert analyzer.query_count == 4, "采集后应重新查询"
+
+    print("\n[3] Redis 不可用时每次直接查询...")
+    redis_service._client = None
+    redis_service._redis_available = False
+    analyzer.categories = []
+    assert analyzer.get_category_distribution() == [], "Redis 不可用时应直接返回查询结果"
+    assert analyzer.get_category_distribution() == [] and analyzer.query_count == 6, "Redis 不可用时不应缓存"
+
+    print("\n测试通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+测试B站Cookie验证缓存与配置持久化
+
+用法：
+  cd backend
+  python tests/test_bilibili_auth.py
+
+说明：
+    该脚本不访问B站（以假会话替换验证请求），.env 写入临时目录。
+"""
+import os
+import stat
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services import bilibili_auth
+
+COOKIE = "SESSDATA=test_sessdata; bili_jct=test_jct"
+
+
+def file_mode(path: Path) -> int:
+    return stat.S_IMODE(path.stat().st_mode)
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        return self.data
+
+
+class FakeSession:
+    """按顺序返回预设的导航栏API响应，并记录请求次数"""
+
+    def __init__(self):
+        self.responses = []
+        self.calls = 0
+
+    def get(self, url, headers=None, timeout=None):
+        self.calls += 1
+        return FakeResponse(self.responses.pop(0))
+
+
+def test_validation_cache():
+    """只缓存有效与未登录（-101）的结果，风控拦截（-412、-352）下次重新请求"""
+    session = FakeSession()
+    bilibili_auth._session = session
+    logged_in = {"code": 0, "data": {"isLogin": True, "uname": "测试用户", "mid": 1}}
+
+    cases = [
+        ("有效", logged_in, True),
+        ("未登录", {"code": -101, "message": "账号未登录"}, True),
+        ("风控 -412", {"code": -412, "message": "请求被拦截"}, False),
+        ("风控 -352", {"code": -352, "message": "风控校验失败"}, False),
+    ]
+    for name, response, cached in cases:
+        bilibili_auth.clear_validation_cache()
+        session.calls = 0
+        session.responses = [response, logged_in]
+        first = bilibili_auth.validate_cookie(COOKIE)
+        second = bilibili_auth.validate_cookie(COOKIE)
+        print(f"  {name}: 请求 {session.calls} 次，第二次结果 valid={second['valid']}")
+        if cached:
+            assert session.calls == 1 and second == first, f"{name} 的结果应被缓存"
+        else:
+            assert session.calls == 2 and second["valid"], f"{name} 的结果不应被缓存"
+
+
+def test_env_permissions(tmp_dir: Path):
+    """写入.env时保留原权限，新建时仅属主可读写，临时文件全程不超过该权限"""
+    env_path = tmp_dir / ".env"
+    bilibili_auth.ENV_FILE_PATH = env_path
+
+    # 记录临时文件创建时的权限（写入 Cookie 之前）
+    created_modes = []
+    real_fdopen = os.fdopen
+
+    def recording_fdopen(fd, *args, **kwargs):
+        created_modes.append(stat.S_IMODE(os.fstat(fd).st_mode))
+        return real_fdopen(fd, *args, **kwargs)
+
+    os.fdopen = recording_fdopen
+    try:
+        print("\n[1] 新建.env...")
+        assert bilibili_auth.update_cookie_in_env(COOKIE), "新建.env失败"
+        print(f"  权限: {oct(file_mode(env_path))}")
+        assert file_mode(env_path) == 0o600, "新建的.env应仅属主可读写"
+
+        print("\n[2] 覆盖已有.env（0640），保留其他配置与权限...")
+        env_path.write_text("DEBUG=true\nBILIBILI_COOKIE=old\n", encoding="utf-8")
+        os.chmod(env_path, 0o640)
+        # 模拟上次写入中途崩溃残留的临时文件
+        env_path.with_name(".env.tmp").write_text("stale", encoding="utf-8")
+        assert bilibili_auth.update_cookie_in_env(COOKIE), "覆盖.env失败"
+        content = env_path.read_text(encoding="utf-8")
+        print(f"  权限: {oct(file_mode(env_path))}，内容: {content!r}")
+        assert content == f"DEBUG=true\nBILIBILI_COOKIE={COOKIE}\n", ".env内容异常"
+        assert file_mode(env_path) == 0o640, "覆盖后.env权限发生变化"
+        assert not env_path.with_name(".env.tmp").exists(), "临时文件未被替换"
+    finally:
+        os.fdopen = real_fdopen
+
+    print(f"  临时文件创建时的权限: {[oct(mode) for mode in created_modes]}")
+    # 创建时的权限受 umask 影响只会更严，不能超出目标权限
+    for mode, expected in zip(created_modes, (0o600, 0o640)):
+        assert mode & ~expected == 0, f"临时文件创建时权限过宽: {oct(mode)}"
+
+
+def main():
+    print("=" * 60)
+    print("测试B站Cookie验证缓存与配置持久化")
+    print("=" * 60)
+
+    original_session = bilibili_auth._session
+    original_env_path = bilibili_auth.ENV_FILE_PATH
+    original_cookie = bilibili_auth._runtime_cookie
+    try:
+        print("\n[验证结果缓存]")
+        test_validation_cache()
+
+        print("\n[.env 持久化]")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            test_env_permissions(Path(tmp_dir))
+    finally:
+        bilibili_auth.clear_validation_cache()
+        bilibili_auth._session = original_session
+        bilibili_auth.ENV_FILE_PATH = original_env_path
+        bilibili_auth._runtime_cookie = original_cookie
+        bilibili_auth._env_cache = None
+        bilibili_auth._env_cache_mtime = None
+
+    print("\n测试通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,11 +6,147 @@
     python tests/test_crawl_service.py
 """
 import sys
+from datetime import datetime
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from app.services.crawl_service import CrawlService
+from app.core.database import SessionLocal
+from app.models import Comment, Danmaku
+from app.services.crawl_service import DANMAKU_CONTENT_MAX_LENGTH, CrawlService
+from app.services.crawler import BilibiliCrawler
+from app.services.emotion import EmotionResult
+
+# 测试评论、弹幕挂在不存在的视频ID下，结束时删除
+TEST_VIDEO_ID = -1
+
+
+class FakeDanmakuCrawler:
+    """返回固定弹幕列表的假爬虫"""
+
+    def __init__(self, danmakus):
+        self.danmakus = danmakus
+
+    def get_video_danmakus(self, cid, max_count=500):
+        return [{"content": content, "send_time": 1.0, "color": "ffffff"} for content in self.danmakus[:max_count]]
+
+
+class FakeEmotion:
+    """所有评论都判为中性的假情绪分析器"""
+
+    def analyze_batch(self, texts):
+        return [
+            EmotionResult("neutral", {"neutral": 1.0}, 0.5, "neutral", "fake", datetime.utcnow())
+            for _ in texts
+        ]
+
+
+class FakeCommentCrawler:
+    """按游标逐页返回固定评论的假爬虫，请求到 fail_page 页时抛出异常"""
+
+    parse_comment_user_profile = staticmethod(BilibiliCrawler.parse_comment_user_profile)
+
+    def __init__(self, pages, fail_page=None):
+        self.pages = pages
+        self.fail_page = fail_page
+        self.requested = []
+        self.emotion = FakeEmotion()
+
+    def get_video_comments_main(self, oid, next_cursor=0, page_size=20, mode=3):
+        self.requested.append(next_cursor)
+        if next_cursor == self.fail_page:
+            raise RuntimeError("模拟评论接口异常")
+        return {
+            "replies": self.pages[next_cursor],
+            "cursor": {"next": next_cursor + 1, "is_end": next_cursor + 1 == len(self.pages)},
+        }
+
+
+def make_comment(rpid, content):
+    return {"rpid": rpid, "content": {"message": content}, "member": {"uname": "测试用户"}, "like": 0}
+
+
+def test_comment_batch():
+    """评论按页批量写入：跳过已存在的 rpid，中途失败时保留已写入的页"""
+    print("\n[评论批量写入]")
+    # 负数 rpid 不会与真实评论冲突；-1、-2 预先存在
+    pages = [
+        [make_comment(-1, "新内容1"), make_comment(-3, "评论3"), make_comment(-2, "新内容2"),
+         make_comment(-3, "评论3重复"), make_comment(-4, "")],
+        [make_comment(-5, "评论5"), make_comment(-6, "评论6")],
+        [make_comment(-7, "评论7")],
+        [make_comment(-8, "评论8")],
+    ]
+    test_rpids = [-rpid for rpid in range(1, 9)]
+    service = CrawlService()
+
+    db = SessionLocal()
+    try:
+        db.query(Comment).filter(Comment.rpid.in_(test_rpids)).delete(synchronize_session=False)
+        db.add_all([
+            Comment(rpid=-1, video_id=TEST_VIDEO_ID, content="旧评论1"),
+            Comment(rpid=-2, video_id=TEST_VIDEO_ID, content="旧评论2"),
+        ])
+        db.commit()
+
+        service.crawler = FakeCommentCrawler(pages, fail_page=2)
+        saved = service._crawl_and_analyze_comments(TEST_VIDEO_ID, oid=0, max_comments=100, db=db)
+        db.expire_all()
+        rows = dict(db.query(Comment.rpid, Comment.content).filter(Comment.rpid.in_(test_rpids)))
+        print(f"  第3页请求失败: 写入 {saved} 条，请求的页 {service.crawler.requested}，库中 {sorted(rows)}")
+        assert saved == 3, "失败前各页的新评论条数异常"
+        assert rows == {-1: "旧评论1", -2: "旧评论2", -3: "评论3", -5: "评论5", -6: "评论6"}, \
+            "已存在的评论被覆盖，或失败前已写入的页未保留"
+        assert service.crawler.requested == [0, 1, 2], "请求失败后不应继续翻页"
+
+        service.crawler = FakeCommentCrawler(pages)
+        saved = service._crawl_and_analyze_comments(TEST_VIDEO_ID, oid=0, max_comments=100, db=db)
+        db.expire_all()
+        rows = dict(db.query(Comment.rpid, Comment.content).filter(Comment.rpid.in_(test_rpids)))
+        print(f"  重新采集: 写入 {saved} 条，库中 {sorted(rows)}")
+        assert saved == 2, "重新采集时已写入的评论应跳过，只写入剩余页"
+        assert len(rows) == 7 and rows[-7] == "评论7" and rows[-8] == "评论8", "重新采集后评论缺失"
+    finally:
+        db.rollback()
+        db.query(Comment).filter(Comment.rpid.in_(test_rpids)).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+
+
+def test_danmaku_dedup():
+    """弹幕按原样去重：大小写、全/半角不同各自保留，超长内容截断后写入"""
+    print("\n[弹幕去重]")
+    long_content = "长" * (DANMAKU_CONTENT_MAX_LENGTH + 100)
+    danmakus = [
+        "哈哈哈", "哈哈哈", "  哈哈哈  ",
+        "AWSL", "awsl", "ＡＷＳＬ",
+        long_content, long_content + "尾",
+        "   ",
+    ]
+    service = CrawlService()
+    service.crawler = FakeDanmakuCrawler(danmakus)
+
+    db = SessionLocal()
+    try:
+        db.query(Danmaku).filter(Danmaku.video_id == TEST_VIDEO_ID).delete(synchronize_session=False)
+        db.commit()
+
+        saved = service._crawl_danmakus(TEST_VIDEO_ID, cid=0, max_danmakus=100, db=db)
+        contents = sorted(d for (d,) in db.query(Danmaku.content).filter(Danmaku.video_id == TEST_VIDEO_ID))
+        print(f"  首次写入: {saved} 条，{[c[:8] for c in contents]}")
+        expected = sorted(["哈哈哈", "AWSL", "awsl", "ＡＷＳＬ", long_content[:DANMAKU_CONTENT_MAX_LENGTH]])
+        assert contents == expected, "弹幕去重或超长截断异常"
+        assert saved == len(expected), "弹幕写入条数异常"
+
+        saved = service._crawl_danmakus(TEST_VIDEO_ID, cid=0, max_danmakus=100, db=db)
+        print(f"  重复写入: {saved} 条")
+        assert saved == 0, "已存在的弹幕被重复写入"
+        count = db.query(Danmaku).filter(Danmaku.video_id == TEST_VIDEO_ID).count()
+        assert count == len(expected), "重复写入后弹幕条数变化"
+    finally:
+        db.query(Danmaku).filter(Danmaku.video_id == TEST_VIDEO_ID).delete(synchronize_session=False)
+        db.commit()
+        db.close()
 
 
 def main():
@@ -18,6 +154,9 @@ def main():
     print("测试采集服务层（带情感分析和日志）")
     print("="*60)
 
+    test_comment_batch()
+    test_danmaku_dedup()
+
     service = CrawlService()
 
     # 采集5个视频，每个视频50条评论
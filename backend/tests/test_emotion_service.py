@@ -56,6 +56,30 @@ def main():
     print(f"空文本兜底: emotion={empty_result.emotion_label}, score={empty_result.sentiment_score}")
     assert empty_result.emotion_label == "neutral", "空文本兜底异常"
 
+    batch_result = EmotionAnalyzer().analyze_batch(["", "   "])
+    print(f"批量空文本兜底: {[r.emotion_label for r in batch_result]}")
+    assert [r.emotion_label for r in batch_result] == ["neutral", "neutral"], "批量空文本兜底异常"
+
+    # 批量推理按长度排序后送入模型，结果仍按输入顺序返回（桩分类器：含“好”为 joy，否则 anger）
+    calls = []
+
+    def stub_classifier(inputs, **kwargs):
+        calls.append(list(inputs))
+        return [
+            [{"label": "joy" if "好" in text else "anger", "score": 0.9}]
+            for text in inputs
+        ]
+
+    analyzer = EmotionAnalyzer()
+    analyzer._classifier = stub_classifier
+    texts = ["这个视频真的太好看了", "", "差", "好", "一般般吧"]
+    sorted_result = analyzer.analyze_batch(texts)
+    print(f"批量推理调用顺序: {calls}")
+    print(f"批量推理结果: {[r.emotion_label for r in sorted_result]}")
+    assert calls == [["差", "好", "一般般吧", "这个视频真的太好看了"]], "批量推理未按长度排序"
+    assert [r.emotion_label for r in sorted_result] == ["joy", "neutral", "anger", "joy", "anger"], \
+        "批量推理结果未按输入顺序返回"
+
     print("测试通过")
 
 
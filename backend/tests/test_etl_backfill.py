@@ -0,0 +1,96 @@
+"""
+测试历史回填的调度顺序与失败汇总
+
+用法：
+  cd backend
+  python tests/test_etl_backfill.py
+
+说明：
+    该脚本不依赖数据库，以记录调用的假任务替换实际ETL任务的执行。
+"""
+import sys
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.etl.scheduler import DWS_PARALLEL_TASKS, ETLScheduler
+from app.etl.dwd_tasks import CommentDailyETL
+from app.etl.dws_tasks import CategoryDailyETL
+
+START = date(2026, 10, 1)
+DAYS = [START + timedelta(days=i) for i in range(4)]
+# 第2天评论明细失败（该天的DWS任务应跳过），第3天分区统计失败
+FAILING = {(CommentDailyETL, DAYS[1]), (CategoryDailyETL, DAYS[2])}
+
+
+class FakeRunner:
+    """记录每个任务的执行日期与同一任务的最大并发数"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = []
+        self.running = {}
+        self.max_running = {}
+
+    def __call__(self, task_class, stat_date, **task_kwargs):
+        with self.lock:
+            self.calls.append((task_class, stat_date))
+            self.running[task_class] = self.running.get(task_class, 0) + 1
+            self.max_running[task_class] = max(self.max_running.get(task_class, 0), self.running[task_class])
+        try:
+            time.sleep(0.02)
+            if (task_class, stat_date) in FAILING:
+                raise RuntimeError("模拟失败")
+            return {"task": task_class.__name__, "stat_date": str(stat_date), "errors": []}
+        finally:
+            with self.lock:
+                self.running[task_class] -= 1
+
+
+def main():
+    print("=" * 60)
+    print("测试历史回填的调度顺序与失败汇总")
+    print("=" * 60)
+
+    scheduler = ETLScheduler()
+    runner = FakeRunner()
+    scheduler._run_task = runner
+
+    print("\n[1] 有任务失败时回填结束后抛出汇总...")
+    try:
+        scheduler.backfill(DAYS[0], DAYS[-1])
+    except RuntimeError as e:
+        message = str(e)
+    else:
+        raise AssertionError("有任务失败时回填应抛出异常")
+    print(f"  {message}")
+    assert str(DAYS[1]) in message and "CommentDailyETL" in message, "汇总缺少评论明细失败的日期"
+    assert str(DAYS[2]) in message and "CategoryDailyETL" in message, "汇总缺少分区统计失败的日期"
+    assert str(DAYS[0]) not in message and str(DAYS[3]) not in message, "汇总包含成功的日期"
+
+    print("\n[2] DWD失败的日期跳过DWS任务，其余日期照常回填...")
+    for task_class in DWS_PARALLEL_TASKS:
+        task_days = [day for cls, day in runner.calls if cls is task_class]
+        print(f"  {task_class.__name__}: {[str(day) for day in task_days]}")
+        assert task_days == [DAYS[0], DAYS[2], DAYS[3]], f"{task_class.__name__} 回填日期异常"
+
+    print("\n[3] 同一DWS任务按天串行（不同任务可并发）...")
+    for task_class in DWS_PARALLEL_TASKS:
+        assert runner.max_running[task_class] == 1, f"{task_class.__name__} 多天同时写入同一张表"
+    print(f"  最大并发: {[runner.max_running[cls] for cls in DWS_PARALLEL_TASKS]}")
+
+    print("\n[4] 全部成功时返回按日期排列的结果...")
+    FAILING.clear()
+    results = scheduler.backfill(DAYS[0], DAYS[-1])
+    assert len(results) == len(DAYS) * 8, "回填结果数量异常"
+    assert [r["stat_date"] for r in results] == sorted(r["stat_date"] for r in results), "结果未按日期排列"
+    print(f"  结果数: {len(results)}")
+
+    print("\n测试通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+测试标题热词的视频计数（按分词结果匹配，而非子串匹配）
+
+用法：
+  cd backend
+  python tests/test_keyword_title_match.py
+
+说明：
+    该脚本不依赖数据库，直接对固定标题调用热词明细ETL的标题提取。
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.etl.keyword_tasks import KeywordDailyETL
+from app.services.nlp import _compute_text_keywords
+
+CATEGORY = "知识"
+TITLES = [
+    "学习方法分享",
+    "学习者的日常",  # 分词为“学习者”，子串匹配会误计入“学习”
+    "深度学习入门",
+    "手机游戏推荐",  # 分词为“手机游戏”，子串匹配会误计入“手机”“游戏”
+    "游戏手机测评",
+    "学习方法总结",
+]
+BVIDS = [f"BV{i:010d}" for i in range(len(TITLES))]
+
+
+def main():
+    print("=" * 60)
+    print("测试标题热词的视频计数")
+    print("=" * 60)
+
+    etl = KeywordDailyETL(db=None, workers=1)
+    result = {
+        item["word"]: item
+        for item in etl._extract_title_keywords({CATEGORY: TITLES}, {CATEGORY: BVIDS})
+    }
+    for word, item in result.items():
+        substring_count = sum(word in title for title in TITLES)
+        print(f"  {word}: 分词匹配 {item['video_count']}，子串匹配 {substring_count}，样例 {item['sample_bvids']}")
+
+    print("\n[1] 视频数与样例按标题的分词结果计算...")
+    title_keywords = [{word for word, _ in _compute_text_keywords(title)} for title in TITLES]
+    for word, item in result.items():
+        matched = [bvid for bvid, keywords in zip(BVIDS, title_keywords) if word in keywords]
+        assert item["video_count"] == len(matched), f"{word} 的视频数异常"
+        assert item["sample_bvids"] == matched[:5], f"{word} 的样例视频异常（应按标题顺序）"
+
+    print("\n[2] 分词与子串匹配结果不同的词...")
+    expected = {"学习": (3, 4), "游戏": (1, 2), "手机": (1, 2)}
+    for word, (token_count, substring_count) in expected.items():
+        assert word in result, f"{word} 未被提取为热词"
+        assert sum(word in title for title in TITLES) == substring_count
+        assert result[word]["video_count"] == token_count, f"{word} 应按分词结果计数"
+    assert BVIDS[1] not in result["学习"]["sample_bvids"], "“学习者”标题不应计入“学习”"
+
+    print("\n测试通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+测试热词表 UPSERT 与旧词清理
+
+用法：
+    cd backend
+    python tests/test_keywords_update.py
+
+说明：
+    该脚本依赖本地数据库，会改写 keywords 表，结束时按当前数据重新生成。
+"""
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.database import SessionLocal
+from app.models import Keyword
+from app.services.analyzer import DataAnalyzer
+
+TEST_CATEGORY = "__test_category__"
+
+
+def keyword_map(db, category):
+    """读取某分区（空串为全站）的热词 -> 频次"""
+    db.expire_all()
+    return {
+        k.word: k.frequency
+        for k in db.query(Keyword).filter(Keyword.category == category)
+    }
+
+
+def run_update(analyzer, keywords_data, category=None):
+    """用固定的热词数据执行 update_keywords"""
+    analyzer._site_keywords = lambda stat_date: keywords_data
+    analyzer._category_keywords = lambda stat_date, category: keywords_data
+    analyzer._extract_title_keywords = lambda category: keywords_data
+    analyzer.update_keywords(category)
+
+
+def main():
+    print("=" * 60)
+    print("测试热词表 UPSERT 与旧词清理")
+    print("=" * 60)
+
+    db = SessionLocal()
+    try:
+        analyzer = DataAnalyzer(db)
+
+        print("\n[1] 首次写入全站热词，清除旧词...")
+        db.add(Keyword(word="__stale__", frequency=1, category="", stat_date=datetime(2000, 1, 1)))
+        db.commit()
+        run_update(analyzer, [("测试词A", 5), ("测试词B", 3)])
+        site = keyword_map(db, "")
+        print(f"  全站热词: {site}")
+        assert site == {"测试词A": 5, "测试词B": 3}, "全站热词写入或旧词清理异常"
+
+        print("\n[2] 写入分区热词，不影响全站热词...")
+        run_update(analyzer, [("测试词A", 2), ("测试词C", 1)], TEST_CATEGORY)
+        category_keywords = keyword_map(db, TEST_CATEGORY)
+        print(f"  分区热词: {category_keywords}")
+        assert category_keywords == {"测试词A": 2, "测试词C": 1}, "分区热词写入异常"
+        assert keyword_map(db, "") == site, "写入分区热词时误删全站热词"
+
+        # stat_date 只存到秒，间隔一秒以区分两次写入
+        time.sleep(1.1)
+
+        print("\n[3] 再次写入全站热词：已有词更新频次，未出现的词删除...")
+        run_update(analyzer, [("测试词A", 8), ("测试词D", 4)])
+        site = keyword_map(db, "")
+        print(f"  全站热词: {site}")
+        assert site == {"测试词A": 8, "测试词D": 4}, "全站热词 UPSERT 或旧词清理异常"
+        count_a = db.query(Keyword).filter(Keyword.word == "测试词A", Keyword.category == "").count()
+        assert count_a == 1, "同一热词出现重复行"
+        assert keyword_map(db, TEST_CATEGORY) == category_keywords, "写入全站热词时误删分区热词"
+
+        print("\n测试通过")
+    finally:
+        db.query(Keyword).filter(Keyword.category == TEST_CATEGORY).delete(synchronize_session=False)
+        db.commit()
+        # 按当前数据重新生成全站热词
+        DataAnalyzer(db).update_keywords()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
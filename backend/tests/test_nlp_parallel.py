@@ -0,0 +1,60 @@
+"""
+测试多进程分词与单进程结果一致
+
+用法：
+  cd backend
+  python tests/test_nlp_parallel.py
+
+说明：
+    该脚本不依赖数据库，会按 PARALLEL_MIN_TEXTS 构造足够多的文本以走多进程分支。
+"""
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.nlp import PARALLEL_MIN_TEXTS, NLPAnalyzer, get_mp_context, tokenize_titles
+from app.ml.model_manager import ModelManager
+
+WORDS = [
+    "原神", "新版本", "抽卡", "攻略", "美食", "探店", "火锅", "测评", "显卡", "装机",
+    "鬼畜", "名场面", "翻唱", "演奏", "钢琴", "猫咪", "日常", "旅行", "vlog", "科普",
+]
+
+
+def make_texts(count: int) -> list:
+    """构造可复现的随机文本（含重复与空白文本）"""
+    rng = random.Random(42)
+    texts = ["".join(rng.choices(WORDS, k=rng.randint(2, 6))) for _ in range(count)]
+    texts[::97] = [""] * len(texts[::97])
+    return texts + texts[:50]
+
+
+def main():
+    print("=" * 60)
+    print("测试多进程分词与单进程结果一致")
+    print("=" * 60)
+
+    texts = make_texts(PARALLEL_MIN_TEXTS + 500)
+    print(f"文本数: {len(texts)}，启动方式: {get_mp_context().get_start_method()}")
+
+    print("\n[1] 评论/弹幕关键词矩阵...")
+    nlp = NLPAnalyzer()
+    single_matrix, single_vocab = nlp.build_keyword_matrix(texts, workers=1)
+    parallel_matrix, parallel_vocab = nlp.build_keyword_matrix(texts, workers=2)
+    print(f"  词表大小: {len(single_vocab)}，非零元素: {single_matrix.nnz}")
+    assert parallel_vocab == single_vocab, "多进程词表与单进程不一致"
+    assert (parallel_matrix != single_matrix).nnz == 0, "多进程关键词矩阵与单进程不一致"
+
+    print("\n[2] 训练标题分词...")
+    single_tokens = tokenize_titles(texts)
+    parallel_tokens = ModelManager._tokenize_titles(texts, workers=2)
+    assert parallel_tokens == single_tokens, "多进程标题分词与单进程不一致"
+    print(f"  示例: {parallel_tokens[1]!r}")
+
+    print("\n测试通过")
+
+
+if __name__ == "__main__":
+    main()
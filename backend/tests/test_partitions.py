@@ -0,0 +1,100 @@
+"""
+测试DWD表月分区维护
+
+用法：
+  cd backend
+  python tests/test_partitions.py
+
+说明：
+    该脚本不依赖数据库，以记录SQL的假会话模拟 MySQL 的分区元数据。
+"""
+import sys
+from datetime import date
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.etl.partitions import PARTITIONED_TABLES, ensure_month_partitions
+
+
+class FakeSession:
+    """按表返回预设的 (分区名, 上界) 列表，并记录执行的 ALTER 语句"""
+
+    def __init__(self, partitions, dialect="mysql"):
+        self.partitions = partitions
+        self.dialect = dialect
+        self.statements = []
+
+    def get_bind(self):
+        return SimpleNamespace(dialect=SimpleNamespace(name=self.dialect))
+
+    def execute(self, statement, params=None):
+        sql = str(statement)
+        if sql.startswith("SELECT"):
+            return list(self.partitions.get(params["table"], []))
+        self.statements.append(sql)
+        return None
+
+
+def month_partitions(*bounds):
+    """构造 p_history + 若干月分区 + p_future 的分区元数据"""
+    rows = [("p_history", "'2026-10-01'")]
+    rows += [(f"p{date.fromisoformat(b).replace(day=1):%Y%m}", f"'{b}'") for b in bounds]
+    rows.append(("p_future", "MAXVALUE"))
+    return rows
+
+
+def reorganize_sql(table, *partitions):
+    definitions = "".join(f"PARTITION {name} VALUES LESS THAN ('{end}'), " for name, end in partitions)
+    return (
+        f"ALTER TABLE `{table}` REORGANIZE PARTITION p_future INTO ("
+        f"{definitions}PARTITION p_future VALUES LESS THAN (MAXVALUE))"
+    )
+
+
+def main():
+    print("=" * 60)
+    print("测试DWD表月分区维护")
+    print("=" * 60)
+
+    table = PARTITIONED_TABLES[0]
+
+    print("\n[1] 按时维护：只补下月分区...")
+    db = FakeSession({table: month_partitions("2026-11-01", "2026-12-01")})
+    created = ensure_month_partitions(db, today=date(2026, 11, 15))
+    print(f"  {created}")
+    assert created == [f"{table}.p202612"], "新建分区异常"
+    assert db.statements == [reorganize_sql(table, ("p202612", "2027-01-01"))], "REORGANIZE 语句异常"
+
+    print("\n[2] 已覆盖到目标月：不执行任何 DDL...")
+    db = FakeSession({table: month_partitions("2026-11-01", "2026-12-01", "2027-01-01")})
+    assert ensure_month_partitions(db, today=date(2026, 11, 30)) == [], "不应新建分区"
+    assert db.statements == [], "不应执行 DDL"
+
+    print("\n[3] 中断数月后补齐每个缺失的月（跨年）...")
+    db = FakeSession({table: month_partitions("2026-11-01", "2026-12-01")})
+    created = ensure_month_partitions(db, today=date(2027, 2, 3))
+    print(f"  {created}")
+    expected = [("p202612", "2027-01-01"), ("p202701", "2027-02-01"),
+                ("p202702", "2027-03-01"), ("p202703", "2027-04-01")]
+    assert created == [f"{table}.{name}" for name, _ in expected], "缺失月份未逐月补建"
+    assert db.statements == [reorganize_sql(table, *expected)], "补建分区应合并为一条 REORGANIZE"
+
+    print("\n[4] 只有 p_history 时从其上界开始补建...")
+    db = FakeSession({table: month_partitions()})
+    created = ensure_month_partitions(db, today=date(2026, 10, 20), months_ahead=2)
+    assert created == [f"{table}.p202610", f"{table}.p202611", f"{table}.p202612"], "初始分区补建异常"
+
+    print("\n[5] 未分区的表与非 MySQL 数据库跳过...")
+    db = FakeSession({table: [], PARTITIONED_TABLES[1]: month_partitions("2026-11-01")})
+    created = ensure_month_partitions(db, today=date(2026, 10, 20))
+    assert created == [f"{PARTITIONED_TABLES[1]}.p202611"], "未分区的表应跳过，其余表照常维护"
+    assert all(f"`{table}`" not in sql for sql in db.statements), "未分区的表不应执行 DDL"
+    assert ensure_month_partitions(FakeSession({}, dialect="sqlite")) == [], "非 MySQL 数据库应跳过"
+
+    print("\n测试通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+测试热度预测批量接口
+
+用法：
+    cd backend
+    python tests/test_predictor_batch.py
+
+说明：
+    该脚本依赖本地数据库已有视频数据及已训练的热度预测模型。
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.database import SessionLocal
+from app.models import Video
+from app.ml.predictor import hot_predictor
+from app.api.ml import predict_batch, PredictBatchRequest
+
+MISSING_BVID = "BV0000000000"
+
+
+def strip_time(result):
+    """去掉预测时间戳，便于逐项比较"""
+    return {k: v for k, v in result.items() if k != "predicted_at"}
+
+
+def main():
+    print("=" * 60)
+    print("测试热度预测批量接口")
+    print("=" * 60)
+
+    if not hot_predictor.is_ready():
+        print("跳过：模型未加载，请先训练模型")
+        return
+
+    db = SessionLocal()
+    try:
+        bvids = [bvid for (bvid,) in db.query(Video.bvid).filter(Video.play_count > 0).limit(3).all()]
+        if len(bvids) < 2:
+            print("跳过：当前视频数据不足")
+            return
+
+        # 打乱顺序并插入不存在的 BVID
+        request_bvids = [bvids[-1], MISSING_BVID] + bvids[:-1]
+
+        print("\n[1] 批量预测按请求顺序返回...")
+        results = hot_predictor.predict_by_bvids(request_bvids, db)
+        assert len(results) == len(request_bvids), "批量结果数量与请求不一致"
+        for bvid, result in zip(request_bvids, results):
+            if bvid == MISSING_BVID:
+                continue
+            assert result["success"], f"{bvid} 预测失败: {result.get('error')}"
+            assert result["bvid"] == bvid, f"结果顺序异常: 期望 {bvid}，实际 {result['bvid']}"
+        print(f"  顺序: {[r.get('bvid') for r in results]}")
+
+        print("\n[2] 不存在的 BVID 返回错误项...")
+        missing = results[request_bvids.index(MISSING_BVID)]
+        print(f"  {missing}")
+        assert missing == {"success": False, "error": f"视频不存在: {MISSING_BVID}"}, "不存在视频的错误项异常"
+
+        print("\n[3] 批量结果与逐个预测一致...")
+        for bvid, result in zip(request_bvids, results):
+            single = hot_predictor.predict_by_bvid(bvid, db)
+            assert strip_time(single) == strip_time(result), f"{bvid} 批量与单个预测结果不一致"
+        print("  一致")
+
+        print("\n[4] 批量接口（BVID 标准化）...")
+        response = predict_batch(
+            PredictBatchRequest(bvids=[bvid[2:] for bvid in request_bvids]),
+            db=db,
+            current_user=None,
+        )
+        assert response["total"] == len(request_bvids), "批量接口 total 异常"
+        assert [strip_time(r) for r in response["results"]] == [strip_time(r) for r in results], \
+            "批量接口结果与 predict_by_bvids 不一致"
+        print(f"  total={response['total']}")
+
+        print("\n测试通过")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
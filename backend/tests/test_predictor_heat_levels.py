@@ -0,0 +1,84 @@
+"""
+测试热度等级判定（含 NaN 与零播放输入）
+
+用法：
+  cd backend
+  python tests/test_predictor_heat_levels.py
+
+说明：
+    该脚本不依赖数据库和已训练模型，以返回固定值的假模型替换预测。
+"""
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.ml.predictor import HotPredictor
+
+
+class FakeBooster:
+    """inplace_predict 返回固定预测值"""
+
+    def __init__(self, predictions):
+        self.predictions = predictions
+
+    def inplace_predict(self, X, iteration_range=None):
+        return np.asarray(self.predictions[:len(X)], dtype=np.float32)
+
+
+def heat_level(growth_rate: float) -> str:
+    """逐条判定的参考实现（与向量化前的判定顺序一致）"""
+    if growth_rate >= 100:
+        return "hot"
+    elif growth_rate >= 30:
+        return "rising"
+    elif growth_rate >= 0:
+        return "normal"
+    else:
+        return "cold"
+
+
+def main():
+    print("=" * 60)
+    print("测试热度等级判定")
+    print("=" * 60)
+
+    predictor = HotPredictor()
+
+    print("\n[1] 批量判定与逐条判定一致（含 NaN、无穷）...")
+    growth_rates = [np.nan, -np.inf, -5.0, 0.0, 29.99, 30.0, 99.99, 100.0, 500.0, np.inf]
+    levels = predictor._calculate_heat_levels(np.array(growth_rates))
+    print(f"  {list(zip(growth_rates, levels))}")
+    assert levels == [heat_level(rate) for rate in growth_rates], "批量热度等级与逐条判定不一致"
+    assert levels[0] == "cold", "NaN 增长率应判为冷却"
+
+    # 以假模型替换：不预测投币
+    predictor.model = object()
+    predictor.coin_model = None
+
+    print("\n[2] 零播放输入...")
+    predictor._booster = FakeBooster([50.0])
+    result = predictor.predict_by_params({"play_count": 0, "like_count": 0})
+    print(f"  当前播放 {result['current_play_count']}，增长率 {result['growth_rate']}，等级 {result['heat_level']}")
+    assert result["success"], f"零播放预测失败: {result.get('error')}"
+    assert result["current_play_count"] == 1, "零播放应按 1 计算，避免除零"
+    assert result["heat_level"] == "hot", "零播放热度等级异常"
+
+    video = SimpleNamespace(
+        bvid="BV_zero_play", title="零播放视频", description=None, category=None, publish_time=None,
+        play_count=0, like_count=0, coin_count=0, favorite_count=0, share_count=0,
+        danmaku_count=0, comment_count=0, duration=0,
+    )
+    batch_result = predictor.predict_many([video])[0]
+    assert batch_result["success"], f"零播放视频批量预测失败: {batch_result.get('error')}"
+    assert batch_result["current_play_count"] == 1, "零播放视频应按 1 计算，避免除零"
+    assert batch_result["heat_level"] == "hot", "零播放视频热度等级异常"
+
+    print("\n测试通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+测试相似推荐的进程内缓存在模型更新与视频入库后失效
+
+用法：
+  cd backend
+  python tests/test_recommend_cache.py
+
+说明：
+    该脚本不依赖数据库和已训练模型：模型文件写入临时目录（格式与训练时一致），
+    视频数据由假会话按 BV 号返回。覆盖推荐结果缓存与已入索引视频的相似行缓存。
+"""
+import pickle
+import sys
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.preprocessing import normalize
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.ml import recommender as recommender_module
+from app.ml.recommender import VideoRecommender
+
+# 已分词的标题（空格分隔）；第二版模型中 BV_A 的标题改为美食相关
+TITLES_V1 = {"BV_A": "原神 攻略", "BV_B": "原神 剧情", "BV_C": "美食 教程", "BV_D": "美食 探店"}
+TITLES_V2 = dict(TITLES_V1, BV_A="美食 攻略")
+
+
+def make_video(bvid, title):
+    return SimpleNamespace(
+        bvid=bvid, title=title, cover_url=None, author_name=f"UP_{bvid}", author_id=bvid,
+        category="游戏", play_count=1000, like_count=10, coin_count=5, favorite_count=5, duration=300,
+    )
+
+
+class FakeQuery:
+    def __init__(self, session):
+        self.session = session
+        self.value = None
+
+    def filter(self, condition):
+        # Video.bvid == x 与 Video.bvid.in_([...]) 的右值
+        self.value = condition.right.value
+        return self
+
+    def first(self):
+        self.session.query_count += 1
+        return self.session.videos.get(self.value)
+
+    def all(self):
+        self.session.query_count += 1
+        return [self.session.videos[bvid] for bvid in self.value if bvid in self.session.videos]
+
+
+class FakeSession:
+    """按 BV 号返回视频，并记录查询次数"""
+
+    def __init__(self, videos):
+        self.videos = {video.bvid: video for video in videos}
+        self.query_count = 0
+
+    def query(self, *columns):
+        return FakeQuery(self)
+
+
+def save_model(titles):
+    """按训练时的格式写出 vectorizer、L2 归一化的矩阵与视频索引"""
+    vectorizer = TfidfVectorizer()
+    tfidf_matrix = normalize(vectorizer.fit_transform(list(titles.values())), norm='l2', copy=False)
+    with open(recommender_module.VECTORIZER_PATH, 'wb') as f:
+        pickle.dump(vectorizer, f)
+    sparse.save_npz(recommender_module.MATRIX_PATH, tfidf_matrix, compressed=False)
+    with open(recommender_module.VIDEO_INDEX_PATH, 'wb') as f:
+        pickle.dump({bvid: idx for idx, bvid in enumerate(titles)}, f)
+
+
+def recommended_bvids(result):
+    assert result["success"], f"推荐失败: {result.get('error')}"
+    return [item["bvid"] for item in result["recommendations"]]
+
+
+def main():
+    print("=" * 60)
+    print("测试相似推荐缓存的失效")
+    print("=" * 60)
+
+    model_dir = Path(tempfile.mkdtemp())
+    recommender_module.VECTORIZER_PATH = model_dir / "tfidf_vectorizer.pkl"
+    recommender_module.MATRIX_PATH = model_dir / "tfidf_matrix.npz"
+    recommender_module.LEGACY_MATRIX_PATH = model_dir / "tfidf_matrix.pkl"
+    recommender_module.VIDEO_INDEX_PATH = model_dir / "video_index.pkl"
+
+    save_model(TITLES_V1)
+    recommender = VideoRecommender()
+    assert recommender.is_ready(), "临时模型加载失败"
+    db = FakeSession(make_video(bvid, title) for bvid, title in TITLES_V1.items())
+
+    print("\n[1] 推荐结果缓存：重复请求命中缓存...")
+    first = recommended_bvids(recommender.recommend_by_bvid("BV_A", db, top_k=3))
+    queries = db.query_count
+    assert recommended_bvids(recommender.recommend_by_bvid("BV_A", db, top_k=3)) == first
+    assert db.query_count == queries, "重复请求应命中结果缓存"
+    print(f"  第一版模型: {first}")
+    assert first == ["BV_B"], "第一版模型的推荐结果异常"
+
+    print("\n[2] 重新训练并加载模型后，结果缓存失效...")
+    idx = recommender.video_index["BV_A"]
+    stale_rows = recommender._indexed_top_similar(idx, 10)[0].tolist()
+    save_model(TITLES_V2)
+    recommender.reload_models()
+    second = recommended_bvids(recommender.recommend_by_bvid("BV_A", db, top_k=3))
+    print(f"  第二版模型: {second}")
+    assert db.query_count > queries, "模型更新后应重新计算推荐"
+    assert sorted(second) == ["BV_C", "BV_D"], "模型更新后仍返回旧模型的推荐结果"
+
+    print("\n[3] 重新加载模型后，相似行缓存失效...")
+    recommender._result_cache.clear()
+    recommender._sim_cache[idx] = (np.array(stale_rows), np.ones(len(stale_rows)))
+    recommender.reload_models()
+    cached_rows, cached_scores = recommender._indexed_top_similar(idx, 10)
+    fresh_rows, fresh_scores = recommender._top_similar(recommender.tfidf_matrix[idx], 10)
+    print(f"  旧相似行: {stale_rows}，新相似行: {cached_rows.tolist()}")
+    assert cached_rows.tolist() == fresh_rows.tolist(), "重新加载模型后仍返回旧矩阵的相似行"
+    assert np.allclose(cached_scores, fresh_scores), "重新加载模型后仍返回旧矩阵的相似度"
+
+    print("\n[4] 失败结果不缓存：视频入库后重新推荐...")
+    missing = recommender.recommend_by_bvid("BV_D", FakeSession([]), top_k=3)
+    assert not missing["success"], "视频不存在时应推荐失败"
+    assert recommended_bvids(recommender.recommend_by_bvid("BV_D", db, top_k=3)), "视频入库后仍返回缓存的失败结果"
+
+    print("\n测试通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+测试视频筛选统计的缓存键
+
+用法：
+  cd backend
+  python tests/test_video_stats_cache.py
+"""
+import sys
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.api.videos import VIDEO_STATS_CACHE_PREFIX, video_stats_cache_key
+
+
+def main():
+    print("=" * 60)
+    print("测试视频筛选统计的缓存键")
+    print("=" * 60)
+
+    day = datetime(2026, 10, 1)
+    # 旧键用 ":" 拼接、None 记为 "_"，以下参数两两会得到相同的键
+    cases = [
+        (None, None, None, None),
+        ("_", None, None, None),
+        (None, "_", None, None),
+        ("游戏", None, None, None),
+        ("游戏:原神", None, None, None),
+        ("游戏", "原神", None, None),
+        ("", None, None, None),
+        (None, "", None, None),
+        (None, None, day, None),
+        (None, None, None, day),
+        ("游戏", None, day, None),
+        ("游戏", f"_:{day.isoformat()}", None, None),
+    ]
+
+    print("\n[1] 不同参数得到不同的键...")
+    keys = [video_stats_cache_key(*args) for args in cases]
+    for args, key in zip(cases, keys):
+        print(f"  {args} -> {key}")
+    assert len(set(keys)) == len(cases), "不同筛选参数的缓存键发生冲突"
+
+    print("\n[2] 相同参数得到相同的键，且都在统一前缀下（便于按前缀清除）...")
+    assert all(
+        video_stats_cache_key(*args) == key for args, key in zip(cases, keys)
+    ), "相同参数的缓存键不一致"
+    assert all(key.startswith(VIDEO_STATS_CACHE_PREFIX) for key in keys), "缓存键缺少统一前缀"
+
+    print("\n测试通过")
+
+
+if __name__ == "__main__":
+    main()
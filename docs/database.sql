@@ -83,12 +83,12 @@ DROP TABLE IF EXISTS `danmakus`;
 CREATE TABLE `danmakus`  (
   `id` bigint NOT NULL AUTO_INCREMENT,
   `video_id` bigint NOT NULL,
-  `content` varchar(500) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL,
+  `content` varchar(500) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL,
   `send_time` float NULL DEFAULT NULL,
   `color` varchar(20) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NULL DEFAULT NULL,
   `created_at` datetime NULL DEFAULT NULL,
   PRIMARY KEY (`id`) USING BTREE,
-  INDEX `ix_danmakus_video_id`(`video_id` ASC) USING BTREE,
+  UNIQUE INDEX `uk_danmakus_video_content`(`video_id` ASC, `content` ASC) USING BTREE,
   INDEX `ix_danmakus_id`(`id` ASC) USING BTREE
 ) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_unicode_ci ROW_FORMAT = Dynamic;
 
@@ -110,13 +110,19 @@ CREATE TABLE `dwd_comment_daily`  (
   `sentiment_label` varchar(20) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NULL DEFAULT NULL,
   `like_count` int NULL DEFAULT 0,
   `created_at` datetime NULL DEFAULT CURRENT_TIMESTAMP,
-  PRIMARY KEY (`id`) USING BTREE,
+  PRIMARY KEY (`id`, `stat_date`) USING BTREE,
   UNIQUE INDEX `uk_comment_daily_date`(`comment_id` ASC, `stat_date` ASC) USING BTREE,
   INDEX `idx_stat_date`(`stat_date` ASC) USING BTREE,
   INDEX `idx_video_id`(`video_id` ASC) USING BTREE,
   INDEX `idx_sentiment_date`(`stat_date` ASC, `sentiment_label` ASC) USING BTREE,
   INDEX `idx_category_date_comment`(`stat_date` ASC, `category` ASC) USING BTREE
-) ENGINE = InnoDB AUTO_INCREMENT = 88 CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci COMMENT = '评论每日增量表' ROW_FORMAT = Dynamic;
+) ENGINE = InnoDB AUTO_INCREMENT = 88 CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci COMMENT = '评论每日增量表' ROW_FORMAT = Dynamic
+PARTITION BY RANGE COLUMNS (`stat_date`) (
+  PARTITION p_history VALUES LESS THAN ('2026-10-01'),
+  PARTITION p202610 VALUES LESS THAN ('2026-11-01'),
+  PARTITION p202611 VALUES LESS THAN ('2026-12-01'),
+  PARTITION p_future VALUES LESS THAN (MAXVALUE)
+);
 
 -- ----------------------------
 -- Table structure for dwd_video_snapshot
@@ -146,13 +152,19 @@ CREATE TABLE `dwd_video_snapshot`  (
   `publish_time` datetime NULL DEFAULT NULL,
   `duration` int NULL DEFAULT NULL,
   `created_at` datetime NULL DEFAULT CURRENT_TIMESTAMP,
-  PRIMARY KEY (`id`) USING BTREE,
+  PRIMARY KEY (`id`, `snapshot_date`) USING BTREE,
   UNIQUE INDEX `uk_video_snapshot_date`(`video_id` ASC, `snapshot_date` ASC) USING BTREE,
   INDEX `idx_snapshot_date`(`snapshot_date` ASC) USING BTREE,
   INDEX `idx_bvid`(`bvid` ASC) USING BTREE,
   INDEX `idx_category_date`(`category` ASC, `snapshot_date` ASC) USING BTREE,
   INDEX `idx_play_count_date`(`snapshot_date` ASC, `play_count` ASC) USING BTREE
-) ENGINE = InnoDB AUTO_INCREMENT = 30 CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci COMMENT = '视频每日快照表' ROW_FORMAT = Dynamic;
+) ENGINE = InnoDB AUTO_INCREMENT = 30 CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci COMMENT = '视频每日快照表' ROW_FORMAT = Dynamic
+PARTITION BY RANGE COLUMNS (`snapshot_date`) (
+  PARTITION p_history VALUES LESS THAN ('2026-10-01'),
+  PARTITION p202610 VALUES LESS THAN ('2026-11-01'),
+  PARTITION p202611 VALUES LESS THAN ('2026-12-01'),
+  PARTITION p_future VALUES LESS THAN (MAXVALUE)
+);
 
 -- ----------------------------
 -- Table structure for dws_category_daily
@@ -259,10 +271,11 @@ CREATE TABLE `keywords`  (
   `id` int NOT NULL AUTO_INCREMENT,
   `word` varchar(50) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL,
   `frequency` int NULL DEFAULT NULL,
-  `category` varchar(50) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NULL DEFAULT NULL,
+  `category` varchar(50) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL DEFAULT '',
   `stat_date` datetime NULL DEFAULT NULL,
   `created_at` datetime NULL DEFAULT NULL,
   PRIMARY KEY (`id`) USING BTREE,
+  UNIQUE INDEX `uk_keywords_word_category`(`word` ASC, `category` ASC) USING BTREE,
   INDEX `ix_keywords_id`(`id` ASC) USING BTREE,
   INDEX `ix_keywords_stat_date`(`stat_date` ASC) USING BTREE,
   INDEX `ix_keywords_word`(`word` ASC) USING BTREE
@@ -327,6 +340,7 @@ CREATE TABLE `videos`  (
   `danmaku_count` int NULL DEFAULT NULL,
   `comment_count` int NULL DEFAULT NULL,
   `publish_time` datetime NULL DEFAULT NULL,
+  `publish_date` date GENERATED ALWAYS AS (cast(`publish_time` as date)) STORED NULL,
   `duration` int NULL DEFAULT NULL,
   `cover_url` varchar(500) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NULL DEFAULT NULL,
   `created_at` datetime NULL DEFAULT NULL,
@@ -334,7 +348,10 @@ CREATE TABLE `videos`  (
   UNIQUE INDEX `ix_videos_bvid`(`bvid` ASC) USING BTREE,
   INDEX `ix_videos_id`(`id` ASC) USING BTREE,
   INDEX `ix_videos_author_id`(`author_id` ASC) USING BTREE,
-  INDEX `ix_videos_category`(`category` ASC) USING BTREE
+  INDEX `ix_videos_category`(`category` ASC) USING BTREE,
+  INDEX `ix_videos_publish_date`(`publish_date` ASC) USING BTREE,
+  INDEX `idx_videos_publish_play`(`publish_time` ASC, `play_count` ASC) USING BTREE,
+  INDEX `idx_videos_category_publish_time`(`category` ASC, `publish_time` ASC) USING BTREE
 ) ENGINE = InnoDB AUTO_INCREMENT = 30 CHARACTER SET = utf8mb4 COLLATE = utf8mb4_unicode_ci ROW_FORMAT = Dynamic;
 
 SET FOREIGN_KEY_CHECKS = 1;